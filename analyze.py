@@ -5,13 +5,18 @@ It evaluates Pokemon and teams and makes recommendations.
 """
 from collections import Counter
 from dataclasses import dataclass
+import functools
 import ujson as json
 import numpy as np
+import os
 from scipy.stats import gmean
+import metrics
+from speed_index import SpeedIndex
 
 COUNTER_WEIGHT_DEFAULT = 2
 TEAM_WEIGHT_DEFAULT = 5
 USAGE_WEIGHT_DEFAULT = 2  # TODO maybe move this up to 3
+RANKED_LIST_SIZE = 10  # Counters and teammates shown per Pokemon.
 
 
 @dataclass(frozen=True)  # Immutable prevents all weights from being made 0.
@@ -40,13 +45,22 @@ class Weights:
         object.__setattr__(self, 'usage', usage_weight)
 
 
+def _load_matrix(matrix_file, mmap):
+    """Load a numpy matrix, optionally mapping it read-only."""
+    if mmap:
+        return np.load(os.fspath(matrix_file), mmap_mode="r")
+
+    with open(matrix_file, "rb") as file:
+        return np.load(file)
+
+
 class MetagameData:
     """Core of analyze.
 
     Contains data for a provided metagame and performs useful analysis on it.
     """
 
-    def __init__(self, json_file, threat_file, team_file):
+    def __init__(self, json_file, threat_file, team_file, mmap=False):
         """Load metagame data from file.
 
         Args:
@@ -57,6 +71,11 @@ class MetagameData:
                 Path to file containing a numpy matrix.
                 threat_matrix[x, y] is how threatening the Pokemon with index
                 y is to the Pokemon with index x.
+            team_file (str):
+                Path to file containing the numpy teammate matrix.
+            mmap (bool):
+                Map the matrices read-only instead of reading them into memory.
+                Processes that map the same files share that memory.
         """
         with open(json_file, "r", encoding="utf-8") as file:
             data = json.load(file)
@@ -71,13 +90,24 @@ class MetagameData:
             self.moves = data["moves"]
             self.counters = data["info"]["counters"]
             self.speed_tiers = data["speed_tiers"]
+            self.speed_index = SpeedIndex(self.speed_tiers)
+
+        # Per Pokemon values in index order, so whole rows can be worked on at once.
+        self.names = list(self._indices)
+        self.usages = np.array([self.pokemon[poke]["usage"] for poke in self.names])
+        self.counts = np.array([self.pokemon[poke]["count"] for poke in self.names])
 
         if self.counters:
-            with open(threat_file, "rb") as file:
-                self._threat_matrix = np.load(file)
+            self._threat_matrix = _load_matrix(threat_file, mmap)
 
-        with open(team_file, "rb") as file:
-            self.team_matrix = np.load(file)
+        self.team_matrix = _load_matrix(team_file, mmap)
+        self.core_edges = {}  # For corefinder. Usage weight -> (limit, rows, columns). Goes when this does.
+
+    @property
+    def threat_matrix(self):
+        """threat_matrix[x, y] is how threatening the Pokemon with index y is to the Pokemon with index x.
+        None if there is no counters data."""
+        return self._threat_matrix if self.counters else None
 
     def _find_threats(self, team):
         """Generate threat ratings for threats for a provided team.
@@ -130,12 +160,7 @@ class MetagameData:
         if not self.counters:
             return {}
 
-        threats_dict = {}
-        for poke in self.pokemon:
-            threats_dict[poke] = 100 * (threats[self._indices[poke]] /
-                                        team_length)
-
-        return threats_dict
+        return dict(zip(self.names, (100 * (threats / team_length)).tolist()))
 
     def _scores(self, team, threats, weights):
         """Calculate each of the scores for every potential Pokemon.
@@ -152,7 +177,20 @@ class MetagameData:
             Each value is a float >= 0.
             In order by index of Pokemon.
         """
-        u_scores = [self.pokemon[p]["usage"] for p in self.pokemon]
+        # TODO consider refactoring to return a dictionary.
+        # Maybe dict (name -> a scores object)
+        return list(zip(self.names, *self._score_columns(team, threats, weights)))
+
+    def _score_columns(self, team, threats, weights):
+        """Calculate each of the scores for every potential Pokemon, as arrays.
+
+        Args:
+            As for _scores.
+
+        Returns:
+            (1d numpy array of float, ...): Combined, counter, team and usage scores, each in order by index.
+        """
+        u_scores = self.usages
         team_indices = [self._indices[t] for t in team]
         if team:
             t_scores = gmean(self.team_matrix[team_indices], 0, nan_policy="raise")
@@ -189,11 +227,7 @@ class MetagameData:
         stacked = np.stack(used_scores)
         combined_scores = gmean(stacked, axis=0, weights=used_weights, nan_policy="raise")
 
-        scores = list(zip(self._indices.keys(), combined_scores, c_scores, t_scores, u_scores))
-
-        # TODO consider refactoring to return a dictionary.
-        # Maybe dict (name -> a scores object)
-        return scores
+        return combined_scores, c_scores, t_scores, u_scores
 
     def _get_best(self, team, weights, scores=None):
         """Find the best addition (greedily) to a partial team.
@@ -327,18 +361,84 @@ class MetagameData:
             swaps (dict str->str): Mapping between Pokemon to replace
             and what to replace it with, or None if team is not yet full.
         """
-        threats = self._find_threats(team)
-        scores = self._scores(team, threats, weights)
-        best = self._get_best(team, weights, scores)
-        my_team = self._build_full(team, best, weights)
-        swaps = self._suggest_swaps(team, weights)
-
+        threats, columns, my_team, swaps = self._analyze(team, weights)
+        scores = list(zip(self.names, *columns))
         if team:
             threats_dict = self._threats_to_dict(threats, len(team))
         else:
             threats_dict = {}
         return threats_dict, scores, my_team, swaps
 
+    def analyze_columns(self, team, weights):
+        """Perform full analysis of a team, referring to Pokemon by index.
+
+        The same analysis as analyze, in a compact form for sending elsewhere.
+        Names for the indices are in self.names.
+
+        Args:
+            team (list of str): Names of Pokemon already on team.
+            weights (Weights): How important each kind of score is.
+
+        Returns:
+            threats (1d numpy array of float or None): How threatening each Pokemon is to the team,
+            scaled as in analyze. None if there is no team or no counters data.
+
+            scores (2d numpy array of float): Rows of combined, counter, team and usage scores,
+            each in order by index.
+
+            my_team (list of int): Suggested full team, or None if team is already full.
+
+            swaps (list of (int, int, float)): (Pokemon to replace, what to replace it with, improvement).
+        """
+        threats, columns, my_team, swaps = self._analyze(team, weights)
+        if team and self.counters:
+            threats = 100 * (threats / len(team))
+        else:
+            threats = None
+        scores = np.array(columns, dtype=np.float64)
+        if my_team is not None:
+            my_team = [self._indices[poke] for poke in my_team]
+        swaps = [(self._indices[current], self._indices[swap], float(improvement))
+                 for current, (swap, improvement) in swaps.items()]
+        return threats, scores, my_team, swaps
+
+    def _analyze(self, team, weights):
+        """Shared by analyze and analyze_columns.
+
+        Returns:
+            (1d numpy array of float or None, tuple of 1d numpy arrays, list of str or None, dict str->(str, float)):
+            Threats as from _find_threats, scores as from _score_columns, suggested team and swaps as from analyze.
+        """
+        with metrics.span("analyze.scores"):
+            threats = self._find_threats(team)
+            columns = self._score_columns(team, threats, weights)
+            best = self.names[int(np.argmax(columns[0]))]  # First of any tied, as _get_best would pick.
+        with metrics.span("analyze.build_full"):
+            my_team = self._build_full(team, best, weights)
+        with metrics.span("analyze.suggest_swaps"):
+            swaps = self._suggest_swaps(team, weights)
+        return threats, columns, my_team, swaps
+
+    def compact_matrices(self):
+        """Pack what _score_columns needs into a compact binary, so scores can be computed elsewhere.
+
+        Little-endian, in index order: usages as float64 (N values),
+        the natural log of the teammate matrix as float16 (N * N, row-major, -inf for 0)
+        and, if there is counters data, the threat matrix as float16 (N * N, row-major).
+        float16 keeps about 3 significant figures, which is plenty for ranking.
+        Logs are sent for the teammate matrix as its team score is a geometric mean,
+        and as it has values beyond float16's range.
+
+        Returns:
+            bytes: Packed matrices.
+        """
+        with np.errstate(divide="ignore"):
+            log_team = np.log(self.team_matrix)
+        parts = [self.usages.astype("<f8").tobytes(), log_team.astype("<f2").tobytes()]
+        if self.counters:
+            parts.append(self._threat_matrix.astype("<f2").tobytes())
+        return b"".join(parts)
+
     def find_counters(self, poke):
         """Find counters for a single Pokemon.
 
@@ -364,10 +464,131 @@ class MetagameData:
         Returns:
             dict str->float: How good each Pokemon is as a partner.
         """
-        teammates = {}
+        return dict(zip(self.names, self._partner_matrix(self._indices[poke]).tolist()))
+
+    def counter_ratings(self, poke):
+        """Find how good of a counter each Pokemon is to poke, as in find_counters.
+
+        Args:
+            poke (str): Pokemon to find counters for.
+
+        Returns:
+            1d numpy array of float: Ratings in index order. None if there is no counters data.
+        """
+        if not self.counters:
+            return None
+        return 100 * self._threat_matrix[self._indices[poke]]
+
+    def partner_ratings(self, poke):
+        """Find how well each possible partner goes with poke, as in partner_scores.
+
+        Args:
+            poke (str): Name of Pokemon to be accompanied.
 
-        sliced = self.team_matrix[self._indices[poke]]
-        for partner in self.pokemon:
-            teammates[partner] = sliced[self._indices[partner]] * self.pokemon[partner]["usage"]
+        Returns:
+            1d numpy array of float: Ratings in index order.
+        """
+        return self._partner_matrix(self._indices[poke])
+
+    def top_counters(self, poke):
+        """Find the best counters for a single Pokemon.
+
+        The same ratings as find_counters, but only the best RANKED_LIST_SIZE.
+        Rankings for every Pokemon are found together the first time this is called.
+
+        Args:
+            poke (str): Pokemon to find counters for.
+
+        Returns:
+            list of (str, float): (Pokemon name, how good of a counter it is), best first.
+            Only Pokemon that actually counter it are included.
+            None if there is no counters data.
+        """
+        if not self.counters:
+            return None
+        return self._ranked(self._ranked_counters, poke)
+
+    def top_partners(self, poke):
+        """Find the best partners for a single Pokemon.
+
+        The same ratings as partner_scores, but only the best RANKED_LIST_SIZE.
+        Rankings for every Pokemon are found together the first time this is called.
+
+        Args:
+            poke (str): Name of Pokemon to be accompanied.
 
-        return teammates
+        Returns:
+            list of (str, float): (Pokemon name, how good of a partner it is), best first.
+            Only Pokemon with a positive rating are included.
+        """
+        return self._ranked(self._ranked_partners, poke)
+
+    @functools.cached_property
+    def _ranked_counters(self):
+        """Best counters for every Pokemon, as from _top_k."""
+        return _top_k(100 * self._threat_matrix, RANKED_LIST_SIZE)
+
+    @functools.cached_property
+    def _ranked_partners(self):
+        """Best partners for every Pokemon, as from _top_k."""
+        return _top_k(self._partner_matrix(), RANKED_LIST_SIZE)
+
+    def _partner_matrix(self, rows=slice(None)):
+        """Teammate ratings scaled by the partner's usage.
+
+        Worked out in float64 whatever the teammate matrix is stored as, so scores and orderings don't lose precision.
+
+        Args:
+            rows (int or slice): Which Pokemon's partners to rate. All of them by default.
+        """
+        return self.team_matrix[rows].astype(np.float64) * self.usages
+
+    def _ranked(self, ranking, poke):
+        """Look up one Pokemon's row of a ranking, keeping only positive scores."""
+        indices, scores = ranking
+        row = self._indices[poke]
+        return [(self.names[index], score) for index, score in zip(indices[row].tolist(), scores[row].tolist())
+                if score > 0]
+
+    def outspeeds(self, speed, multiplier=1, limit=None):
+        """Find what outspeeds a given speed.
+
+        Args:
+            speed (int): Speed to beat, with any modifiers already applied.
+
+            multiplier (float > 0): Speed multiplier applied to everything else.
+            See speed_index.speed_multiplier.
+
+            limit (int or None): Only return the slowest limit Pokemon that still outspeed.
+
+        Returns:
+            list of (str, int, float): (Pokemon name, modified speed, fraction of that Pokemon at that speed).
+            Fastest first.
+        """
+        return self.speed_index.faster_than(speed, multiplier, limit)
+
+
+def _top_k(matrix, k):
+    """Find the k highest values in each row of a matrix.
+
+    Ties are broken by lowest column index, as a stable sort of the whole row would.
+
+    Args:
+        matrix (2d numpy array): Values to rank.
+        k (int >= 1): Number of values to keep per row. Capped at the number of columns.
+
+    Returns:
+        (2d numpy array of int, 2d numpy array): Column indices and values of the highest k in each row,
+        highest first.
+    """
+    k = min(k, matrix.shape[1])
+    # The kth highest value in each row. Everything above it is kept, along with the first few equal to it.
+    threshold = -np.partition(-matrix, k - 1, axis=1)[:, k - 1:k]
+    above = matrix > threshold
+    tied = matrix == threshold
+    keep = above | (tied & (np.cumsum(tied, axis=1) <= k - above.sum(axis=1, keepdims=True)))
+
+    indices = np.nonzero(keep)[1].reshape(len(matrix), k)  # In column order within each row.
+    values = np.take_along_axis(matrix, indices, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    return np.take_along_axis(indices, order, axis=1), np.take_along_axis(values, order, axis=1)
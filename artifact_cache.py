@@ -0,0 +1,246 @@
+"""Local disk cache for data files that are stored remotely.
+
+Files are downloaded at most once at a time per key, written to a temporary file,
+verified against the checksum the source reports and then atomically renamed into place.
+Readers therefore never see a partially written file.
+The least recently used files are deleted once the cache grows past its size limit.
+
+The size limit is per process. Processes sharing a directory, such as server workers and job workers,
+each keep their own account of it and evict on their own, so together they can briefly go past it.
+A file one process evicts is downloaded again by any other that needs it, and readers that already opened it keep working.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+PART_SUFFIX = ".part"
+STALE_PART_SECONDS = 60 * 60  # Leftover partial downloads older than this are deleted.
+CHECKSUM_RETRIES = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumError(Exception):
+    """Used to indicate a downloaded file doesn't match the checksum reported by its source."""
+    pass
+
+
+class LocalDirSource:
+    """Source that reads files from a local directory.
+
+    Stands in for the bucket in tests, or when running without S3.
+    """
+
+    def __init__(self, directory):
+        """Use directory as the source of files.
+
+        Args:
+            directory (str): Path to directory containing the files.
+        """
+        self.directory = directory
+
+    def fetch(self, key, file):
+        """Write the contents of key to file.
+
+        Args:
+            key (str): Name of the file.
+            file (file-like): Destination, only needs a write method.
+
+        Returns:
+            str: md5 hex digest of the file, for verification.
+
+        Raises:
+            FileNotFoundError: if the file doesn't exist.
+        """
+        path = os.path.join(self.directory, key)
+        md5 = hashlib.md5()
+        with open(path, "rb") as src:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                md5.update(chunk)
+                file.write(chunk)
+        return md5.hexdigest()
+
+
+class _HashingWriter:
+    """Wraps a file, computing an md5 of everything written to it."""
+
+    def __init__(self, file):
+        self.file = file
+        self.md5 = hashlib.md5()
+
+    def write(self, data):
+        self.md5.update(data)
+        return self.file.write(data)
+
+
+class ArtifactCache:
+    """Size-bounded local cache in front of a source of files.
+
+    A source is anything with a fetch(key, file) method that writes the file and returns
+    its md5 hex digest (or None if it can't provide one), raising FileNotFoundError if the key doesn't exist.
+    """
+
+    def __init__(self, source, directory, max_bytes=None):
+        """Create cache.
+
+        Args:
+            source: Where to fetch missing files from.
+            directory (str): Local directory to store files in. Created if needed.
+            max_bytes (int or None): Size limit for the directory, as this process sees it. None for no limit.
+        """
+        self.source = source
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()  # Guards everything below.
+        self._key_locks = {}  # One lock per key currently being fetched.
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first.
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.failures = 0
+        self.evictions = 0
+
+        self.rescan()
+
+    def rescan(self):
+        """Rebuild the index from what is on disk, then evict until it is within the size limit.
+
+        Call after something else has changed the directory, such as an update.
+        Files are taken to have been used in the order they were last modified.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        now = time.time()
+        for file in os.scandir(self.directory):
+            if not file.is_file():
+                continue
+            stat = file.stat()
+            if file.name.endswith(PART_SUFFIX):
+                if now - stat.st_mtime > STALE_PART_SECONDS:
+                    _remove(file.path)
+                continue
+            files.append((stat.st_mtime, file.name, stat.st_size))
+
+        with self._lock:
+            self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+            self._total_bytes = sum(self._entries.values())
+            self._evict()
+
+    def path(self, key):
+        """Get a local path for key, downloading it if it isn't cached.
+
+        Args:
+            key (str): Name of the file.
+
+        Returns:
+            str: Path to the complete local copy of the file.
+
+        Raises:
+            FileNotFoundError: if the source doesn't have the file.
+            ChecksumError: if the file repeatedly fails verification.
+        """
+        local = os.path.join(self.directory, key)
+        if self._hit(key, local):
+            return local
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Someone else may have downloaded it while we were waiting.
+            if self._hit(key, local):
+                return local
+
+            with self._lock:
+                self.misses += 1
+
+            try:
+                self._download(key, local)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+        return local
+
+    def stats(self):
+        """Get cache statistics.
+
+        Returns:
+            dict str->int: hits, misses, downloads, failures, evictions, files, bytes and max_bytes (0 if unbounded).
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "downloads": self.downloads,
+                    "failures": self.failures, "evictions": self.evictions,
+                    "files": len(self._entries), "bytes": self._total_bytes,
+                    "max_bytes": self.max_bytes or 0}
+
+    def _hit(self, key, local):
+        """Check whether key is cached, marking it as recently used if so."""
+        if not os.path.exists(local):
+            return False
+
+        with self._lock:
+            if key not in self._entries:  # Put there by something else, so adopt it.
+                size = os.path.getsize(local)
+                self._entries[key] = size
+                self._total_bytes += size
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return True
+
+    def _download(self, key, local):
+        """Fetch key into a temporary file, verify it, and move it into place."""
+        for attempt in range(CHECKSUM_RETRIES + 1):
+            temp = os.path.join(self.directory, "." + key + "." + uuid.uuid4().hex + PART_SUFFIX)
+            try:
+                with open(temp, "wb") as file:
+                    writer = _HashingWriter(file)
+                    expected = self.source.fetch(key, writer)
+                if expected is not None and expected != writer.md5.hexdigest():
+                    raise ChecksumError(key + " failed checksum verification.")
+                os.replace(temp, local)
+                break
+            except ChecksumError:
+                _remove(temp)
+                if attempt == CHECKSUM_RETRIES:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+            except BaseException:
+                _remove(temp)
+                with self._lock:
+                    self.failures += 1
+                raise
+
+        size = os.path.getsize(local)
+        with self._lock:
+            self.downloads += 1
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used files until under the size limit. Must hold self._lock."""
+        if self.max_bytes is None:
+            return
+
+        # Never evict the most recent file, even if it alone is over the limit.
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            # Readers that already opened it keep working, and anyone else downloads it again.
+            _remove(os.path.join(self.directory, key))
+
+
+def _remove(path):
+    """Delete a file if it exists and can be deleted."""
+    try:
+        os.remove(path)
+    except OSError:  # Already gone, or still open on platforms that don't allow deleting open files.
+        pass
@@ -0,0 +1,168 @@
+"""Scaling curves for analysis, core finding and pre-processing, using synthetic metagames.
+
+Times each benchmark at several metagame sizes and fits an exponent k, where time grows like N^k.
+If a baseline file exists, the run fails when any exponent grows by more than --tolerance,
+which catches code that has become superlinear even when small metagames are still fast.
+
+Run from the repository root:
+    python -m benchmarks.scaling                            # Compare against benchmarks/scaling_baseline.json.
+    python -m benchmarks.scaling --sizes 500 1000 2000 4000 --output curves.json
+    python -m benchmarks.scaling --save-baseline
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import ujson as json
+
+from benchmarks import suite  # Also puts the repository root on the path.
+from benchmarks.synthetic import SyntheticMetagame
+
+import analyze
+import corefinder
+import preprocess
+
+BASELINE_FILE = os.path.join(suite.ROOT, "benchmarks", "scaling_baseline.json")
+SIZES_DEFAULT = [250, 500, 1000, 2000]
+PREPARE_MAX_DEFAULT = 1000  # Pre-processing is slow for large metagames, so it is skipped above this size.
+TEAM_SIZES = (0, 3, 6)
+TARGET_EDGES = 100
+REPEAT_DEFAULT = 10
+BUDGET_SECONDS = 2
+TOLERANCE_DEFAULT = .3
+MIN_FIT_MS = 1  # Exponents of benchmarks faster than this at the largest size are too noisy to compare.
+
+
+def benchmarks(size, workdir, prepare):
+    """Build the benchmarks for one metagame size.
+
+    Args:
+        size (int): Number of Pokemon.
+        workdir (str): Scratch directory.
+        prepare (bool): Include pre-processing benchmarks.
+
+    Yields:
+        (str, callable, callable or None): (name, function to time, untimed setup before each run).
+    """
+    directory = os.path.join(workdir, str(size))
+    os.makedirs(directory)
+    metagame = SyntheticMetagame(size)
+    paths = metagame.write_processed(directory, "synthetic-0")
+
+    yield "load", lambda: analyze.MetagameData(*paths), None
+
+    md = analyze.MetagameData(*paths)
+    weights = analyze.Weights(1, 1, 1)
+    for team_size in TEAM_SIZES:
+        team = metagame.names[:team_size]
+        yield "analyze/team=" + str(team_size), lambda team=team: md.analyze(team, weights), None
+
+    common = itertools.cycle(metagame.names[:20])
+    yield "find_counters", lambda: md.find_counters(next(common)), None
+    yield "partner_scores", lambda: md.partner_scores(next(common)), None
+    yield ("corefinder/edges=" + str(TARGET_EDGES),
+           lambda: corefinder.CoreFinder(md, 1, TARGET_EDGES).find_cores(), None)
+
+    if prepare:
+        raw = metagame.write_raw(directory, "raw-0")
+        work = os.path.join(directory, "work.json")
+        counters = os.path.join(directory, "counters.tmp")
+        threats = os.path.join(directory, "work" + suite.THREAT_FILE)
+        team_file = os.path.join(directory, "work" + suite.TEAMMATE_FILE)
+        yield "raw_counters", lambda: preprocess.raw_counters(raw, counters), None
+        yield ("prepare_files", lambda: preprocess.prepare_files(work, counters, threats, team_file),
+               lambda: shutil.copyfile(raw, work))
+
+
+def fit_exponent(sizes, medians):
+    """Least squares fit of log(time) = k * log(size) + c.
+
+    Returns:
+        float or None: k, or None with fewer than two sizes.
+    """
+    if len(sizes) < 2:
+        return None
+    return float(np.polyfit(np.log(sizes), np.log(medians), 1)[0])
+
+
+def compare(exponents, baseline, tolerance):
+    """Find benchmarks whose exponent grew by more than tolerance.
+
+    Returns:
+        list of (str, float, float): (name, baseline exponent, new exponent) for each regression.
+    """
+    regressions = []
+    for name, fit in exponents.items():
+        old = baseline.get(name)
+        if old is None or fit["exponent"] is None or old["exponent"] is None or fit["largest_ms"] < MIN_FIT_MS:
+            continue
+        if fit["exponent"] > old["exponent"] + tolerance:
+            regressions.append((name, old["exponent"], fit["exponent"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES_DEFAULT, help="Numbers of Pokemon.")
+    parser.add_argument("--prepare-max", type=int, default=PREPARE_MAX_DEFAULT,
+                        help="Largest size to run pre-processing at.")
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this.")
+    parser.add_argument("--repeat", type=int, default=REPEAT_DEFAULT)
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="Seconds per benchmark and size.")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAULT, help="Allowed growth of an exponent.")
+    parser.add_argument("--save-baseline", action="store_true", help="Write exponents to the baseline instead of comparing.")
+    parser.add_argument("--output", help="Write curves and exponents as JSON to this file.")
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    curves = {}  # name -> {size: result}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for name, fn, setup in benchmarks(size, workdir, size <= args.prepare_max):
+                if args.only and args.only not in name:
+                    continue
+                result = suite.measure(fn, args.repeat, setup, args.budget)
+                curves.setdefault(name, {})[size] = result
+                print("{:28s} N={:<6d} {:10.2f}ms".format(name, size, result["median"]))
+
+    exponents = {}
+    print()
+    print("{:28s} {:>9s} {:>12s}".format("benchmark", "exponent", "largest"))
+    for name, curve in curves.items():
+        curve_sizes = sorted(curve)
+        medians = [curve[size]["median"] for size in curve_sizes]
+        exponent = fit_exponent(curve_sizes, medians)
+        exponents[name] = {"exponent": exponent, "largest_ms": medians[-1]}
+        print("{:28s} {:>9s} {:10.2f}ms".format(name, "-" if exponent is None else "{:.2f}".format(exponent),
+                                                 medians[-1]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"curves": curves, "exponents": exponents}, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(exponents, f, indent=2)
+        print("Saved baseline to " + args.baseline)
+        return
+
+    if not os.path.isfile(args.baseline):
+        print("No baseline to compare against.")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(exponents, json.load(f), args.tolerance)
+    for name, old, new in regressions:
+        print("REGRESSION {}: N^{:.2f} -> N^{:.2f}".format(name, old, new))
+    if regressions:
+        sys.exit(1)
+    print("No exponent grew by more than {:.2f}.".format(args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Load test for the team analysis route, using the bundled test data instead of S3.
+
+Starts the server with each requested number of worker processes and measures
+requests per second on /analysis/<dataset>/run_analysis.
+Throughput should scale close to linearly with workers, up to the number of cores.
+
+Run from the repository root:
+    python -m benchmarks.serving --workers 1 2 4 --clients 16
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+import ujson as json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DATA_DIR = os.path.join(ROOT, "tests", "test_data")
+STARTUP_TIMEOUT = 60
+
+
+def make_bucket(directory):
+    """Fill directory with everything the server needs, as a stand-in for the S3 bucket.
+
+    Returns:
+        list of str: Datasets in the bucket.
+    """
+    datasets = []
+    gens = set()
+    with open(os.path.join(directory, "all_formats"), "w", encoding="utf-8") as formats:
+        for file in sorted(os.scandir(TEST_DATA_DIR), key=lambda f: f.name):
+            if not file.is_file():
+                continue
+            shutil.copy(file.path, directory)
+            if file.name.endswith(".json"):
+                with open(file.path, encoding="utf-8") as f:
+                    info = json.load(f)["info"]
+                format_name, rating = file.name[:-5].rsplit("-", 1)
+                formats.write(format_name + " " + str(info["number of battles"]) + " "
+                              + ("C " if info["counters"] else "N ") + rating + "\n")
+                datasets.append(file.name[:-5])
+                gens.add(info["gen"])
+
+    with open(os.path.join(directory, "date"), "w", encoding="utf-8") as date:
+        date.write("Benchmark")
+
+    # Dexes aren't part of the test data, and the analysis route doesn't read them.
+    for gen in gens:
+        with open(os.path.join(directory, "gen" + gen + ".dex"), "w", encoding="utf-8") as dex:
+            json.dump({"pokemon": {}, "items": {}, "moves": {}, "abilities": {}, "base_stats_short": []}, dex)
+
+    return datasets
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, proc):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Server exited during startup.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(.1)
+    raise RuntimeError("Server did not start in time.")
+
+
+def _client(port, path, body, duration):
+    """Send requests over one keep-alive connection for duration seconds.
+
+    Returns:
+        (int, int): Successful requests, failed requests.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    ok = failed = 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        conn.request("POST", path, body, headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status == 200:
+            ok += 1
+        else:
+            failed += 1
+    conn.close()
+    return ok, failed
+
+
+def measure(workers, clients, duration, dataset, team, bucket, workdir):
+    """Start a server with workers processes and measure its throughput.
+
+    Returns:
+        (float, int): Requests per second, number of failed requests.
+    """
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), WORKERS=str(workers), LOCAL_BUCKET_DIR=bucket,
+               FLASK_SECRET_KEY="benchmark", UPDATE_PASS=os.urandom(16).hex(),
+               WARMUP_FORMATS="1000", WARMUP_BLOCKING="1")
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py")], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL)
+    try:
+        _wait_for_port(port, proc)
+        path = "/analysis/" + dataset + "/run_analysis"
+        body = urllib.parse.urlencode([("pokemon", p) for p in team] +
+                                      [("usage_weight", 2), ("counter_weight", 2), ("team_weight", 5)])
+        _client(port, path, body, 1)  # Warm up.
+
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.starmap(_client, [(port, path, body, duration)] * clients)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+
+    return sum(r[0] for r in results) / duration, sum(r[1] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to measure each worker count.")
+    parser.add_argument("--dataset", default="gen9anythinggoes-0")
+    parser.add_argument("--team-size", type=int, default=2)
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as bucket, tempfile.TemporaryDirectory() as workdir:
+        make_bucket(bucket)
+        with open(os.path.join(bucket, args.dataset + ".json"), encoding="utf-8") as f:
+            team = list(json.load(f)["pokemon"])[:args.team_size]
+
+        print("Cores: " + str(os.cpu_count()))
+        print("workers      req/s   speedup  efficiency  failed")
+        results = []
+        for workers in args.workers:
+            rps, failed = measure(workers, args.clients, args.duration, args.dataset, team, bucket, workdir)
+            base = results[0]["rps"] / results[0]["workers"] if results else rps / workers
+            results.append({"workers": workers, "rps": rps, "failed": failed})
+            print("{:7d} {:10.1f} {:9.2f} {:11.0%} {:7d}".format(
+                workers, rps, rps / base, rps / base / workers, failed))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cores": os.cpu_count(), "dataset": args.dataset, "team": team, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Benchmarks for loading, analysis, core finding and pre-processing, using the bundled test data.
+
+Each benchmark runs until it has REPEAT_DEFAULT timed runs or has used up its time budget.
+Results are reported in milliseconds (median and percentiles) and can be written as JSON.
+If a baseline file exists, the run fails when any median is more than --tolerance slower than the baseline,
+even after re-measuring.
+Baselines are machine specific, so record one on the machine doing the comparison.
+The baseline notes the machine it was recorded on, and comparing on a different one prints a warning.
+
+Run from the repository root:
+    python -m benchmarks.suite                        # Compare against benchmarks/baseline.json.
+    python -m benchmarks.suite --save-baseline        # Record a new baseline.
+    python -m benchmarks.suite --only analyze --output results.json
+"""
+import argparse
+import itertools
+import math
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import ujson as json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analyze  # noqa: E402
+import corefinder  # noqa: E402
+import preprocess  # noqa: E402
+from file_constants import THREAT_FILE, TEAMMATE_FILE  # noqa: E402
+
+TEST_DATA_DIR = os.path.join(ROOT, "tests", "test_data")
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DATASETS_DEFAULT = ["gen1ou-0", "gen91v1-0", "gen9anythinggoes-0", "gen9doublesou-0"]
+TEAM_SIZES = range(7)
+TARGET_EDGES = (25, 100, 300)
+REPEAT_DEFAULT = 30
+MIN_RUNS = 3
+BUDGET_SECONDS = 3  # Per benchmark. Slow benchmarks stop early, after at least MIN_RUNS.
+TOLERANCE_DEFAULT = .5  # Loose, as shared machines are noisy. Tighten on dedicated hardware.
+NOISE_FLOOR_MS = .5  # Differences smaller than this are never regressions.
+CONFIRM_RUNS = 2  # Times to re-measure apparent regressions, keeping the fastest result.
+
+
+def measure(fn, repeat=REPEAT_DEFAULT, setup=None, budget=BUDGET_SECONDS):
+    """Time fn, after one untimed warm-up call.
+
+    Args:
+        fn (callable): Work to time.
+        repeat (int): Most timed runs.
+        setup (callable or None): Called untimed before every run.
+        budget (float): Seconds after which to stop, once there are MIN_RUNS runs.
+
+    Returns:
+        dict str->float: Summary of run times in milliseconds.
+    """
+    times = []
+    deadline = time.perf_counter() + budget
+    for x in range(repeat + 1):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if x:
+            times.append(elapsed * 1000)
+            if len(times) >= MIN_RUNS and time.perf_counter() > deadline:
+                break
+    return summarize(times)
+
+
+def summarize(times):
+    """Summarize run times.
+
+    Returns:
+        dict str->float: runs, min, median, p90, p99 and max.
+    """
+    times = sorted(times)
+    return {"runs": len(times), "min": times[0], "median": statistics.median(times),
+            "p90": _percentile(times, 90), "p99": _percentile(times, 99), "max": times[-1]}
+
+
+def _percentile(sorted_times, percent):
+    """Nearest-rank percentile."""
+    return sorted_times[max(0, math.ceil(percent / 100 * len(sorted_times)) - 1)]
+
+
+def machine():
+    """Describe this machine and the software the benchmarks depend on, to store with a baseline.
+
+    Returns:
+        dict str->str: cpu, cores, system, python and numpy.
+    """
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            cpu = next(line.split(":", 1)[1].strip() for line in f if line.startswith("model name"))
+    except (OSError, StopIteration):
+        pass
+    return {"cpu": cpu, "cores": str(os.cpu_count()), "system": platform.platform(),
+            "python": platform.python_version(), "numpy": np.__version__}
+
+
+def load_baseline(path):
+    """Read a baseline written by --save-baseline.
+
+    Returns:
+        (dict str->str, dict str->dict): The machine it was recorded on, and its results.
+    """
+    with open(path, encoding="utf-8") as f:
+        stored = json.load(f)
+    return stored["machine"], stored["benchmarks"]
+
+
+def write_raw_chaos(dataset, directory):
+    """Rebuild raw Smogon chaos JSON from a processed dataset, so pre-processing can be benchmarked.
+
+    Usage, counts, moves, abilities and items are restored directly.
+    Teammate counts and checks and counters are derived back from the matrices,
+    so pre-processing the result gives approximately the original dataset.
+
+    Args:
+        dataset (str): Dataset in the test data, like gen1ou-0.
+        directory (str): Where to write the file.
+
+    Returns:
+        str: Path to the raw file.
+    """
+    base = os.path.join(TEST_DATA_DIR, dataset)
+    with open(base + ".json", encoding="utf-8") as f:
+        data = json.load(f)
+    names = sorted(data["indices"], key=data["indices"].get)
+    team_matrix = np.load(base + TEAMMATE_FILE)
+    threat_matrix = np.load(base + THREAT_FILE) if data["info"]["counters"] else None
+    usages = np.array([data["pokemon"][poke]["usage"] for poke in names])
+
+    raw = {}
+    for index, poke in enumerate(names):
+        info = data["pokemon"][poke]
+        count = info["count"]
+        # Invert team_matrix = together / (count - together) / usage.
+        scaled = team_matrix[index] * usages
+        with np.errstate(invalid="ignore"):
+            together = np.where(np.isinf(scaled), count, count * scaled / (1 + scaled))
+        teammates = {names[t]: float(together[t]) for t in np.flatnonzero(team_matrix[index])}
+
+        counters = {}
+        if threat_matrix is not None:
+            for threat in np.flatnonzero(threat_matrix[index] != 0):
+                strength = float(threat_matrix[index, threat] / usages[threat])
+                counters[names[threat]] = [count, .5 + strength / 2, .05]
+
+        raw[poke] = {
+            "usage": info["usage"],
+            "Raw count": max(count, preprocess.MIN_POKE_RAW_COUNT + 1),
+            "Abilities": {a: use * count for a, use in info["Abilities"].items()},
+            "Moves": {("" if m == "nomove" else m): use * count for m, use in info["Moves"].items()},
+            "Items": {i: use * count for i, use in info["Items"].items()},
+            "Spreads": {},
+            "Happiness": {"255.0": count},
+            "Viability Ceiling": [1, 70, 70, 70],
+            "Teammates": teammates,
+            "Checks and Counters": counters,
+        }
+
+    info = {"metagame": data["info"]["metagame"], "number of battles": data["info"]["number of battles"],
+            "cutoff": 0, "cutoff deviation": 0, "team type": None}
+    path = os.path.join(directory, dataset + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"info": info, "data": raw}, f)
+    return path
+
+
+def benchmarks(datasets, workdir):
+    """Build the benchmarks.
+
+    Args:
+        datasets (list of str): Datasets in the test data to use.
+        workdir (str): Scratch directory for pre-processing.
+
+    Yields:
+        (str, callable, callable or None): (name, function to time, untimed setup before each run).
+    """
+    weights = analyze.Weights(1, 1, 1)
+    for dataset in datasets:
+        base = os.path.join(TEST_DATA_DIR, dataset)
+        yield ("load/" + dataset,
+               lambda base=base: analyze.MetagameData(base + ".json", base + THREAT_FILE, base + TEAMMATE_FILE),
+               None)
+
+        md = analyze.MetagameData(base + ".json", base + THREAT_FILE, base + TEAMMATE_FILE)
+        by_usage = sorted(md.pokemon, key=lambda p: -md.pokemon[p]["usage"])
+        for size in TEAM_SIZES:
+            team = by_usage[:size]
+            yield "analyze/{}/team={}".format(dataset, size), lambda md=md, team=team: md.analyze(team, weights), None
+
+        # Cycle through common Pokemon so no single row dominates.
+        common = itertools.cycle(by_usage[:20])
+        if md.counters:
+            yield "find_counters/" + dataset, lambda md=md, common=common: md.find_counters(next(common)), None
+        yield "partner_scores/" + dataset, lambda md=md, common=common: md.partner_scores(next(common)), None
+        if md.counters:
+            yield "top_counters/" + dataset, lambda md=md, common=common: md.top_counters(next(common)), None
+        yield "top_partners/" + dataset, lambda md=md, common=common: md.top_partners(next(common)), None
+
+        for target_edges in TARGET_EDGES:
+            yield ("corefinder/{}/edges={}".format(dataset, target_edges),
+                   lambda md=md, target_edges=target_edges: corefinder.CoreFinder(md, 1, target_edges).find_cores(),
+                   None)
+
+        yield from _preprocess_benchmarks(dataset, os.path.join(workdir, dataset))
+
+
+def _preprocess_benchmarks(dataset, directory):
+    """Benchmarks for raw_counters and prepare_files on one dataset."""
+    os.makedirs(directory)
+    raw = write_raw_chaos(dataset, directory)
+    work = os.path.join(directory, "work.json")
+    counters = os.path.join(directory, "counters.tmp")
+    threats = os.path.join(directory, "work" + THREAT_FILE)
+    team = os.path.join(directory, "work" + TEAMMATE_FILE)
+
+    yield "raw_counters/" + dataset, lambda: preprocess.raw_counters(raw, counters), None
+    # prepare_files overwrites its input, so start each run from a fresh copy.
+    yield ("prepare_files/" + dataset, lambda: preprocess.prepare_files(work, counters, threats, team),
+           lambda: shutil.copyfile(raw, work))
+
+
+def compare(results, baseline, tolerance):
+    """Find benchmarks that got slower.
+
+    Args:
+        results (dict str->dict): New results.
+        baseline (dict str->dict): Old results. Benchmarks missing from either are ignored.
+        tolerance (float): Allowed slowdown of the median, as a fraction.
+
+    Returns:
+        list of (str, float, float): (name, baseline median, new median) for each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["median"], result["median"]
+        if new > old * (1 + tolerance) and new - old > NOISE_FLOOR_MS:
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", nargs="+", default=DATASETS_DEFAULT)
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this.")
+    parser.add_argument("--repeat", type=int, default=REPEAT_DEFAULT, help="Most timed runs per benchmark.")
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="Seconds per benchmark.")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAULT,
+                        help="Allowed slowdown of a median compared to the baseline, as a fraction.")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to the baseline instead of comparing.")
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.save_baseline and os.path.isfile(args.baseline):
+        recorded_on, baseline = load_baseline(args.baseline)
+        if recorded_on != machine():
+            print("Warning: the baseline was recorded on a different machine, so timings may not be comparable.")
+            print("  baseline: " + ", ".join("{} {}".format(k, v) for k, v in recorded_on.items()))
+            print("  this run: " + ", ".join("{} {}".format(k, v) for k, v in machine().items()))
+
+    results = {}
+    print("{:48s} {:>6s} {:>10s} {:>10s} {:>10s}".format("benchmark", "runs", "median", "p90", "max"))
+    with tempfile.TemporaryDirectory() as workdir:
+        selected = {}
+        for name, fn, setup in benchmarks(args.datasets, workdir):
+            if args.only and args.only not in name:
+                continue
+            selected[name] = (fn, setup)
+            result = results[name] = measure(fn, args.repeat, setup, args.budget)
+            print("{:48s} {:6d} {:8.2f}ms {:8.2f}ms {:8.2f}ms".format(
+                name, result["runs"], result["median"], result["p90"], result["max"]))
+
+        regressions = []
+        if baseline is not None:
+            # A busy machine can slow down a single benchmark, so only trust slowdowns that repeat.
+            for _ in range(CONFIRM_RUNS):
+                regressions = compare(results, baseline, args.tolerance)
+                for name, _, _ in regressions:
+                    fn, setup = selected[name]
+                    result = measure(fn, args.repeat, setup, args.budget)
+                    if result["median"] < results[name]["median"]:
+                        results[name] = result
+            regressions = compare(results, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine(), "benchmarks": results}, f, indent=2)
+        print("Saved baseline to " + args.baseline)
+        return
+
+    if baseline is None:
+        print("No baseline to compare against.")
+        return
+
+    for name, old, new in regressions:
+        print("REGRESSION {}: {:.2f}ms -> {:.2f}ms ({:+.0%})".format(name, old, new, new / old - 1))
+    if regressions:
+        sys.exit(1)
+    print("No regressions beyond {:.0%}.".format(args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Generates synthetic metagames of any size, for scale testing.
+
+Usage follows a power law from TOP_USAGE down to just above the pre-processing cutoff.
+Pokemon are grouped into archetypes, and mostly team up within their archetype,
+so teammate data is sparse in the tail and cores exist to be found.
+Checks and counters are only recorded for pairs that meet often enough, as on Smogon.
+
+A metagame can be written as raw chaos JSON (to run through preprocess),
+or as already processed files (the JSON plus _team.npy and _threats.npy) built with the same formulas,
+which is much faster for large metagames.
+
+Run from the repository root to write a metagame:
+    python -m benchmarks.synthetic 2000 ./datasets/ --raw
+"""
+import argparse
+import math
+import os
+import re
+import sys
+
+import numpy as np
+import ujson as json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import preprocess  # noqa: E402
+from file_constants import THREAT_FILE, TEAMMATE_FILE  # noqa: E402
+
+METAGAME_DEFAULT = "gen9synthetic"
+BATTLES_DEFAULT = 100000
+TOP_USAGE = .35
+TAIL_USAGE = .002  # Least used Pokemon. Must stay above preprocess.MIN_USAGE after rounding.
+ARCHETYPE_SIZE = 12  # Average number of Pokemon per archetype.
+IN_ARCHETYPE_AFFINITY = 4
+OUT_ARCHETYPE_AFFINITY = .15
+AFFINITY_SIGMA = 1  # Spread of the lognormal noise on how often two Pokemon team up.
+TEAM_SIZE = 6
+MAX_TOGETHER = .9  # Fraction of a Pokemon's teams a teammate can appear on.
+ENCOUNTER_SCALE = 4  # Scales expected encounters between two Pokemon, for checks and counters.
+MIN_ENCOUNTERS = 20  # Pairs that meet less often than this have no checks and counters entry.
+MATCHUP_SIGMA = .75
+NUM_MOVES = 300
+NUM_ABILITIES = 150
+NUM_ITEMS = 80
+MOVES_PER_POKEMON = 10
+ABILITIES_PER_POKEMON = 2
+ITEMS_PER_POKEMON = 5
+
+
+class SyntheticMetagame:
+    """Randomly generated, but reproducible, metagame statistics."""
+
+    def __init__(self, n, seed=0, counters=True, battles=BATTLES_DEFAULT, metagame=METAGAME_DEFAULT):
+        """Generate a metagame.
+
+        Memory use grows with n squared, to around 1GB at n = 5000.
+
+        Args:
+            n (int >= preprocess.MIN_POKEMON): Number of Pokemon.
+            seed (int): Random seed. The same arguments always give the same metagame.
+            counters (bool): Whether to include checks and counters data.
+            battles (int): Number of battles. Two teams per battle.
+            metagame (str): Format name. Must start with genN.
+        """
+        rng = np.random.default_rng(seed)
+        self.metagame = metagame
+        self.battles = battles
+        self.names = ["Synthmon {:05d}".format(i) for i in range(n)]
+
+        exponent = math.log(TOP_USAGE / TAIL_USAGE) / math.log(n)
+        self.usage = TOP_USAGE * np.arange(1, n + 1) ** -exponent
+        teams = 2 * battles
+        self.count = self.usage * teams
+
+        archetype = rng.integers(max(1, n // ARCHETYPE_SIZE), size=n)
+        affinity = np.triu(rng.lognormal(0, AFFINITY_SIGMA, (n, n)).astype(np.float32), 1)
+        affinity += affinity.T
+        affinity *= np.where(archetype[:, None] == archetype[None, :], IN_ARCHETYPE_AFFINITY, OUT_ARCHETYPE_AFFINITY)
+        expected = affinity
+        expected *= np.outer(self.usage, self.usage * teams).astype(np.float32)
+        # Scale so teams have TEAM_SIZE Pokemon on average.
+        expected *= (TEAM_SIZE - 1) * self.count.sum() / expected.sum(dtype=np.float64)
+        together = np.triu(rng.poisson(expected), 1).astype(np.float32)
+        del affinity, expected
+        together += together.T
+        np.minimum(together, MAX_TOGETHER * np.minimum.outer(self.count, self.count), out=together)
+
+        # Pre-processing drops Pokemon with few teammates, so make sure everyone pairs up with the most used.
+        partners = np.arange(preprocess.MIN_TEAMMATES + 1)
+        for poke in np.flatnonzero(np.count_nonzero(together, axis=1) <= preprocess.MIN_TEAMMATES):
+            for partner in partners[partners != poke]:
+                together[poke, partner] = together[partner, poke] = max(together[poke, partner], 1)
+        self.together = together
+
+        self.counters = counters
+        if counters:
+            encounters = np.rint(np.outer(self.usage, self.usage) * battles * ENCOUNTER_SCALE)
+            np.fill_diagonal(encounters, 0)
+            self.encounters = encounters.astype(np.float32)
+            power = rng.normal(size=n)
+            matchup = rng.normal(0, MATCHUP_SIGMA, (n, n))
+            # loss[x, y] is how often x is KOed or forced out by y.
+            self.loss = (.05 + .9 / (1 + np.exp(power[:, None] - power[None, :] - matchup))).astype(np.float32)
+
+        self.moves = _shares(rng, n, NUM_MOVES, MOVES_PER_POKEMON, "Move {:03d}", MOVES_PER_POKEMON / 4)
+        self.abilities = _shares(rng, n, NUM_ABILITIES, ABILITIES_PER_POKEMON, "Ability {:03d}", 1)
+        self.items = _shares(rng, n, NUM_ITEMS, ITEMS_PER_POKEMON, "Item {:03d}", 1)
+
+    def write_raw(self, directory, name):
+        """Write raw chaos JSON, as downloaded from Smogon.
+
+        Args:
+            directory (str): Where to write the file.
+            name (str): Dataset name, like gen9synthetic-0.
+
+        Returns:
+            str: Path to the file.
+        """
+        data = {}
+        for index, poke in enumerate(self.names):
+            count = float(self.count[index])
+            teammates = {self.names[t]: float(self.together[index, t]) for t in np.flatnonzero(self.together[index])}
+            counters = {}
+            if self.counters:
+                for threat in np.flatnonzero(self.encounters[index] >= MIN_ENCOUNTERS):
+                    counters[self.names[threat]] = [float(self.encounters[index, threat]),
+                                                    float(self.loss[index, threat]), .02]
+            data[poke] = {
+                "usage": float(self.usage[index]),
+                "Raw count": round(count),
+                "Abilities": {a: share * count for a, share in self.abilities[index].items()},
+                "Moves": {m: share * count for m, share in self.moves[index].items()},
+                "Items": {i: share * count for i, share in self.items[index].items()},
+                "Spreads": {},
+                "Happiness": {"255.0": count},
+                "Viability Ceiling": [1, 70, 70, 70],
+                "Teammates": teammates,
+                "Checks and Counters": counters,
+            }
+
+        info = {"metagame": self.metagame, "number of battles": self.battles,
+                "cutoff": 0, "cutoff deviation": 0, "team type": None}
+        path = os.path.join(directory, name + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"info": info, "data": data}, f)
+        return path
+
+    def write_processed(self, directory, name):
+        """Write the files pre-processing would produce from write_raw, without going through it.
+
+        The matrices match preprocess.prepare_files. There are no speed tiers, as those need a dex.
+
+        Args:
+            directory (str): Where to write the files.
+            name (str): Dataset name, like gen9synthetic-0.
+
+        Returns:
+            (str, str, str): Paths to the JSON, threat matrix and teammate matrix, as MetagameData takes them.
+        """
+        digits = preprocess.DIGITS_KEPT
+        usage = np.round(self.usage, digits)
+        pokemon = {}
+        for index, poke in enumerate(self.names):
+            pokemon[poke] = {"Moves": _rounded(self.moves[index]), "Abilities": _rounded(self.abilities[index]),
+                             "usage": float(usage[index]), "Items": _rounded(self.items[index]),
+                             "count": float(self.count[index])}
+
+        total_pokes = float(self.count.sum())
+        pokes_per_team = round(float(self.together.sum(dtype=np.float64)) / total_pokes + 1, digits)
+        has_counters = self.counters and _has_counters(self.encounters)
+
+        base = os.path.join(directory, name)
+        if has_counters:
+            met = self.encounters >= MIN_ENCOUNTERS
+            # Same as preprocess._threat_for_poke, for every pair at once.
+            threat_matrix = np.where(met.T, (self.loss - self.loss.T) * usage[None, :].astype(np.float32), 0)
+            np.save(base + THREAT_FILE, threat_matrix.astype(np.single))
+
+        with np.errstate(divide="ignore"):
+            team_matrix = np.where(self.together > 0,
+                                   self.together / (self.count[:, None] - self.together) / usage[None, :], 0)
+        np.save(base + TEAMMATE_FILE, team_matrix.astype(np.single))
+
+        data = {
+            "info": {"metagame": self.metagame, "number of battles": self.battles,
+                     "total_pokes": round(total_pokes, digits), "pokes_per_team": pokes_per_team,
+                     "num_teams": round(total_pokes / pokes_per_team, digits), "counters": bool(has_counters),
+                     "gen": re.match(r"^gen(\d+)(?!v\d)", self.metagame).group(1), "level": 100},
+            "indices": {poke: index for index, poke in enumerate(self.names)},
+            "pokemon": pokemon,
+            "abilities": preprocess._users(pokemon, "Abilities"),
+            "moves": preprocess._users(pokemon, "Moves"),
+            "items": preprocess._users(pokemon, "Items"),
+            "speed_tiers": {},
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return base + ".json", base + THREAT_FILE, base + TEAMMATE_FILE
+
+
+def _shares(rng, n, pool, per_pokemon, name_format, concentration):
+    """Random usage shares of moves, abilities or items for each Pokemon.
+
+    Returns:
+        list of dict str->float: For each Pokemon, the fraction of its sets using each option.
+        Moves can sum to more than 1, as each set has several.
+    """
+    names = [name_format.format(i) for i in range(pool)]
+    shares = []
+    for _ in range(n):
+        chosen = rng.choice(pool, size=per_pokemon, replace=False)
+        weights = rng.dirichlet(np.full(per_pokemon, 1.0)) * concentration
+        shares.append({names[c]: float(min(w, 1)) for c, w in zip(chosen, weights)})
+    return shares
+
+
+def _rounded(shares):
+    return {k: round(v, preprocess.DIGITS_KEPT) for k, v in shares.items()}
+
+
+def _has_counters(encounters):
+    """Whether raw_counters would keep counters data, as in preprocess.raw_counters."""
+    with_counters = int(np.count_nonzero(
+        np.count_nonzero(encounters >= MIN_ENCOUNTERS, axis=1) >= preprocess.MIN_TO_HAVE_COUNTERS))
+    return (with_counters > preprocess.MIN_COUNTERS_COUNT
+            or with_counters > preprocess.MIN_COUNTERS_FRAC * len(encounters))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("n", type=int, help="Number of Pokemon.")
+    parser.add_argument("directory")
+    parser.add_argument("--name", default=METAGAME_DEFAULT + "-0", help="Dataset name.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-counters", action="store_true")
+    parser.add_argument("--raw", action="store_true", help="Write raw chaos JSON instead of processed files.")
+    args = parser.parse_args()
+
+    metagame = SyntheticMetagame(args.n, args.seed, not args.no_counters, metagame=args.name.rsplit("-", 1)[0])
+    if args.raw:
+        print(metagame.write_raw(args.directory, args.name))
+    else:
+        print("\n".join(metagame.write_processed(args.directory, args.name)))
+
+
+if __name__ == "__main__":
+    main()
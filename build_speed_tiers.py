@@ -1,80 +1,145 @@
-from math import floor
+"""Builds speed tiers for each format from the EV spreads used in it.
+
+Dex data is parsed once per generation and shared between every format of that generation.
+Speeds are computed for all spreads of a Pokemon at once.
+"""
+import functools
 from file_constants import *
 import ujson as json
-from collections import Counter
+import numpy as np
 import os
 
 SPEED_TIER_THRESHOLD = .01
+SPEED_MULTIPLIERS = (1, 3/2, 2)  # +0, +1 and +2 speed.
+NATURE_MULTIPLIERS = {"Timid": 1.1, "Hasty": 1.1, "Jolly": 1.1, "Naive": 1.1,
+                      "Brave": .9, "Relaxed": .9, "Quiet": .9, "Sassy": .9}
 
 
 def build_speed_tiers():
-    for file in os.scandir(TEMP_DATA_DIR):
-        if file.name[-5:] == ".json":
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                pokemon = data["pokemon"]
-                gen = data["info"]["gen"]
-                level = data["info"]["level"]
-                speed_tiers = {}
-                with open(TEMP_DATA_DIR + DEX_PREFIX + str(gen) + DEX_SUFFIX, "r", encoding="utf-8") as dex_f:
-                    dex = json.load(dex_f)
-
-                    for poke in pokemon:
-                        if pokemon[poke]["usage"] < SPEED_TIER_THRESHOLD:
-                            del pokemon[poke]["Spreads"]
-                            continue
-
-                        speeds = Counter()
-                        base = dex["pokemon"][poke]["base_stats"]["Speed"]
-                        for spread in pokemon[poke]["Spreads"]:
-                            nature = spread.split(":")[0]
-                            ev = int(spread.split("/")[-1])
-                            speed = calc_speed(base, ev, nature, level, gen)
-                            speeds[speed] += pokemon[poke]["Spreads"][spread] / pokemon[poke]["count"]
-
-                        for speed in speeds:
-                            if speeds[speed] * pokemon[poke]["usage"] > SPEED_TIER_THRESHOLD:
-                                if speed not in speed_tiers:
-                                    speed_tiers[speed] = []
-                                speed_tiers[speed].append((poke, round(speeds[speed], 2), speeds[speed] * pokemon[poke]["usage"]))
-
-                        del pokemon[poke]["Spreads"]
-
-                for speed_tier in speed_tiers:
-                    # List most relevant first.
-                    speed_tiers[speed_tier] = [(s[0], s[1]) for s in sorted(speed_tiers[speed_tier], key=lambda k: -k[2])]
-
-                speed_tiers = {k: speed_tiers[k] for k in sorted(speed_tiers, reverse=True)}
-                multipliers = [1, 3/2, 2]
-
-                modified_speed_tiers = {}
-                for index, mult in enumerate(multipliers):  # This will not work correctly with negative speed tiers.
-                    for speed in speed_tiers:
-                        new_speed = floor(speed*mult)
-                        if new_speed in modified_speed_tiers:
-                            modified_speed_tiers[new_speed][index] = speed_tiers[speed]
-                        else:
-                            modified_speed_tiers[new_speed] = [[]] * len(multipliers)
-                            modified_speed_tiers[new_speed][index] = speed_tiers[speed]
-
-                data["speed_tiers"] = {k: modified_speed_tiers[k] for k in sorted(modified_speed_tiers, reverse=True)}
-
-            with open(file, "w", encoding="utf-8") as f:
-                json.dump(data, f)
-
-
-def calc_speed(base, ev, nature, level, gen):
+    """Add speed tiers to every format in the temporary data directory.
+
+    Spreads are removed from the data, since nothing else needs them.
+    """
+    try:
+        for file in os.scandir(TEMP_DATA_DIR):
+            if file.name[-5:] == ".json":
+                with open(file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+
+                dex = _load_dex(data["info"]["gen"])
+                data["speed_tiers"] = _speed_tiers(data["pokemon"], dex, data["info"]["level"], data["info"]["gen"])
+
+                with open(file, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+    finally:
+        _load_dex.cache_clear()  # Even after a failure, so the next update doesn't use this update's dexes.
+
+
+@functools.lru_cache(maxsize=None)
+def _load_dex(gen):
+    """Load the dex for a generation. Cached, since many formats share a generation."""
+    with open(TEMP_DATA_DIR + DEX_PREFIX + str(gen) + DEX_SUFFIX, "r", encoding="utf-8") as dex_f:
+        return json.load(dex_f)
+
+
+def _speed_tiers(pokemon, dex, level, gen):
+    """Build the speed tiers for a single format.
+
+    Args:
+        pokemon (dict): Pokemon data for the format. Spreads are removed from it.
+        dex (dict): Dex data for the generation of the format.
+        level (int): Level Pokemon are at in the format.
+        gen (str): Generation of the format.
+
+    Returns:
+        dict int->list: Maps speed to a list with one entry per speed multiplier.
+        Each entry is a list of (Pokemon name, fraction of that Pokemon at that speed),
+        most relevant first. Speeds are in descending order.
+    """
+    names = list(pokemon)
+    entry_speeds = []
+    entry_pokes = []
+    entry_fractions = []
+    entry_relevance = []
+    for poke_index, poke in enumerate(names):
+        spreads = pokemon[poke].pop("Spreads")
+        if pokemon[poke]["usage"] < SPEED_TIER_THRESHOLD:
+            continue
+
+        natures, evs, counts = _parse_spreads(spreads)
+        speeds = calc_speed(dex["pokemon"][poke]["base_stats"]["Speed"], evs, natures, level, gen)
+        unique_speeds, inverse = np.unique(speeds, return_inverse=True)
+        fractions = np.bincount(inverse, weights=counts / pokemon[poke]["count"])
+        relevance = fractions * pokemon[poke]["usage"]
+
+        relevant = relevance > SPEED_TIER_THRESHOLD
+        entry_speeds.append(unique_speeds[relevant])
+        entry_pokes.append(np.full(np.count_nonzero(relevant), poke_index))
+        entry_fractions.append(fractions[relevant])
+        entry_relevance.append(relevance[relevant])
+
+    if not entry_speeds:
+        return {}
+
+    speeds = np.concatenate(entry_speeds)
+    pokes = np.concatenate(entry_pokes)
+    fractions = np.concatenate(entry_fractions)
+    relevance = np.concatenate(entry_relevance)
+
+    # Fastest first, then list most relevant first. Ties stay in the order of the Pokemon data.
+    order = np.lexsort((pokes, -relevance, -speeds))
+    speeds = speeds[order]
+    tier_speeds, tier_starts = np.unique(-speeds, return_index=True)
+    tier_speeds = -tier_speeds
+    tier_ends = np.append(tier_starts[1:], len(order))
+    tiers = [[(names[pokes[i]], round(float(fractions[i]), 2)) for i in order[start:end]]
+             for start, end in zip(tier_starts, tier_ends)]
+
+    # Each multiplier maps distinct speeds to distinct speeds, so every row has at most one tier per multiplier.
+    # This will not work correctly with negative speed tiers.
+    scaled = [np.floor(tier_speeds * mult).astype(np.int64) for mult in SPEED_MULTIPLIERS]
+    all_speeds = np.unique(np.concatenate(scaled))
+    rows = np.full((len(all_speeds), len(SPEED_MULTIPLIERS)), -1)
+    for index, scaled_speeds in enumerate(scaled):
+        rows[np.searchsorted(all_speeds, scaled_speeds), index] = np.arange(len(tiers))
+
+    return {int(speed): [tiers[t] if t >= 0 else [] for t in row]
+            for speed, row in zip(all_speeds[::-1], rows[::-1])}
+
+
+def _parse_spreads(spreads):
+    """Parse spread strings like "Jolly:0/252/0/0/4/252".
+
+    Returns:
+        (1d numpy array of float, 1d numpy array of int, 1d numpy array of float):
+        Nature speed multiplier, speed EVs, and number of times each spread was used.
+    """
+    natures = []
+    evs = []
+    for spread in spreads:
+        nature, _, stats = spread.partition(":")
+        natures.append(NATURE_MULTIPLIERS.get(nature, 1))
+        evs.append(int(stats.rpartition("/")[2]))
+
+    return np.array(natures), np.array(evs, dtype=np.int64), np.fromiter(spreads.values(), dtype=float, count=len(spreads))
+
+
+def calc_speed(base, evs, natures, level, gen):
+    """Calculate speed stats for a Pokemon.
+
+    Args:
+        base (int): Base speed of the Pokemon.
+        evs (numpy array of int): Speed EVs of each spread.
+        natures (numpy array of float): Nature speed multiplier of each spread.
+        level (int): Level of the Pokemon.
+        gen (str): Generation of the format.
+
+    Returns:
+        numpy array of int: Speed stat of each spread.
+    """
     if int(gen) <= 2:
-        return floor(((base + 15) * 2 + 63) * level / 100) + 5
-
-    iv = 31
-    if nature in ["Timid", "Hasty", "Jolly", "Naive"]:
-        mult = 1.1
-    elif nature in ["Brave", "Relaxed", "Quiet", "Sassy"]:
-        mult = .9
-        if ev == 0:
-            iv = 0  # If negative nature and 0 speed investment, assume min speed for Trick Room, Gyro Ball, etc.
-    else:
-        mult = 1
-
-    return floor((floor((2*base + iv + floor(ev/4)) * level / 100) + 5) * mult)
+        return np.full(len(evs), ((base + 15) * 2 + 63) * level // 100 + 5)
+
+    # If negative nature and 0 speed investment, assume min speed for Trick Room, Gyro Ball, etc.
+    ivs = np.where((natures < 1) & (evs == 0), 0, 31)
+    return np.floor((np.floor((2*base + ivs + evs // 4) * level / 100) + 5) * natures).astype(np.int64)
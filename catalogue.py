@@ -0,0 +1,56 @@
+"""Catalogue of the formats and ratings there is data for.
+
+Read from the format list and date file written by update.
+"""
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Format:
+    """A format, such as gen9ou, and the ratings there is data for."""
+    name: str
+    battles: int  # Number of battles played, across all ratings.
+    counters: bool  # Whether there is checks and counters data.
+    ratings: tuple  # Of str, such as "0" and "1500".
+
+    def datasets(self):
+        """Dataset names for each rating, such as gen9ou-1500."""
+        return [self.name + "-" + rating for rating in self.ratings]
+
+
+@dataclass(frozen=True)
+class Catalogue:
+    """Every format there is data for."""
+    date: str  # Month the data is from, such as "October 2026".
+    formats: tuple  # Of Format, most played first.
+    datasets: frozenset  # Of str, every dataset name across all formats.
+
+    def __contains__(self, dataset):
+        return dataset in self.datasets
+
+
+def load_catalogue(formats_file, date_file):
+    """Read the catalogue.
+
+    Args:
+        formats_file (str): Path to the format list. Each line looks like: gen9ou 123456 C 0,1500,1695,1825
+        where C means there is counters data (N if not).
+        date_file (str): Path to the file holding the month the data is from.
+
+    Returns:
+        Catalogue: Formats in the order listed, which is most played first.
+
+    Raises:
+        FileNotFoundError: if either file doesn't exist.
+    """
+    with open(date_file, encoding="utf-8") as f:
+        date = f.read()
+
+    formats = []
+    with open(formats_file, encoding="utf-8") as f:
+        for line in f.read().splitlines():
+            name, battles, counters, ratings = line.split(" ")
+            formats.append(Format(name, int(battles), counters == "C", tuple(ratings.split(","))))
+
+    datasets = frozenset(dataset for form in formats for dataset in form.datasets())
+    return Catalogue(date, tuple(formats), datasets)
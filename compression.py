@@ -0,0 +1,97 @@
+"""Compresses responses for clients that accept it.
+
+Brotli is used when the brotli package is installed and the client accepts it. Otherwise gzip is used.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Optional. gzip is always available.
+    brotli = None
+
+MIN_BYTES_DEFAULT = 1024  # Smaller bodies barely shrink, and aren't worth the time.
+COMPRESSIBLE_MIMETYPES = {"text/html", "text/plain", "text/css", "text/javascript", "text/xml",
+                          "application/javascript", "application/json", "application/xml", "application/manifest+json",
+                          "application/octet-stream", "image/svg+xml"}
+
+# Dynamic responses are compressed on every request, so favour speed.
+# Static files are compressed once, so favour size.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+
+def encodings():
+    """Supported encodings, most preferred first."""
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def best_encoding(accept_encodings):
+    """Pick the encoding to send.
+
+    Args:
+        accept_encodings (werkzeug Accept): The request's Accept-Encoding header.
+
+    Returns:
+        str or None: "br" or "gzip", or None if the client accepts neither.
+    """
+    return accept_encodings.best_match(encodings())
+
+
+def compressible(mimetype):
+    """Whether responses of a mimetype are worth compressing."""
+    return mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def compress(body, encoding, static=False):
+    """Compress a body.
+
+    Args:
+        body (bytes): What to compress.
+        encoding (str): "br" or "gzip".
+        static (bool): Compress as well as possible, for bodies that are compressed once and kept.
+
+    Returns:
+        bytes: Compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    # mtime is fixed so the same body always compresses to the same bytes, and keeps its ETag.
+    return gzip.compress(body, STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept_encodings, min_bytes):
+    """Compress a response in place, if the client accepts it and it is worth it.
+
+    Responses that are streamed, already encoded or already negotiated an encoding
+    (those with Vary: Accept-Encoding) are left alone.
+
+    Args:
+        response (flask Response): Response to compress.
+        accept_encodings (werkzeug Accept): The request's Accept-Encoding header.
+        min_bytes (int): Bodies smaller than this are sent as they are.
+
+    Returns:
+        flask Response: response.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or "accept-encoding" in response.vary
+            or not compressible(response.mimetype)):
+        return response
+
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = best_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + "-" + encoding, weak)
+    return response
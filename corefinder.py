@@ -3,16 +3,17 @@
 Cores are groups of 2 or more Pokemon that are commonly used together.
 """
 
-from networkx.algorithms import clique
-from networkx.algorithms.approximation import greedy_tsp as tsp
-from networkx import Graph
+import ujson as json
 import numpy as np
-from collections import Counter
+import metrics
 
 TARGET_EDGES_DEFAULT = 100
 USAGE_WEIGHT_DEFAULT = 1
 MAX_EDGES = 500
 MIN_EDGES = 5
+EDGE_CACHE_SIZE = 8  # Usage weights kept per metagame.
+ORDERING_STARTS = 4
+MAX_2OPT_PASSES = 50  # 2-opt usually converges in a handful of passes. This just bounds the worst case.
 
 
 class CoreFinder:
@@ -21,8 +22,8 @@ class CoreFinder:
     def __init__(self, md, usage_weight, target_edges):
         """Load metagame data and preferences.
 
-        Construct a graph with edges where a score based on
-        teammate probabilities is greater than the score requirement.
+        Construct a graph with an edge for each of the target_edges
+        pairs with the best score based on teammate probabilities.
 
         Args:
             md (MetagameData): Metagame to find cores in.
@@ -33,18 +34,17 @@ class CoreFinder:
             target_edges (int >= 1):
             Higher target_edges makes more and larger cores (and takes longer to run).
         """
-        self.pokemon_names = list(md.pokemon.keys())
-        usages = [md.pokemon[poke]["usage"] ** usage_weight for poke in md.pokemon]
+        with metrics.span("corefinder.graph"):
+            self.pokemon_names = md.names
+            num_pokes = len(self.pokemon_names)
 
-        core_matrix = np.array(md.team_matrix)
-        core_matrix *= usages
-        np.fill_diagonal(core_matrix, 0)
-        core_matrix *= core_matrix.transpose()
-
-        num_edges = len(md.pokemon) ** 2
-        core_matrix = core_matrix > np.quantile(core_matrix, max(.5, 1 - target_edges * 2 / num_edges))
-
-        self.graph = Graph(core_matrix)
+            # At most half of all pairs can be edges.
+            num_edges = min(int(target_edges), num_pokes ** 2 // 4)
+            rows, columns = _sorted_edges(md, usage_weight, max(num_edges, MAX_EDGES))
+            self._adjacency = [0] * num_pokes
+            for x, y in zip(rows[:num_edges].tolist(), columns[:num_edges].tolist()):
+                self._adjacency[x] |= 1 << y
+                self._adjacency[y] |= 1 << x
 
     def find_cores(self):
         """Find cores.
@@ -56,26 +56,215 @@ class CoreFinder:
             list of list of str: List of lists of Pokemon Names. Each sublist
             corresponds to a core, containing the Pokemon within it.
         """
-        cores = []
-        for x in clique.find_cliques(self.graph):
-            # One poke is not a core.
-            if len(x) >= 2:
-                cores.append(Counter([self.pokemon_names[y] for y in x]))
+        with metrics.span("corefinder.cliques"):
+            # One poke is not a core, so only Pokemon with at least one edge can be in one.
+            candidates = sum(1 << x for x, neighbours in enumerate(self._adjacency) if neighbours)
+            cores = list(_maximal_cliques(self._adjacency, candidates))
 
         if len(cores) == 0:
-            return []  # Trying to do TSP will cause an error, so we return now.
-
-        cores_graph = Graph()
-        for index1, core1 in enumerate(cores):
-            for index2, core2 in enumerate(cores[:index1]):
-                weight = (core1 - core2).total() + (core2 - core1).total()
-                cores_graph.add_edge(index1, index2, weight=weight)
-
-        # We use TSP so we can put similar cores next to each other in the display.
-        # The distance between cores is the number of things different between them.
-        # We build a path that minimizes the distance between cores.
-        ordered_indices = tsp(cores_graph)  # This is a cycle. We want a shortest path, so we need to break an edge.
-        longest_edge = max(range(len(ordered_indices)-1), key=lambda k: cores_graph[ordered_indices[k]][ordered_indices[k+1]]["weight"])
-        ordered_indices = ordered_indices[longest_edge+1:-1] + ordered_indices[:longest_edge+1]
-        assert len(ordered_indices) == len(cores)
-        return [sorted(cores[i].elements()) for i in ordered_indices]
+            return []
+
+        with metrics.span("corefinder.ordering"):
+            # We order cores so that similar cores are next to each other in the display.
+            # The distance between cores is the number of things different between them.
+            # We build a short path through all of them, like a travelling salesman.
+            order = _order(_distances(cores, len(self._adjacency)))
+
+        return [sorted(self.pokemon_names[x] for x in cores[i]) for i in order]
+
+
+def save_default_cores(md, path):
+    """Find cores with the default settings and store them, so they can be served without a CoreFinder.
+
+    Args:
+        md (MetagameData): Metagame to find cores in.
+        path (str): File to write.
+    """
+    cores = CoreFinder(md, USAGE_WEIGHT_DEFAULT, TARGET_EDGES_DEFAULT).find_cores()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"usage_weight": USAGE_WEIGHT_DEFAULT, "target_edges": TARGET_EDGES_DEFAULT, "cores": cores}, f)
+
+
+def load_default_cores(path, usage_weight, target_edges):
+    """Load cores stored by save_default_cores, if they were found with the given settings.
+
+    Returns:
+        list of list of str or None: As CoreFinder.find_cores, or None if the settings differ,
+        such as when the defaults have changed since the file was written.
+
+    Raises:
+        FileNotFoundError: if there is no such file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        stored = json.load(f)
+    if stored["usage_weight"] != usage_weight or stored["target_edges"] != int(target_edges):
+        return None
+    return stored["cores"]
+
+
+def _sorted_edges(md, usage_weight, limit):
+    """Find the highest scoring pairs of Pokemon, based on teammate probabilities.
+
+    Kept in md.core_edges, so changing target_edges only needs a slice of the result,
+    and nothing outlives the metagame it was found in.
+
+    Args:
+        md (MetagameData): Metagame to find edges in.
+        usage_weight (float >= 0): As for CoreFinder.
+        limit (int): Most edges to return.
+
+    Returns:
+        (1d numpy array of int, 1d numpy array of int): Indices of the two Pokemon in each edge, best edge first.
+        Only pairs with a positive score are included.
+    """
+    cached = md.core_edges.get(usage_weight)
+    if cached is not None and cached[0] >= limit:
+        return cached[1][:limit], cached[2][:limit]
+
+    usages = md.usages ** usage_weight
+
+    core_matrix = np.array(md.team_matrix)
+    core_matrix *= usages
+    np.fill_diagonal(core_matrix, 0)
+    core_matrix *= core_matrix.transpose()
+
+    rows, columns = np.triu_indices(len(core_matrix), 1)
+    scores = core_matrix[rows, columns]
+    positive = np.flatnonzero(scores > 0)
+    if len(positive) > limit:
+        positive = positive[np.argpartition(-scores[positive], limit - 1)[:limit]]
+    best = positive[np.argsort(-scores[positive], kind="stable")]
+    rows, columns = rows[best], columns[best]
+
+    if usage_weight not in md.core_edges and len(md.core_edges) >= EDGE_CACHE_SIZE:
+        del md.core_edges[next(iter(md.core_edges))]  # Oldest first.
+    md.core_edges[usage_weight] = (limit, rows, columns)
+    return rows, columns
+
+
+def _bits(bitset):
+    """Indices of set bits, lowest first."""
+    while bitset:
+        lowest = bitset & -bitset
+        yield lowest.bit_length() - 1
+        bitset ^= lowest
+
+
+def _maximal_cliques(adjacency, candidates):
+    """Bron-Kerbosch with pivoting, over int bitsets.
+
+    Args:
+        adjacency (list of int): Bitset of neighbours for each vertex. No self loops.
+        candidates (int): Bitset of vertices to consider.
+
+    Yields:
+        list of int: Vertices of each maximal clique.
+    """
+    def expand(clique, possible, excluded):
+        if not possible:
+            if not excluded:
+                yield clique
+            return
+
+        # Pivot on the vertex with the most neighbours left to try, as those don't need their own branch.
+        pivot = max(_bits(possible | excluded), key=lambda v: (possible & adjacency[v]).bit_count())
+        for v in _bits(possible & ~adjacency[pivot]):
+            yield from expand(clique + [v], possible & adjacency[v], excluded & adjacency[v])
+            possible &= ~(1 << v)
+            excluded |= 1 << v
+
+    if candidates:
+        yield from expand([], candidates, 0)
+
+
+def _distances(cores, n):
+    """Size of the symmetric difference between each pair of cores.
+
+    Args:
+        cores (list of list of int): Members of each core.
+        n (int): Number of Pokemon.
+
+    Returns:
+        2d numpy array of int: distances[x, y] is how many Pokemon are in exactly one of cores x and y.
+    """
+    membership = np.zeros((len(cores), n), dtype=np.float32)
+    for index, core in enumerate(cores):
+        membership[index, core] = 1
+    sizes = membership.sum(axis=1)
+    shared = membership @ membership.T
+    return np.rint(sizes[:, None] + sizes[None, :] - 2 * shared).astype(np.int32)
+
+
+def _order(distances):
+    """Find a short path visiting every core once, with nearest neighbour then 2-opt.
+
+    Args:
+        distances (2d numpy array of int): Symmetric distances between cores.
+
+    Returns:
+        list of int: Indices of cores in path order.
+    """
+    count = len(distances)
+    if count <= 2:
+        return list(range(count))
+
+    # A dummy stop, at distance 0 from everything, turns the path into a cycle.
+    # Cutting the cycle at the dummy gives back a path, with ends wherever is best.
+    extended = np.zeros((count + 1, count + 1), dtype=distances.dtype)
+    extended[:count, :count] = distances
+
+    # 2-opt finds a local optimum, so try a few starting paths and keep the best.
+    best, best_length = None, None
+    for start in np.linspace(0, count - 1, min(count, ORDERING_STARTS), dtype=int):
+        tour = _two_opt(extended, np.append(count, _nearest_neighbour(distances, start)))
+        length = int(extended[tour, np.roll(tour, -1)].sum())
+        if best is None or length < best_length:
+            best, best_length = tour, length
+    return [int(x) for x in best[1:]]
+
+
+def _nearest_neighbour(distances, start):
+    """Tour that always goes to the closest unvisited stop.
+
+    Returns:
+        1d numpy array of int: Stops in order, beginning with start.
+    """
+    count = len(distances)
+    visited = np.zeros(count, dtype=bool)
+    tour = np.empty(count, dtype=np.intp)
+    current = start
+    for step in range(count):
+        tour[step] = current
+        visited[current] = True
+        if step < count - 1:
+            row = np.where(visited, np.iinfo(distances.dtype).max, distances[current])
+            current = int(np.argmin(row))
+    return tour
+
+
+def _two_opt(distances, tour):
+    """Improve a tour by reversing segments while that shortens it.
+
+    The first stop is kept in place.
+
+    Returns:
+        1d numpy array of int: Improved tour.
+    """
+    count = len(tour)
+    tour = tour.copy()
+    for _ in range(MAX_2OPT_PASSES):
+        improved = False
+        for i in range(1, count - 1):
+            # Reversing tour[i:j+1] replaces edges (a, b) and (c, e) with (a, c) and (b, e).
+            a, b = tour[i - 1], tour[i]
+            c = tour[i + 1:]
+            e = np.append(tour[i + 2:], tour[0])
+            delta = distances[a, c] + distances[b, e] - distances[a, b] - distances[c, e]
+            best = int(np.argmin(delta))
+            if delta[best] < 0:
+                j = i + 1 + best
+                tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return tour
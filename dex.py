@@ -1,23 +1,141 @@
 """Retrieves dex data (item/move/Pokemon data) for a given generation.
 This includes base stats, descriptions, typing, and more.
 This does not include data that can depend on the metagame, such as what abilities or moves a Pokemon uses.
+
+Each section of a generation's dex is stored in its own file, and only read when it is first used,
+so a page about an item never loads every move's description.
 """
+from types import MappingProxyType
+
 import ujson as json
 
+import metrics
+from file_constants import DEX_PREFIX, DEX_SUFFIX
+
+SECTIONS = ("pokemon", "items", "moves", "abilities", "base_stats_short")
+TRIMMED_SECTIONS = ("pokemon", "items", "moves", "abilities")  # Keyed by name, so entries can be dropped.
+
+
+def dex_file(gen):
+    """Name of the file holding a generation's whole dex, as the dex build writes it."""
+    return DEX_PREFIX + str(gen) + DEX_SUFFIX
+
+
+def section_file(gen, section):
+    """Name of the file holding one section of a generation's dex, such as gen9.dex.moves."""
+    return dex_file(gen) + "." + section
+
+
+def _frozen(section):
+    return tuple(section) if isinstance(section, list) else MappingProxyType(section)
+
 
 class Dex:
-    """Access to Pokedex data.
-    Initialize with a dex file, and then access like:
+    """Read-only access to Pokedex data.
+    Initialize with a generation, and then access like:
     dex.pokemon["Machamp"] or dex.items["Choice Scarf"]
+
+    Sections are shared by every request, so they are given out as read-only views.
     """
-    def __init__(self, dex_file):
-        """Load dex data from file.
+    __slots__ = ("gen", "_path", "_pokemon", "_items", "_moves", "_abilities", "_base_stats_short")
+
+    def __init__(self, gen, path=str):
+        """Prepare to load dex data. Nothing is read until a section is used.
 
         Args:
-            dex_file (str): Path to file containing dex data.
+            gen (str): Generation, such as "9".
+            path (callable): Turns a file name into a path that can be opened. Names are used as they are by default.
+        """
+        self.gen = gen
+        self._path = path
+        for section in SECTIONS:
+            setattr(self, "_" + section, None)
+
+    @property
+    def pokemon(self):
+        """Mapping of Pokemon name to types and base stats."""
+        return self._section("pokemon")
+
+    @property
+    def items(self):
+        """Mapping of item name to description."""
+        return self._section("items")
+
+    @property
+    def moves(self):
+        """Mapping of move name to type, category, power, accuracy, pp, priority and descriptions."""
+        return self._section("moves")
+
+    @property
+    def abilities(self):
+        """Mapping of ability name to descriptions."""
+        return self._section("abilities")
+
+    @property
+    def base_stats_short(self):
+        """Short names of the stats of this generation, in order."""
+        return self._section("base_stats_short")
+
+    def _section(self, section):
+        value = getattr(self, "_" + section)
+        return self._load(section) if value is None else value
+
+    def _load(self, section):
+        """Read one section. If it hasn't been split into its own file, every section is read from the whole dex.
+
+        Two threads may both read a section the first time it is used. Either copy is fine to keep.
         """
-        with open(dex_file, "r", encoding="utf-8") as file:
-            self.data = json.load(file)
+        with metrics.span("load_dex"):
+            try:
+                with open(self._path(section_file(self.gen, section)), "r", encoding="utf-8") as file:
+                    data = {section: json.load(file)}
+            except FileNotFoundError:
+                with open(self._path(dex_file(self.gen)), "r", encoding="utf-8") as file:
+                    data = json.load(file)
+
+        for name, value in data.items():
+            if name in SECTIONS and getattr(self, "_" + name) is None:
+                setattr(self, "_" + name, _frozen(value))
+        return getattr(self, "_" + section)
+
+
+def split_dex(dex_path, directory, gen, used=None):
+    """Write each section of a whole dex file to its own file.
 
-    def __getattr__(self, item):  # Allows for dex.pokemon["Machamp"] instead of dex["pokemon"]["Machamp"]
-        return self.data[item]
+    Args:
+        dex_path (str): Path to the whole dex file.
+        directory (str): Where to write the section files.
+        gen (str): Generation of the dex.
+        used (dict or None): Section name -> set of names used by the formats of this generation.
+            Entries of the trimmable sections that aren't used are left out. Nothing is left out by default.
+
+    Returns:
+        dict: Section name -> number of entries written.
+    """
+    with open(dex_path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+
+    written = {}
+    for section in SECTIONS:
+        entries = data[section]
+        if used is not None and section in TRIMMED_SECTIONS:
+            entries = {name: entry for name, entry in entries.items() if name in used[section]}
+        with open(directory + section_file(gen, section), "w", encoding="utf-8") as file:
+            json.dump(entries, file, ensure_ascii=False)
+        written[section] = len(entries)
+    return written
+
+
+def used_names(metagame_data):
+    """Find the dex entries a format uses.
+
+    Args:
+        metagame_data (dict): A format's parsed JSON, after the dex build has named its moves, items and abilities.
+
+    Returns:
+        dict: Trimmable section name -> set of names.
+    """
+    return {"pokemon": set(metagame_data["pokemon"]),
+            "items": set(metagame_data["items"]),
+            "moves": set(metagame_data["moves"]),
+            "abilities": set(metagame_data["abilities"])}
@@ -4,9 +4,11 @@ TEMP_DATA_DIR = "./datasets_temp/"
 FORMATS_FILE = "all_formats"
 THREAT_FILE = "_threats.npy"
 TEAMMATE_FILE = "_team.npy"
+CORES_FILE = "_cores"  # Not .json, so it is never taken for a dataset.
 TEMP_COUNTERS_FILE = "_counters.tmp"
 DEX_PREFIX = "gen"
 DEX_SUFFIX = ".dex"
 DATE_FILE = "date"
+USAGE_INDEX_FILE = "usage_index"
 TEST_DATA_DIR = "./test_data/"
 CUSTOM_TEST_DATA_DIR = TEST_DATA_DIR + "custom_test_data/"
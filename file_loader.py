@@ -1,29 +1,71 @@
 """Provides a transparent interface between s3 and local files.
 If the file exists locally, it loads that. Otherwise, it fetches it from S3.
-It does so lazily, so that files which aren't needed aren't fetched."""
+It does so lazily, so that files which aren't needed aren't fetched.
+
+Local files are managed by an ArtifactCache, so concurrent requests for a missing file
+share one download, and the local copy is bounded in size.
+"""
 
 import boto3
 import os
+import threading
 from botocore.exceptions import ClientError
+from artifact_cache import ArtifactCache, LocalDirSource
 from file_constants import DATA_DIR
 
+CACHE_MAX_BYTES_DEFAULT = 2 * 1024 ** 3
+
+
+class S3Source:
+    """Fetches files from the S3 bucket. The connection is made on first use."""
+
+    def __init__(self):
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def bucket(self):
+        with self._lock:
+            if self._bucket is None:
+                s3_session = boto3.session.Session(aws_access_key_id=os.environ["S3_ACCESS_KEY"],
+                                                   aws_secret_access_key=os.environ["S3_SECRET_KEY"])
+                self._bucket = s3_session.resource("s3", endpoint_url=os.environ["S3_ENDPOINT"]) \
+                    .Bucket(os.environ["BUCKET"])
+            return self._bucket
+
+    def fetch(self, key, file):
+        """Write the object named key to file.
+
+        Returns:
+            str or None: md5 hex digest of the object, or None if S3 doesn't provide one.
+
+        Raises:
+            FileNotFoundError: if the object can't be fetched.
+        """
+        try:
+            obj = self.bucket.Object(key).get()
+        except ClientError as e:
+            raise FileNotFoundError(e)
+
+        for chunk in obj["Body"].iter_chunks():
+            file.write(chunk)
+
+        etag = obj["ETag"].strip('"')
+        return None if "-" in etag else etag  # Multipart uploads don't use the md5 as their ETag.
+
+
+def _source():
+    """Use a local directory in place of S3 if LOCAL_BUCKET_DIR is set."""
+    if os.environ.get("LOCAL_BUCKET_DIR"):
+        return LocalDirSource(os.environ["LOCAL_BUCKET_DIR"])
+    return S3Source()
+
 
 class DataFilePath(os.PathLike):
-    s3_session = boto3.session.Session(aws_access_key_id=os.environ["S3_ACCESS_KEY"],
-                                       aws_secret_access_key=os.environ["S3_SECRET_KEY"])
-    s3_bucket = s3_session.resource("s3", endpoint_url=os.environ["S3_ENDPOINT"]).Bucket(os.environ["BUCKET"])
-    # TODO s3_bucket maybe should be a singleton?
+    cache = ArtifactCache(_source(), DATA_DIR, int(os.environ.get("CACHE_MAX_BYTES", CACHE_MAX_BYTES_DEFAULT)))
 
     def __init__(self, filename):
         self.filename = filename
-        
+
     def __fspath__(self):
-        path = DATA_DIR + self.filename
-        if os.path.exists(path):
-            return path
-        else:
-            try:
-                DataFilePath.s3_bucket.download_file(self.filename, path)
-                return path
-            except ClientError as e:
-                raise FileNotFoundError(e)
+        return DataFilePath.cache.path(self.filename)
@@ -0,0 +1,177 @@
+"""Runs CPU-heavy work, such as team analysis and core finding, in a pool of worker processes.
+
+Each request waits at most a deadline for its result. Once enough work is running or queued,
+new work is rejected immediately instead of tying up a request thread, so cheap pages stay responsive.
+
+The deadline only bounds how long a request waits. Work that overruns it keeps running in its worker,
+and keeps its slot, until it finishes, so it still counts towards the limit on running and queued work.
+
+Worker processes only import this module and what it needs, not main,
+as long as the site is started from server.py rather than main.py.
+"""
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import threading
+
+import analyze
+import corefinder
+import metrics
+import rating_blend
+from file_constants import *
+from file_loader import DataFilePath
+
+PROCESSES_DEFAULT = 2
+QUEUE_DEFAULT = 2
+TIMEOUT_DEFAULT = 20
+MD_CACHE_SIZE = 16  # Per worker process.
+BLEND_CACHE_SIZE = 4  # Per worker process. Each holds every rating's matrices for a format.
+
+
+class Overloaded(Exception):
+    """Used to indicate that too much work is already running or queued."""
+    pass
+
+
+class DeadlineExceeded(Exception):
+    """Used to indicate that work didn't finish before its deadline."""
+    pass
+
+
+class JobPool:
+    """Bounded pool of worker processes."""
+
+    def __init__(self, processes, queue, timeout):
+        """Configure pool. Processes are started on first use.
+
+        Args:
+            processes (int >= 0): Number of worker processes.
+            0 runs work on the calling thread, still limited by queue but without deadlines.
+
+            queue (int >= 0): How much work can wait for a free process before more is rejected.
+
+            timeout (float > 0): Seconds to wait for a result.
+        """
+        self.processes = processes
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(processes, 1) + queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def run(self, fn, *args, inline=False):
+        """Run fn(*args) in the pool and return its result.
+
+        fn and args must be picklable, so fn has to be a module-level function.
+        With inline set, fn runs on the calling thread instead, still taking a slot (used when an admin profiles a request).
+
+        Raises:
+            Overloaded: if too much work is already running or queued.
+            DeadlineExceeded: if the result isn't ready within the timeout. The work isn't stopped.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+
+        if inline or not self.processes:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._get_executor().submit(_call_with_spans, fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # Work that misses its deadline keeps its slot until it actually finishes, so abandoned work still counts.
+        future.add_done_callback(lambda f: self._slots.release())
+        try:
+            result, spans = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DeadlineExceeded()
+        except concurrent.futures.BrokenExecutor:
+            self.reset()
+            raise
+
+        metrics.record_stages(spans)
+        return result
+
+    def reset(self, wait=False):
+        """Stop the worker processes. New ones start on next use, without any cached data.
+
+        Args:
+            wait (bool): Wait for running work to finish and the processes to exit.
+        """
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork, as the server process has threads running.
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+
+def _call_with_spans(fn, *args):
+    """Run fn(*args) in a worker process, returning its result along with the spans it recorded."""
+    with metrics.capture() as spans:
+        result = fn(*args)
+    return result, spans
+
+
+@functools.lru_cache(maxsize=MD_CACHE_SIZE)
+def _get_md(dataset):
+    """Get MetagameData object for a format, within a worker process."""
+    with metrics.span("load_metagame"):
+        metagame = DataFilePath(dataset + ".json")
+        threats = DataFilePath(dataset + THREAT_FILE)
+        team = DataFilePath(dataset + TEAMMATE_FILE)
+        return analyze.MetagameData(metagame, threats, team, mmap=os.environ.get("SHARED_MATRICES") == "1")
+
+
+@functools.lru_cache(maxsize=BLEND_CACHE_SIZE)
+def _get_blend(format_name, ratings):
+    """Get every rating of a format aligned, within a worker process."""
+    with metrics.span("load_blend"):
+        return rating_blend.load_blend(format_name, ratings, _get_md)
+
+
+def clear_caches():
+    """Forget data loaded in this process. Worker processes are replaced instead, so this is for jobs run inline."""
+    _get_md.cache_clear()
+    _get_blend.cache_clear()
+
+
+def analyze_team(dataset, team, weights):
+    """Run MetagameData.analyze for a format."""
+    return _get_md(dataset).analyze(team, weights)
+
+
+def analyze_team_columns(dataset, team, weights):
+    """Run MetagameData.analyze_columns for a format."""
+    return _get_md(dataset).analyze_columns(team, weights)
+
+
+def find_cores(dataset, usage_weight, target_edges):
+    """Run CoreFinder for a format."""
+    return corefinder.CoreFinder(_get_md(dataset), usage_weight, target_edges).find_cores()
+
+
+def recommend_blend(format_name, ratings, team, weights, rating_weights, limit):
+    """Run RatingBlend.recommend for every rating of a format.
+
+    Returns:
+        As from RatingBlend.recommend, or None if some of the team isn't in any of the ratings.
+    """
+    blend = _get_blend(format_name, tuple(ratings))
+    if any(poke not in blend.pokemon for poke in team):
+        return None
+    with metrics.span("analyze.blend"):
+        return blend.recommend(team, weights, rating_weights, limit)
@@ -1,66 +1,395 @@
 """Handles routing, serving, and preparing pages."""
+import base64
+import dataclasses
 import functools
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from math import floor, isfinite
 
 from flask import (Flask, render_template, request,
-                   redirect, abort, url_for)
+                   redirect, abort, url_for, jsonify, g, Response, send_file, make_response,
+                   before_render_template, template_rendered)
 
 from waitress import serve
+import numpy as np
 import analyze
+import catalogue
+import compression
 import update
+import usage_index
 import corefinder
 import dex
+import speed_index
+import prefork
+import jobs
+import metrics
+import paging
+import profiling
+import response_cache
+import search_index
+import static_assets
 import os
 from file_constants import *
 from file_loader import DataFilePath
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)  # Static files are served by static below.
 app.config.from_object(__name__)
 app.jinja_env.trim_blocks = True
 app.jinja_env.lstrip_blocks = True
 app.jinja_env.policies['json.dumps_kwargs'] = {'sort_keys': False, 'ensure_ascii': False}
 app.config["SECRET_KEY"] = os.environ["FLASK_SECRET_KEY"]
 
+WARMUP_SECONDS_DEFAULT = 60
+WARMUP_WORKERS_DEFAULT = 4
+RETRY_AFTER_SECONDS = 5
+CORES_CACHE_SIZE = 256
+ANALYSIS_CACHE_SIZE = 128  # Teams, so paging through an analysis doesn't redo it.
+NAMES_MAX_AGE = 365 * 24 * 60 * 60  # Name tables are requested by version, so a version never changes.
+PAGE_CACHE_BYTES_DEFAULT = 64 * 1024 ** 2
+PAGE_MAX_AGE_DEFAULT = 10 * 60
+STATIC_MAX_AGE = 365 * 24 * 60 * 60  # Static URLs carry a hash of the file, so a versioned URL never changes.
+MATRICES_CACHE_SIZE = 8
+SEARCH_CACHE_SIZE = 64  # Formats and kinds, such as gen9ou-1500 moves.
+USAGE_PAGES = {"pokemon": ("display_pokemon", "poke", "Pokémon"), "items": ("display_item", "item", "Item"),
+               "moves": ("display_move", "move", "Move"), "abilities": ("display_ability", "abil", "Ability")}
+
+# Analysis and core finding run here, so they can't occupy every request thread.
+job_pool = jobs.JobPool(int(os.environ.get("ANALYSIS_PROCESSES", jobs.PROCESSES_DEFAULT)),
+                        int(os.environ.get("ANALYSIS_QUEUE", jobs.QUEUE_DEFAULT)),
+                        float(os.environ.get("ANALYSIS_TIMEOUT", jobs.TIMEOUT_DEFAULT)))
+
+# Pages that only depend on their URL and the data are kept once rendered.
+page_cache = response_cache.ResponseCache(int(os.environ.get("PAGE_CACHE_BYTES", PAGE_CACHE_BYTES_DEFAULT)))
+page_max_age = int(os.environ.get("PAGE_MAX_AGE", PAGE_MAX_AGE_DEFAULT))
+compress_min_bytes = int(os.environ.get("COMPRESS_MIN_BYTES", compression.MIN_BYTES_DEFAULT))
+static_files = static_assets.StaticAssets(os.path.join(app.root_path, "static"))
+# Formats with at most this many Pokemon score recommendations in the browser. 0 turns this off.
+client_scoring_max = int(os.environ.get("CLIENT_SCORING_MAX_POKEMON", 0))
+data_generation = 0  # Increases whenever the data files are replaced, so pages rendered from older data aren't kept.
+
+profiler = profiling.Profiler(os.environ.get("PROFILE_DIR", profiling.PROFILE_DIR_DEFAULT),
+                              int(os.environ.get("PROFILE_MAX", profiling.MAX_PROFILES_DEFAULT)),
+                              float(os.environ["PROFILE_SLOW_MS"]) if "PROFILE_SLOW_MS" in os.environ else None,
+                              float(os.environ.get("PROFILE_SAMPLE_RATE", profiling.SAMPLE_RATE_DEFAULT)))
+
+
+@functools.lru_cache(maxsize=1)
+def get_catalogue():
+    """Get the formats there is data for. Kept until the data is replaced.
+
+    Raises:
+        FileNotFoundError: if there is no format list.
+    """
+    return catalogue.load_catalogue(DataFilePath(FORMATS_FILE), DataFilePath(DATE_FILE))
+
+
+def _check_dataset(dataset):
+    """Abort with 404 if the format list doesn't have dataset, so made up names never reach storage."""
+    try:
+        formats = get_catalogue()
+    except FileNotFoundError:  # Without a format list, leave it to loading the data.
+        return
+    if dataset not in formats:
+        abort(404)
+
 
 @functools.lru_cache(maxsize=64, typed=False)
 def get_md(dataset):
     """Get MetagameData object for a format."""
+    _check_dataset(dataset)
     try:
-        metagame = DataFilePath(dataset + ".json")  # TODO maybe don't hardcode
-        threats = DataFilePath(dataset + THREAT_FILE)
-        team = DataFilePath(dataset + TEAMMATE_FILE)
-        return analyze.MetagameData(metagame, threats, team)
+        with metrics.span("load_metagame"):
+            metagame = DataFilePath(dataset + ".json")  # TODO maybe don't hardcode
+            threats = DataFilePath(dataset + THREAT_FILE)
+            team = DataFilePath(dataset + TEAMMATE_FILE)
+            return analyze.MetagameData(metagame, threats, team, mmap=os.environ.get("SHARED_MATRICES") == "1")
     except FileNotFoundError:
         abort(404)
 
 
 @functools.lru_cache(maxsize=12, typed=False)
 def get_dex(gen):
-    """Get generation appropriate dex for a format."""
-    try:
-        return dex.Dex(DataFilePath(DEX_PREFIX + gen + DEX_SUFFIX))
-    except FileNotFoundError:
+    """Get generation appropriate dex for a format. Its sections are loaded as templates use them.
+
+    Aborts with 500 if there is no dex for the generation, rather than failing partway through a template.
+    """
+    # The smallest section, or the whole dex if it hasn't been split.
+    for name in (dex.section_file(gen, "base_stats_short"), dex.dex_file(gen)):
+        try:
+            os.fspath(DataFilePath(name))
+            break
+        except FileNotFoundError:
+            pass
+    else:
         abort(500)
+    return dex.Dex(gen, DataFilePath)
+
+
+@functools.lru_cache(maxsize=1)
+def get_usage_index():
+    """Get where everything is used across formats. Kept until the data is replaced."""
+    try:
+        with metrics.span("load_usage_index"):
+            return usage_index.UsageIndex(DataFilePath(USAGE_INDEX_FILE))
+    except FileNotFoundError:  # Data from before the index was built.
+        abort(404)
+
+
+def _usage_postings(kind, name):
+    """Every format and rating using something, most used first. Aborts with 404 if nothing does."""
+    if kind not in usage_index.KINDS:
+        abort(404)
+    postings = get_usage_index().lookup(kind, name)
+    if not postings:
+        abort(404)
+    return postings
+
+
+def _cached_page(view):
+    """Cache a view's rendered output, and answer conditional requests for it without rendering.
+
+    Only for views whose output depends on nothing but their URL arguments and the data files.
+    Only GET and HEAD requests are cached. Others, such as POSTs to a view that accepts them, are rendered every time.
+    """
+    @functools.wraps(view)
+    def cached_view(**kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(**kwargs)
+
+        # Each encoding is stored separately, with its own ETag, and compressed only once.
+        key = (view.__name__, tuple(sorted(kwargs.items())), data_generation)
+        encoding = compression.best_encoding(request.accept_encodings)
+        entry = page_cache.get(key + (encoding,))
+        if entry is None:
+            plain = page_cache.get(key + (None,)) if encoding else None
+            if plain is None:
+                rendered = make_response(view(**kwargs))
+                if rendered.status_code != 200:
+                    return rendered
+                plain = page_cache.put(key + (None,), rendered.get_data(), rendered.mimetype)
+            entry = plain
+            if encoding and compression.compressible(plain.mimetype) and len(plain.body) >= compress_min_bytes:
+                entry = page_cache.put(key + (encoding,), compression.compress(plain.body, encoding),
+                                       plain.mimetype, encoding)
+
+        response = Response(entry.body, mimetype=entry.mimetype)
+        if entry.encoding:
+            response.headers["Content-Encoding"] = entry.encoding
+        if compression.compressible(entry.mimetype):
+            response.vary.add("Accept-Encoding")
+        response.set_etag(entry.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = page_max_age
+        return response.make_conditional(request)
+
+    return cached_view
+
+
+@app.route("/static/<path:filename>")
+def static(filename):
+    """Static files, compressed if the client accepts it.
+    With ?v=<version>, as added by url_for, the response can be cached forever."""
+    asset = static_files.get(filename)
+    if asset is None:
+        abort(404)
+
+    encoding = compression.best_encoding(request.accept_encodings)
+    if encoding not in asset.bodies:
+        encoding = None
+    response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+    response.set_etag(asset.version + ("-" + encoding if encoding else ""))
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if len(asset.bodies) > 1:
+        response.vary.add("Accept-Encoding")
+    if request.args.get("v") == asset.version:
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+@app.url_defaults
+def _version_static(endpoint, values):
+    """Add the file's version to static URLs, so they can be cached until the file changes."""
+    if endpoint == "static" and "v" not in values:
+        values["filename"] = values["filename"].lstrip("/")  # A leading slash would make a // URL, which redirects.
+        version = static_files.version(values["filename"])
+        if version:
+            values["v"] = version
+
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+    # ?profile=<UPDATE_PASS> profiles any request.
+    g.profile = profiler.start(forced=_is_admin(request.args.get("profile")))
+
+
+@app.teardown_request
+def _finish_profile(exc):
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profiler.finish(profile, request.method + " " + request.path)
+
+
+def _profiling_forced():
+    """Whether an admin asked for this request to be profiled.
+
+    Only then do jobs run on the request thread, so the profile includes them.
+    Sampled requests leave their jobs in the pool, where admission limits and deadlines apply.
+    """
+    profile = g.get("profile")
+    return profile is not None and profile.forced
+
+
+def _is_admin(key):
+    """Whether key is the admin password."""
+    return key is not None and key == os.environ.get("UPDATE_PASS")
+
+
+@app.after_request
+def _record_request(response):
+    """Record request latency by route, method and status."""
+    start = g.get("request_start")
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe(metrics.REQUEST_METRIC,
+                        (("route", route), ("method", request.method), ("status", str(response.status_code))),
+                        time.perf_counter() - start)
+    return response
+
+
+@app.after_request
+def _compress(response):
+    """Compress large text responses that weren't already, such as analysis results and JSON."""
+    return compression.compress_response(response, request.accept_encodings, compress_min_bytes)
+
+
+@before_render_template.connect_via(app)
+def _start_render(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def _record_render(sender, template, context, **extra):
+    metrics.record_stage("render." + template.name, time.perf_counter() - g.render_start)
+
+
+@app.route("/metrics")
+def metrics_page():
+    """Latency histograms and cache statistics for this process, in Prometheus text format."""
+    gauges = []
+    for name, cache in (("metagame", get_md), ("dex", get_dex), ("cores", _find_cores),
+                        ("analysis", _cached_analysis_columns), ("search", _search_index)):
+        info = cache.cache_info()
+        labels = {"cache": name}
+        gauges += [("poketeam_cache_hits_total", "counter", labels, info.hits),
+                   ("poketeam_cache_misses_total", "counter", labels, info.misses),
+                   ("poketeam_cache_entries", "gauge", labels, info.currsize),
+                   ("poketeam_cache_max_entries", "gauge", labels, info.maxsize)]
+
+    stats = DataFilePath.cache.stats()
+    for stat in ("hits", "misses", "downloads", "failures", "evictions"):
+        gauges.append(("poketeam_artifact_" + stat + "_total", "counter", {}, stats[stat]))
+    gauges += [("poketeam_artifact_files", "gauge", {}, stats["files"]),
+               ("poketeam_artifact_bytes", "gauge", {}, stats["bytes"])]
+
+    stats = page_cache.stats()
+    for stat in ("hits", "misses", "evictions"):
+        gauges.append(("poketeam_page_cache_" + stat + "_total", "counter", {}, stats[stat]))
+    gauges += [("poketeam_page_cache_entries", "gauge", {}, stats["entries"]),
+               ("poketeam_page_cache_bytes", "gauge", {}, stats["bytes"])]
+
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
+
+@app.errorhandler(jobs.Overloaded)
+@app.errorhandler(jobs.DeadlineExceeded)
+def server_busy(e):
+    """Tell the client to back off when heavy work is throttled."""
+    return ("The server is busy. Please try again in a few seconds.", 503,
+            {"Retry-After": str(RETRY_AFTER_SECONDS)})
 
 
 @app.route("/", methods=['GET', 'POST'])
+@_cached_page
 def select_data():
     """Page for selecting a format."""
-    with open(DataFilePath(DATE_FILE), encoding="utf-8") as date_fd:
-        date = date_fd.read()
+    formats = get_catalogue()
+    return render_template("DataSelector.html", date=formats.date, formats=formats.formats)
+
+
+@app.route("/api/formats")
+@_cached_page
+def formats_api():
+    """Every format there is data for, most played first, as JSON."""
+    formats = get_catalogue()
+    return jsonify({"date": formats.date, "formats": [dataclasses.asdict(form) for form in formats.formats]})
+
+
+@app.route("/usage/<kind>/<name>/")
+@_cached_page
+def usage_across_formats(kind, name):
+    """Page for how much every format and rating uses a Pokemon, item, move or ability."""
+    postings = _usage_postings(kind, name)
+    endpoint, argument, label = USAGE_PAGES[kind]
+    rows = [(posting, url_for(endpoint, dataset=posting.format + "-" + posting.rating, **{argument: name}))
+            for posting in postings]
+    return render_template("UsageAcrossFormats.html", kind=kind, label=label, name=name, rows=rows)
 
-    with open(DataFilePath(FORMATS_FILE), encoding="utf-8") as f:
-        top = f.read().splitlines()
-        formats = []
-        for metagame in top:
-            format_name, battles_played, counters, ratings = metagame.split(" ")
-            counters = counters == "C"
-            ratings = ratings.split(",")
-            formats.append((format_name, counters, battles_played, ratings))
 
-    return render_template("DataSelector.html", date=date, formats=formats)
+@app.route("/api/usage/<kind>/<name>")
+@_cached_page
+def usage_api(kind, name):
+    """Every format and rating using a Pokemon, item, move or ability, most used first, as JSON."""
+    return jsonify([posting._asdict() for posting in _usage_postings(kind, name)])
+
+
+def warm_up(num_formats, budget, workers=WARMUP_WORKERS_DEFAULT, wait_all=False):
+    """Fetch and load data for the most played formats ahead of any requests.
+
+    Args:
+        num_formats (int): Number of formats to load, most played first. Every rating of each is loaded.
+        budget (float): Seconds to spend before giving up on whatever hasn't loaded.
+        workers (int): Number of datasets to load at once.
+        wait_all (bool): Wait for loads already underway when the budget runs out,
+        so that no threads are left running (needed before forking).
+
+    Returns:
+        int: Number of datasets loaded.
+    """
+    start = time.monotonic()
+    try:
+        formats = get_catalogue().formats[:num_formats]
+    except FileNotFoundError:
+        print("Warm-up skipped - no format list.")
+        return 0
+
+    # Loading more than get_md can hold would just evict what we loaded first.
+    datasets = [dataset for form in formats for dataset in form.datasets()][:get_md.cache_info().maxsize]
+
+    executor = ThreadPoolExecutor(workers)
+    futures = [executor.submit(_warm_dataset, dataset) for dataset in datasets]
+    done, _ = wait(futures, timeout=budget)
+    executor.shutdown(wait=wait_all, cancel_futures=True)
+
+    loaded = sum(1 for future in done if future.exception() is None)
+    print("Warmed up " + str(loaded) + " of " + str(len(datasets)) + " datasets in "
+          + "{:.1f}".format(time.monotonic() - start) + "s.")
+    return loaded
+
+
+def _warm_dataset(dataset):
+    """Load a dataset and its dex into the caches."""
+    md = get_md(dataset)
+    get_dex(md.gen)
 
 
 @app.route("/pokemon/<dataset>/<poke>/")
+@_cached_page
 def display_pokemon(dataset, poke):
     """Page for displaying data for a specific Pokemon."""
     md = get_md(dataset)
@@ -69,20 +398,10 @@ def display_pokemon(dataset, poke):
 
     usage = md.pokemon[poke]["usage"]
 
-    if md.counters:
-        counters = sorted(md.find_counters(poke).items(), key=lambda kv: -kv[1])
-        for i in range(len(counters)):  # Only show things that actually counter.
-            if counters[i][1] <= 0:
-                counters = counters[:i]
-                break
-    else:
-        counters = None
-
-    teammates = sorted(md.partner_scores(poke).items(), key=lambda kv: -kv[1])
-    for i in range(len(teammates)):  # Only show positive teammates.
-        if teammates[i][1] <= 0:
-            teammates = teammates[:i]
-            break
+    counters = md.top_counters(poke)
+    teammates = md.top_partners(poke)
+    counters_total = int(np.count_nonzero(md.counter_ratings(poke) > 0)) if md.counters else 0
+    teammates_total = int(np.count_nonzero(md.partner_ratings(poke) > 0))
 
     items = list(md.pokemon[poke]["Items"].items())
     moves = list(md.pokemon[poke]["Moves"].items())
@@ -91,14 +410,15 @@ def display_pokemon(dataset, poke):
     return render_template("PokemonInfo.html",
                            poke=poke, dataset=dataset,
                            usage=usage,
-                           counters=counters,
-                           teammates=teammates, items=items,
+                           counters=counters, counters_total=counters_total,
+                           teammates=teammates, teammates_total=teammates_total, items=items,
                            moves=moves, abilities=abilities,
                            gen=md.gen,
                            dex=get_dex(md.gen))
 
 
 @app.route("/pokemon/<dataset>/")
+@_cached_page
 def pokedex(dataset):
     """Page for listing all Pokemon in a format."""
     md = get_md(dataset)
@@ -108,6 +428,7 @@ def pokedex(dataset):
 
 
 @app.route("/items/<dataset>/<item>/")
+@_cached_page
 def display_item(dataset, item):
     """Page for displaying information about an item."""
     md = get_md(dataset)
@@ -121,6 +442,7 @@ def display_item(dataset, item):
 
 
 @app.route("/items/<dataset>/")
+@_cached_page
 def item_dex(dataset):
     """Page for listing all items in a format."""
     md = get_md(dataset)
@@ -130,6 +452,7 @@ def item_dex(dataset):
 
 
 @app.route("/moves/<dataset>/<move>/")
+@_cached_page
 def display_move(dataset, move):
     """Page for information about a specific move."""
     md = get_md(dataset)
@@ -143,6 +466,7 @@ def display_move(dataset, move):
 
 
 @app.route("/moves/<dataset>/")
+@_cached_page
 def move_dex(dataset):
     """Page that lists all moves in a format."""
     md = get_md(dataset)
@@ -152,6 +476,7 @@ def move_dex(dataset):
 
 
 @app.route("/abilities/<dataset>/<abil>/")
+@_cached_page
 def display_ability(dataset, abil):
     """Page for details about a specific ability."""
     md = get_md(dataset)
@@ -165,6 +490,7 @@ def display_ability(dataset, abil):
 
 
 @app.route("/abilities/<dataset>/")
+@_cached_page
 def ability_dex(dataset):
     """Page that lists all abilities in a format."""
     md = get_md(dataset)
@@ -177,9 +503,14 @@ def ability_dex(dataset):
 def analysis(dataset):
     """Page that contains the main team builder."""
     md = get_md(dataset)
+    client_scoring = _client_scoring(md)
 
     return render_template('TeamBuilder.html', dataset=dataset,
                            has_counters_data=md.counters,
+                           names_url=(url_for("names_api", dataset=dataset, v=_names_version(md))
+                                      if client_scoring else None),
+                           matrices_url=(url_for("matrices_api", dataset=dataset, v=_client_matrices(dataset)[0])
+                                         if client_scoring else None),
                            gen=md.gen, dex=get_dex(md.gen),
                            usage_setting=analyze.USAGE_WEIGHT_DEFAULT,
                            counter_setting=analyze.COUNTER_WEIGHT_DEFAULT,
@@ -190,37 +521,314 @@ def analysis(dataset):
 def output_analysis(dataset):
     """Part of page responsible for displaying team building results."""
 
-    if "pokemon" in request.form:
-        my_pokes = request.form.getlist("pokemon")
-    else:
-        my_pokes = []
-
     md = get_md(dataset)
+    my_pokes, weights = _analysis_request(md, request.form)
+    threats, bundled, suggested_team, swaps = job_pool.run(jobs.analyze_team, dataset, my_pokes, weights,
+                                                           inline=_profiling_forced())
 
-    usage_setting = float(request.form["usage_weight"])
-    if md.counters:
-        counter_setting = float(request.form["counter_weight"])
-    else:
-        counter_setting = 0
-    team_setting = float(request.form["team_weight"])
-
-    weights = analyze.Weights(counter_setting, team_setting, usage_setting)
-    threats, bundled, suggested_team, swaps = md.analyze(my_pokes, weights)
-
+    # Only the first page of each table is rendered. The rest is fetched from recommendations_api and threats_api.
     recommendations = sorted(bundled, key=lambda p: -p[1])
     return render_template("TeamBuilderAnalysis.html",
                            dataset=dataset, has_counters_data=md.counters,
-                           threats=sorted(threats.items(), key=lambda k: -k[1]),
-                           recommendations=recommendations,
+                           analysis_params=request.form.to_dict(flat=False),
+                           threats=sorted(threats.items(), key=lambda k: -k[1])[:paging.PAGE_LENGTH_DEFAULT],
+                           threats_total=len(threats),
+                           recommendations=recommendations[:paging.PAGE_LENGTH_DEFAULT],
+                           recommendations_total=len(recommendations),
                            suggested_team=suggested_team,
                            swaps=(sorted(swaps.items(), key=lambda kv: -kv[1][1]) if swaps else None),
                            add_links=(len(my_pokes) < 6),
                            gen=md.gen, dex=get_dex(md.gen))
 
 
+@app.route("/api/analysis/<dataset>", methods=['GET', 'POST'])
+def analysis_api(dataset):
+    """Team analysis as JSON, for the browser to render.
+
+    Takes the same fields as run_analysis, as a query string or form.
+    Pokemon are referred to by their index in the name table at the "names" URL, which can be cached forever.
+    Scores are base64 encoded little-endian float32 arrays, listed in the same order as "order" (best overall first).
+    Only the first page of recommendations and threats is included.
+    Their "pages" URLs serve the rest, as from recommendations_api and threats_api.
+    """
+    md = get_md(dataset)
+    my_pokes, weights = _analysis_request(md, request.values)
+    threats, scores, suggested_team, swaps = _analysis_columns(dataset, my_pokes, weights)
+    params = request.values.to_dict(flat=False)
+
+    order = np.argsort(-scores[0], kind="stable")[:paging.PAGE_LENGTH_DEFAULT]
+    ranked = scores[:, order]
+    if threats is not None:
+        top = np.argsort(-threats, kind="stable")[:paging.PAGE_LENGTH_DEFAULT]
+        threats = {"order": top.tolist(), "ratings": _encode_floats(threats[top]), "total": len(threats),
+                   "pages": url_for("threats_api", dataset=dataset, **params)}
+
+    return jsonify({"names": url_for("names_api", dataset=dataset, v=_names_version(md)),
+                    "counters": md.counters,
+                    "order": order.tolist(),
+                    "total": scores.shape[1],
+                    "pages": url_for("recommendations_api", dataset=dataset, **params),
+                    "overall": _encode_floats(ranked[0]),
+                    "counter": _encode_floats(ranked[1]) if md.counters else None,
+                    "team": _encode_floats(ranked[2]),
+                    "usage": _encode_floats(ranked[3]),
+                    "threats": threats,
+                    "suggested_team": suggested_team,
+                    "swaps": sorted(swaps, key=lambda swap: -swap[2])})
+
+
+@app.route("/api/recommendations/<dataset>")
+def recommendations_api(dataset):
+    """One page of recommendations for a team, as DataTables asks for it.
+
+    Takes the same fields as run_analysis, along with DataTables' paging, order and search fields.
+    Rows are [name, overall, counter, team, usage], without counter if the format has no counters data.
+    """
+    md = get_md(dataset)
+    my_pokes, weights = _analysis_request(md, request.args)
+    scores = _analysis_columns(dataset, my_pokes, weights)[1]
+    return _table_page(md.names, [scores[0], scores[1], scores[2], scores[3]] if md.counters
+                       else [scores[0], scores[2], scores[3]])
+
+
+@app.route("/api/threats/<dataset>")
+def threats_api(dataset):
+    """One page of threats to a team, as DataTables asks for it.
+
+    Takes the same fields as recommendations_api. Rows are [name, rating].
+    """
+    md = get_md(dataset)
+    my_pokes, weights = _analysis_request(md, request.args)
+    threats = _analysis_columns(dataset, my_pokes, weights)[0]
+    if threats is None:
+        abort(404)
+    return _table_page(md.names, [threats])
+
+
+@app.route("/api/counters/<dataset>/<poke>")
+def counters_api(dataset, poke):
+    """One page of counters to a Pokemon, as DataTables asks for it. Rows are [name, rating]."""
+    md = get_md(dataset)
+    if poke not in md.pokemon or not md.counters:
+        abort(404)
+    ratings = md.counter_ratings(poke)
+    return _table_page(md.names, [ratings], np.flatnonzero(ratings > 0))
+
+
+@app.route("/api/teammates/<dataset>/<poke>")
+def teammates_api(dataset, poke):
+    """One page of teammates for a Pokemon, as DataTables asks for it. Rows are [name, rating]."""
+    md = get_md(dataset)
+    if poke not in md.pokemon:
+        abort(404)
+    ratings = md.partner_ratings(poke)
+    return _table_page(md.names, [ratings], np.flatnonzero(ratings > 0))
+
+
+def _table_page(names, columns, rows=None):
+    """Respond with the page of a table that DataTables asked for. Aborts with 400 if the request isn't valid.
+
+    Args:
+        names (list of str): Name of each row, in index order. Shown in the first column.
+        columns (list of 1d numpy array): Values shown in the other columns, in index order.
+        rows (1d numpy array of int or None): As for paging.page.
+    """
+    try:
+        query = paging.parse_query(request.args)
+        indices, total, filtered = paging.page(names, [None] + columns, query, rows)
+    except ValueError:
+        abort(400)
+    return jsonify(paging.response(query, names, columns, indices, total, filtered))
+
+
+@app.route("/api/search/<dataset>")
+def search_api(dataset):
+    """Autocomplete names in a format, as a list of [name, usage], best match first.
+
+    Query with q=<what was typed>. kind is pokemon (the default), items, moves or abilities.
+    limit caps how many names are returned.
+    """
+    kind = request.args.get("kind", "pokemon")
+    limit = request.args.get("limit", search_index.LIMIT_DEFAULT, type=int)
+    if kind not in usage_index.KINDS or not 0 < limit <= search_index.MAX_LIMIT:
+        abort(400)
+    response = jsonify(_search_index(dataset, kind).search(request.args.get("q", ""), limit))
+    response.cache_control.public = True
+    response.cache_control.max_age = page_max_age
+    return response
+
+
+@functools.lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def _search_index(dataset, kind):
+    """Build the search index for one kind of name in a format, the first time it is searched."""
+    md = get_md(dataset)
+    usages = usage_index.dataset_usages({"pokemon": md.pokemon, "items": md.items,
+                                         "moves": md.moves, "abilities": md.abilities})[kind]
+    names = list(usages)
+    return search_index.SearchIndex(names, [round(usages[name], usage_index.DIGITS_KEPT) for name in names])
+
+
+@app.route("/api/blend/<format_name>")
+def blend_api(format_name):
+    """Recommendations scored against every rating of a format at once, as JSON.
+
+    Takes the same fields as run_analysis, along with rating_<rating>=<weight> for how much each rating counts
+    (equally if none are given) and limit, which caps how many recommendations are returned.
+    Each recommendation is [name, blended score, [score in each rating]], best first.
+    """
+    form = _blend_format(format_name)
+    my_pokes = request.args.getlist("pokemon")
+    weights = _analysis_weights(request.args, form.counters)
+    try:
+        rating_weights = [float(request.args.get("rating_" + rating, 0)) for rating in form.ratings]
+    except ValueError:
+        abort(400)
+    limit = request.args.get("limit", paging.PAGE_LENGTH_DEFAULT, type=int)
+    if not all(isfinite(weight) and weight >= 0 for weight in rating_weights) \
+            or not 0 < limit <= paging.MAX_PAGE_LENGTH:
+        abort(400)
+
+    # Loading and scoring every rating is heavy, so it goes through the pool like any other analysis.
+    recommendations = job_pool.run(jobs.recommend_blend, form.name, form.ratings, my_pokes, weights,
+                                   rating_weights, limit, inline=_profiling_forced())
+    if recommendations is None:  # Some of the team isn't in any rating.
+        abort(400)
+    return jsonify({"ratings": list(form.ratings), "recommendations": recommendations})
+
+
+def _blend_format(format_name):
+    """Find a format in the format list, aborting with 404 if it isn't there."""
+    try:
+        form = next((form for form in get_catalogue().formats if form.name == format_name), None)
+    except FileNotFoundError:
+        abort(404)
+    if form is None:
+        abort(404)
+    return form
+
+
+def _analysis_columns(dataset, my_pokes, weights):
+    """Run MetagameData.analyze_columns, reusing the result when the same analysis is asked for again.
+
+    Returns:
+        As from MetagameData.analyze_columns. Shared between requests, so don't modify it.
+    """
+    return _cached_analysis_columns(dataset, tuple(my_pokes), weights.counter, weights.team, weights.usage)
+
+
+@functools.lru_cache(maxsize=ANALYSIS_CACHE_SIZE, typed=False)
+def _cached_analysis_columns(dataset, my_pokes, counter_weight, team_weight, usage_weight):
+    """Cached part of _analysis_columns. Weights are passed separately, as Weights objects all compare equal."""
+    return job_pool.run(jobs.analyze_team_columns, dataset, list(my_pokes),
+                        analyze.Weights(counter_weight, team_weight, usage_weight), inline=_profiling_forced())
+
+
+@app.route("/api/names/<dataset>")
+def names_api(dataset):
+    """Names of the Pokemon in a format, in index order.
+    With ?v=<version> from analysis_api, the response can be cached forever."""
+    md = get_md(dataset)
+    response = jsonify(md.names)
+    if request.args.get("v") == _names_version(md):
+        response.cache_control.public = True
+        response.cache_control.max_age = NAMES_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+@app.route("/api/matrices/<dataset>")
+def matrices_api(dataset):
+    """Matrices for scoring recommendations in the browser, as from MetagameData.compact_matrices.
+    Pokemon are in the same order as the names table.
+    With ?v=<version> from the analysis page, the response can be cached forever."""
+    md = get_md(dataset)
+    if not _client_scoring(md):
+        abort(404)
+    response = _matrices_page(dataset=dataset)
+    if request.args.get("v") == _client_matrices(dataset)[0]:
+        response.cache_control.max_age = NAMES_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+@_cached_page
+def _matrices_page(dataset):
+    """Cached, and compressed once per encoding, as the matrices are large."""
+    return Response(_client_matrices(dataset)[1], mimetype="application/octet-stream")
+
+
+def _client_scoring(md):
+    """Whether a format's recommendations are scored in the browser."""
+    return len(md.names) <= client_scoring_max
+
+
+@functools.lru_cache(maxsize=MATRICES_CACHE_SIZE, typed=False)
+def _client_matrices(dataset):
+    """Pack a format's matrices for the browser.
+
+    Returns:
+        (str, bytes): Version, a short hash of the contents, and the packed matrices.
+    """
+    packed = get_md(dataset).compact_matrices()
+    return hashlib.md5(packed).hexdigest()[:12], packed
+
+
+def _analysis_request(md, values):
+    """Read the team and weights for an analysis.
+
+    Args:
+        md (MetagameData): Format being analyzed.
+        values (MultiDict): Request fields: pokemon (repeated), usage_weight, team_weight and counter_weight.
+
+    Returns:
+        (list of str, analyze.Weights): Team and weights. Aborts with 400 if they aren't valid.
+    """
+    my_pokes = values.getlist("pokemon")
+    if any(poke not in md.pokemon for poke in my_pokes):
+        abort(400)
+
+    return my_pokes, _analysis_weights(values, md.counters)
+
+
+def _analysis_weights(values, counters):
+    """Read the weights for an analysis, as for _analysis_request.
+
+    Args:
+        values (MultiDict): Request fields: usage_weight, team_weight and counter_weight.
+        counters (bool): Whether the format has counters data. If not, counter_weight isn't read and is 0.
+
+    Returns:
+        analyze.Weights: Weights. Aborts with 400 if they aren't valid.
+    """
+    try:
+        usage_setting = float(values["usage_weight"])
+        if counters:
+            counter_setting = float(values["counter_weight"])
+        else:
+            counter_setting = 0
+        team_setting = float(values["team_weight"])
+    except ValueError:
+        abort(400)
+    if not all(isfinite(weight) and weight >= 0 for weight in (usage_setting, counter_setting, team_setting)):
+        abort(400)
+
+    return analyze.Weights(counter_setting, team_setting, usage_setting)
+
+
+def _names_version(md):
+    """Short hash of a format's Pokemon names, so cached name tables are replaced when they change."""
+    return hashlib.md5("\n".join(md.names).encode("utf-8")).hexdigest()[:12]
+
+
+def _encode_floats(values):
+    """Encode numbers as base64 little-endian float32, for JSON."""
+    return base64.b64encode(np.asarray(values, dtype="<f4").tobytes()).decode("ascii")
+
+
 @app.route("/cores/<dataset>/")
 def cores(dataset):
     """Page for finding cores in a format."""
+    _check_dataset(dataset)
     return render_template("CoreFinder.html",
                            usage_weight=corefinder.USAGE_WEIGHT_DEFAULT,
                            target_edges=corefinder.TARGET_EDGES_DEFAULT,
@@ -233,21 +841,50 @@ def cores(dataset):
 def find_cores(dataset):
     """Part of page responsible for displaying cores in format."""
 
-    usage_weight = float(request.form["usage_weight"])
-    target_edges = float(request.form["target_edges"])
+    try:
+        usage_weight = float(request.form["usage_weight"])
+        target_edges = float(request.form["target_edges"])
+    except ValueError:
+        abort(400)
+    if not (isfinite(usage_weight) and usage_weight >= 0 and isfinite(target_edges)):
+        abort(400)
     if target_edges < corefinder.MIN_EDGES or target_edges > corefinder.MAX_EDGES:
         return render_template("NumberEdgesError.html",
                                min_edges=corefinder.MIN_EDGES,
                                max_edges=corefinder.MAX_EDGES)
 
     md = get_md(dataset)
-    cf = corefinder.CoreFinder(md, usage_weight, target_edges)
+    found = _find_cores(dataset, usage_weight, int(target_edges))
 
-    return render_template("CoreFinderResults.html", dataset=dataset, cores=cf.find_cores(),
+    return render_template("CoreFinderResults.html", dataset=dataset, cores=found,
                            gen=md.gen)
 
 
+@functools.lru_cache(maxsize=CORES_CACHE_SIZE, typed=False)
+def _find_cores(dataset, usage_weight, target_edges):
+    """Find cores in a format, using the ones stored by update when the settings are the defaults.
+
+    Args:
+        dataset (str): Format and rating, such as gen9ou-1500.
+        usage_weight (float): As for CoreFinder.
+        target_edges (int): As for CoreFinder. Rounded down by the caller, so equivalent requests share an entry.
+
+    Returns:
+        list of list of str: As CoreFinder.find_cores. Shared between requests, so don't modify it.
+    """
+    if usage_weight == corefinder.USAGE_WEIGHT_DEFAULT and target_edges == corefinder.TARGET_EDGES_DEFAULT:
+        try:
+            found = corefinder.load_default_cores(DataFilePath(dataset + CORES_FILE), usage_weight, target_edges)
+            if found is not None:
+                return found
+        except FileNotFoundError:  # Data from before cores were stored.
+            pass
+
+    return job_pool.run(jobs.find_cores, dataset, usage_weight, target_edges, inline=_profiling_forced())
+
+
 @app.route("/speed_tiers/<dataset>/")
+@_cached_page
 def speed_tiers(dataset):
     """Page for displaying speed tiers in a format."""
     md = get_md(dataset)
@@ -256,6 +893,55 @@ def speed_tiers(dataset):
                            dataset=dataset)
 
 
+@app.route("/api/speed/<dataset>")
+def speed_query(dataset):
+    """Endpoint for what outspeeds a Pokemon or speed, or what falls in a speed range.
+
+    Query with poke=<name> (its fastest relevant speed) or speed=<number>,
+    or with low=<number> and/or high=<number> for a range.
+    stage, scarf, tailwind and paralyzed modify the Pokemon or speed being checked.
+    The same names prefixed with vs_ modify everything else.
+    limit caps how many results are returned.
+    """
+    md = get_md(dataset)
+    limit = request.args.get("limit", type=int)
+    try:
+        vs_multiplier = _speed_multiplier("vs_", md.gen)
+        if "low" in request.args or "high" in request.args:
+            low = request.args.get("low", 0, type=int)
+            high = request.args.get("high", 2 ** 31, type=int)
+            return jsonify(multiplier=vs_multiplier,
+                           in_range=md.speed_index.in_range(low, high, vs_multiplier, limit))
+
+        if "poke" in request.args:
+            base_speed = md.speed_index.top_speed(request.args["poke"])
+            if base_speed is None:
+                abort(404)
+        elif "speed" in request.args:
+            base_speed = request.args.get("speed", type=int)
+            if base_speed is None:
+                abort(400)
+        else:
+            abort(400)
+
+        speed = floor(base_speed * _speed_multiplier("", md.gen))
+    except ValueError:
+        abort(400)
+
+    return jsonify(speed=speed, multiplier=vs_multiplier,
+                   faster=md.outspeeds(speed, vs_multiplier, limit),
+                   tied=md.speed_index.tied_with(speed, vs_multiplier))
+
+
+def _speed_multiplier(prefix, gen):
+    """Build a speed multiplier from query arguments starting with prefix."""
+    return speed_index.speed_multiplier(request.args.get(prefix + "stage", 0, type=int),
+                                        bool(request.args.get(prefix + "scarf", 0, type=int)),
+                                        bool(request.args.get(prefix + "tailwind", 0, type=int)),
+                                        bool(request.args.get(prefix + "paralyzed", 0, type=int)),
+                                        gen)
+
+
 @app.route("/update/<key>/")
 def request_update(key):
     """Endpoint to download new statistics. Not for public use."""
@@ -263,14 +949,105 @@ def request_update(key):
         abort(401)
 
     if update.update():
+        _clear_caches()
+        prefork.request_reload()  # Other workers have the old data loaded.
         return "Update complete!"
     else:
         return "Update failed - update already in progress."
 
 
-if __name__ == "__main__":
+@app.route("/profiles/<key>/")
+def list_profiles(key):
+    """List stored request profiles, newest first. Not for public use."""
+    if not _is_admin(key):
+        abort(401)
+
+    return jsonify([{"name": name, "bytes": size, "modified": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(mtime))}
+                    for name, size, mtime in profiler.profiles()])
+
+
+@app.route("/profiles/<key>/<name>")
+def get_profile(key, name):
+    """Download a stored profile for use with pstats or snakeviz.
+    With ?sort=<pstats sort key> (such as cumulative or tottime), show a text summary instead.
+    Not for public use."""
+    if not _is_admin(key):
+        abort(401)
+
+    try:
+        path = profiler.path(name)
+        sort = request.args.get("sort")
+        if sort:
+            return Response(profiler.report(name, sort), mimetype="text/plain")
+    except FileNotFoundError:
+        abort(404)
+    except KeyError:  # Unknown sort key.
+        abort(400)
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+
+def _clear_caches():
+    """Forget everything loaded or computed from the data files, after they have been replaced."""
+    global data_generation
+    data_generation += 1
+    page_cache.clear()
+    get_catalogue.cache_clear()
+    get_usage_index.cache_clear()
+    get_md.cache_clear()  # Core edges are kept on each metagame, so they go with it.
+    get_dex.cache_clear()
+    _find_cores.cache_clear()
+    _cached_analysis_columns.cache_clear()
+    _client_matrices.cache_clear()
+    _search_index.cache_clear()
+    jobs.clear_caches()  # Used when jobs run on the request thread.
+    job_pool.reset()  # Worker processes keep their own copies.
+
+
+def _prepare_workers():
+    """Load shared data in the supervisor, before workers are forked."""
+    _clear_caches()
+    DataFilePath.cache.rescan()
+    warmup_args = _warmup_args()
+    if warmup_args[0]:
+        warm_up(*warmup_args, wait_all=True)
+
+
+def _warmup_args():
+    """Read warm-up settings from the environment.
+
+    Returns:
+        (int, float, int): Arguments for warm_up. The number of formats is 0 if warm-up is disabled.
+    """
+    return (int(os.environ.get("WARMUP_FORMATS", 0)),
+            float(os.environ.get("WARMUP_SECONDS", WARMUP_SECONDS_DEFAULT)),
+            int(os.environ.get("WARMUP_WORKERS", WARMUP_WORKERS_DEFAULT)))
+
+
+def run_server():
+    """Serve the site on PORT, with WORKERS processes. Started by server.py."""
     if not os.path.exists(DATA_DIR):
         os.mkdir(DATA_DIR)
 
-    print("Server starting.")
-    serve(app, host='0.0.0.0', port=int(os.environ["PORT"]))
+    workers = int(os.environ.get("WORKERS", 1))
+    if workers > 1 and hasattr(os, "fork"):
+        os.environ.setdefault("SHARED_MATRICES", "1")
+        print("Server starting with " + str(workers) + " workers.")
+        prefork.Supervisor(app, '0.0.0.0', int(os.environ["PORT"]), workers,
+                           threads=int(os.environ.get("THREADS", prefork.THREADS_DEFAULT)),
+                           prepare=_prepare_workers,
+                           worker_exit=functools.partial(job_pool.reset, wait=True)).run()
+    else:
+        warmup_args = _warmup_args()
+        if warmup_args[0]:
+            if os.environ.get("WARMUP_BLOCKING") == "1":
+                warm_up(*warmup_args)
+            else:
+                threading.Thread(target=warm_up, args=warmup_args, daemon=True).start()
+
+        print("Server starting.")
+        serve(app, host='0.0.0.0', port=int(os.environ["PORT"]),
+              threads=int(os.environ.get("THREADS", prefork.THREADS_DEFAULT)))
+
+
+if __name__ == "__main__":
+    run_server()  # Works, but every job worker process then re-imports this module. Prefer server.py.
@@ -0,0 +1,152 @@
+"""Lightweight latency histograms, exported in Prometheus text format.
+
+Time a stage of work with:
+    with metrics.span("analyze.scores"):
+        ...
+
+Recording a span takes a couple of microseconds, so spans can stay on in production.
+Metrics are per process. Work done in other processes can be captured there and recorded here.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+REQUEST_METRIC = "poketeam_request_seconds"
+STAGE_METRIC = "poketeam_stage_seconds"
+
+_lock = threading.Lock()
+_histograms = {}  # (metric name, labels as tuple of pairs) -> Histogram
+_local = threading.local()
+
+
+class Histogram:
+    """Counts of observations in cumulative buckets, as Prometheus expects."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last is everything above the largest bucket.
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class span:
+    """Context manager that records how long a stage takes."""
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record_stage(self.stage, time.perf_counter() - self.start)
+
+
+def observe(metric, labels, seconds):
+    """Record an observation.
+
+    Args:
+        metric (str): Name of the histogram.
+        labels (tuple of (str, str)): Label names and values.
+        seconds (float): Value to record.
+    """
+    key = (metric, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def record_stage(stage, seconds):
+    """Record how long a stage took, or keep it for later if capturing."""
+    captured = getattr(_local, "captured", None)
+    if captured is not None:
+        captured.append((stage, seconds))
+    else:
+        observe(STAGE_METRIC, (("stage", stage),), seconds)
+
+
+def record_stages(spans):
+    """Record spans captured elsewhere.
+
+    Args:
+        spans (list of (str, float)): Stage names and durations.
+    """
+    for stage, seconds in spans:
+        record_stage(stage, seconds)
+
+
+@contextmanager
+def capture():
+    """Collect spans on this thread into a list instead of recording them.
+
+    Used to send timings from a worker process back to the process serving the request.
+    """
+    spans = []
+    previous = getattr(_local, "captured", None)
+    _local.captured = spans
+    try:
+        yield spans
+    finally:
+        _local.captured = previous
+
+
+def render(gauges=()):
+    """Render every histogram, plus extra values, in Prometheus text format.
+
+    Args:
+        gauges (iterable of (str, str, dict, float)): Extra values as (name, type, labels, value).
+        type is "counter" or "gauge".
+
+    Returns:
+        str: Metrics page.
+    """
+    with _lock:
+        snapshot = [(metric, labels, list(h.counts), h.total, h.count)
+                    for (metric, labels), h in sorted(_histograms.items())]
+
+    lines = []
+    typed = set()
+    for metric, labels, counts, total, count in snapshot:
+        if metric not in typed:
+            lines.append("# TYPE " + metric + " histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ("+Inf",), counts):
+            cumulative += bucket_count
+            lines.append(metric + "_bucket" + _labels(labels + (("le", str(bound)),)) + " " + str(cumulative))
+        lines.append(metric + "_sum" + _labels(labels) + " " + repr(total))
+        lines.append(metric + "_count" + _labels(labels) + " " + str(count))
+
+    for name, metric_type, labels, value in gauges:
+        if name not in typed:
+            lines.append("# TYPE " + name + " " + metric_type)
+            typed.add(name)
+        lines.append(name + _labels(tuple(labels.items())) + " " + str(value))
+
+    return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    """Format labels like {a="1",b="2"}."""
+    if not labels:
+        return ""
+    escaped = (name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for name, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _lock:
+        _histograms.clear()
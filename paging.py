@@ -0,0 +1,90 @@
+"""Server-side paging, sorting and searching of tables, as DataTables asks for them.
+
+Pages render the first page of a table themselves. Later pages, other orders and searches
+are fetched as needed, so a table sends the same few rows however many Pokemon are in a format.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+PAGE_LENGTH_DEFAULT = 10
+MAX_PAGE_LENGTH = 100
+
+TableQuery = namedtuple("TableQuery", ["draw", "start", "length", "search", "column", "descending"])
+
+
+def parse_query(args, default_column=1):
+    """Read what a DataTables server-side request wants.
+
+    Args:
+        args (MultiDict): Request fields: draw, start, length, search[value], order[0][column] and order[0][dir].
+        Any of them can be missing.
+        default_column (int): Column to sort by if none is given.
+
+    Returns:
+        TableQuery: search is lower case. length is capped at MAX_PAGE_LENGTH, which is also used for -1 (all rows).
+
+    Raises:
+        ValueError: if a number isn't valid.
+    """
+    draw = int(args.get("draw", 0))
+    start = int(args.get("start", 0))
+    length = int(args.get("length", PAGE_LENGTH_DEFAULT))
+    column = int(args.get("order[0][column]", default_column))
+    if start < 0 or column < 0 or length == 0 or length < -1:
+        raise ValueError("Invalid table query.")
+    if length == -1 or length > MAX_PAGE_LENGTH:
+        length = MAX_PAGE_LENGTH
+
+    return TableQuery(draw, start, length, args.get("search[value]", "").strip().lower(), column,
+                      args.get("order[0][dir]", "desc") != "asc")
+
+
+def page(names, columns, query, rows=None):
+    """Find the rows on one page of a table.
+
+    Ties are kept in index order, as in the first page a view renders itself.
+
+    Args:
+        names (list of str): Name of each row, in index order. Searches match any part of a name, ignoring case.
+        columns (list of 1d numpy array or None): Values of each table column, in index order.
+        None for columns that can't be sorted by.
+        query (TableQuery): Page, order and search.
+        rows (1d numpy array of int or None): Indices of the rows in the table, ascending. All of them by default.
+
+    Returns:
+        (list of int, int, int): Indices of the rows on the page, in order,
+        number of rows in the table and number of rows matching the search.
+
+    Raises:
+        ValueError: if query sorts by a column that can't be sorted by.
+    """
+    if query.column >= len(columns) or columns[query.column] is None:
+        raise ValueError("Can't sort by column {}.".format(query.column))
+
+    if rows is None:
+        rows = np.arange(len(names))
+    values = columns[query.column][rows]
+    order = rows[np.argsort(-values if query.descending else values, kind="stable")]
+    total = len(order)
+    if query.search:
+        matches = np.array([query.search in name.lower() for name in names], dtype=bool)
+        order = order[matches[order]]
+    return order[query.start:query.start + query.length].tolist(), total, len(order)
+
+
+def response(query, names, columns, indices, total, filtered):
+    """Build the JSON DataTables expects for a page.
+
+    Args:
+        query (TableQuery): What was asked for.
+        names (list of str): Name of each row, in index order.
+        columns (list of 1d numpy array): Values to send after the name, in index order.
+        indices (list of int), total (int), filtered (int): As from page.
+
+    Returns:
+        dict: With a row of [name, values...] for each index. Values are rounded to 4 decimal places.
+    """
+    values = [np.round(np.asarray(column)[indices].astype(float), 4).tolist() for column in columns]
+    return {"draw": query.draw, "recordsTotal": total, "recordsFiltered": filtered,
+            "data": [[names[index]] + [column[x] for column in values] for x, index in enumerate(indices)]}
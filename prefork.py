@@ -0,0 +1,187 @@
+"""Serves a WSGI app from several worker processes sharing one listening socket.
+
+The supervisor prepares shared state (such as warmed up datasets) before forking,
+so workers share that memory copy-on-write. Workers that die are replaced.
+
+Signals to the supervisor:
+    SIGHUP: graceful restart. New workers are started, then old ones finish in-flight requests and exit.
+    SIGTERM/SIGINT: graceful shutdown.
+
+Only available on platforms with os.fork.
+"""
+import os
+import signal
+import socket
+import threading
+import time
+from waitress.server import create_server
+
+THREADS_DEFAULT = 8
+GRACEFUL_TIMEOUT = 30  # Seconds a stopping worker waits for open connections before exiting anyway.
+BACKLOG = 1024
+POLL_INTERVAL = .2
+
+_master_pid = None  # Set in workers.
+
+
+def request_reload():
+    """Ask the supervisor for a graceful restart, if running under one.
+
+    Returns:
+        bool: Whether a restart was requested.
+    """
+    if _master_pid is None:
+        return False
+
+    os.kill(_master_pid, signal.SIGHUP)
+    return True
+
+
+class Supervisor:
+    """Starts, watches, and restarts worker processes."""
+
+    def __init__(self, app, host, port, workers, threads=THREADS_DEFAULT, prepare=None, worker_exit=None):
+        """Configure supervisor.
+
+        Args:
+            app: WSGI app to serve.
+            host (str): Address to listen on.
+            port (int): Port to listen on.
+            workers (int >= 1): Number of worker processes.
+            threads (int >= 1): Number of request threads per worker.
+            prepare (callable or None): Called in the supervisor before starting workers,
+            and again before each graceful restart. Anything it loads is shared with the workers.
+            worker_exit (callable or None): Called in a worker once it has finished its requests, just before exiting.
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.prepare = prepare
+        self.worker_exit = worker_exit
+
+        self._sock = None
+        self._pids = set()
+        self._stopping = False
+        self._reloading = False
+
+    def run(self):
+        """Serve until told to stop."""
+        self._sock = socket.create_server((self.host, self.port), backlog=BACKLOG)
+        if self.prepare:
+            self.prepare()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        for _ in range(self.workers):
+            self._spawn()
+        print("Supervisor started " + str(self.workers) + " workers.")
+
+        while not self._stopping:
+            if self._reloading:
+                self._reloading = False
+                self._reload()
+            self._reap(respawn=True)
+            time.sleep(POLL_INTERVAL)
+
+        for pid in self._pids:
+            _signal(pid, signal.SIGTERM)
+        while self._pids:
+            self._reap(respawn=False)
+            time.sleep(POLL_INTERVAL)
+        self._sock.close()
+        print("Supervisor stopped.")
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reloading = True
+
+    def _reload(self):
+        """Start a fresh set of workers, then gracefully stop the old ones."""
+        print("Supervisor reloading.")
+        if self.prepare:
+            self.prepare()
+
+        old_pids = self._pids
+        self._pids = set()
+        for _ in range(self.workers):
+            self._spawn()
+
+        for pid in old_pids:
+            _signal(pid, signal.SIGTERM)
+        # Old workers are no longer in self._pids, so reap them here rather than respawning them.
+        threading.Thread(target=_wait_all, args=(old_pids,), daemon=True).start()
+
+    def _reap(self, respawn):
+        """Collect exited workers, replacing them if respawn is set."""
+        for pid in list(self._pids):
+            try:
+                finished, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished = pid
+            if finished:
+                self._pids.discard(pid)
+                if respawn:
+                    print("Worker " + str(pid) + " exited, replacing it.")
+                    self._spawn()
+
+    def _spawn(self):
+        """Fork a worker."""
+        pid = os.fork()
+        if pid:
+            self._pids.add(pid)
+            return
+
+        try:
+            _run_worker(self.app, self._sock, self.threads, self.worker_exit)
+        finally:
+            os._exit(0)
+
+
+def _run_worker(app, sock, threads, worker_exit):
+    """Serve requests from sock until SIGTERM, then finish open connections and exit."""
+    global _master_pid
+    _master_pid = os.getppid()
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the whole group. Let the supervisor handle it.
+
+    server = create_server(app, sockets=[sock], threads=threads)
+
+    def stop(signum, frame):
+        server.accepting = False  # Leave new connections to the other workers.
+        threading.Thread(target=_exit_when_idle, args=(server, worker_exit), daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    server.run()
+
+
+def _exit_when_idle(server, worker_exit):
+    """Exit once the server has no open connections, or the graceful timeout passes."""
+    deadline = time.monotonic() + GRACEFUL_TIMEOUT
+    while server.active_channels and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+    if worker_exit:
+        worker_exit()
+    os._exit(0)
+
+
+def _wait_all(pids):
+    """Wait for processes to exit."""
+    for pid in pids:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def _signal(pid, signum):
+    """Send a signal to a process that may have already exited."""
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,146 @@
+"""Profiles individual requests with cProfile and keeps the results as pstats files.
+
+A request is profiled when an admin asks for it, or when it is sampled and turns out to be slow.
+Only one request per process is profiled at a time, so the overhead stays bounded under real traffic.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+PROFILE_DIR_DEFAULT = "./profiles/"
+MAX_PROFILES_DEFAULT = 50
+SAMPLE_RATE_DEFAULT = .05
+PROFILE_SUFFIX = ".pstats"
+REPORT_LINES = 60
+MAX_LABEL_LENGTH = 80
+
+
+class Profiler:
+    """Decides which requests to profile and stores their profiles."""
+
+    def __init__(self, directory, max_profiles=MAX_PROFILES_DEFAULT, slow_ms=None, sample_rate=SAMPLE_RATE_DEFAULT):
+        """Configure profiler.
+
+        Args:
+            directory (str): Where to store profiles. Created when the first one is saved.
+            max_profiles (int >= 1): Number of profiles to keep. The oldest are deleted first.
+            slow_ms (float or None): Keep profiles of sampled requests that take at least this long.
+            None to only profile on request.
+            sample_rate (0 <= float <= 1): Fraction of requests to profile while waiting for a slow one.
+        """
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+
+    def start(self, forced=False):
+        """Start profiling the current thread, if this request should be profiled.
+
+        Args:
+            forced (bool): An admin asked for this request to be profiled.
+
+        Returns:
+            cProfile.Profile or None: Pass to finish once the request is done.
+        """
+        if not forced and (self.slow_ms is None or random.random() >= self.sample_rate):
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None  # Another request is being profiled. Forced requests just run unprofiled.
+
+        profile = cProfile.Profile()
+        profile.forced = forced
+        profile.start_time = time.perf_counter()
+        try:
+            profile.enable()
+        except (ValueError, RuntimeError):  # Something else is already profiling this thread.
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile, label):
+        """Stop profiling, and save the profile if it was asked for or the request was slow.
+
+        Args:
+            profile (cProfile.Profile): From start.
+            label (str): Describes the request, such as its route. Becomes part of the file name.
+
+        Returns:
+            str or None: Name of the saved profile.
+        """
+        try:
+            profile.disable()
+            ms = (time.perf_counter() - profile.start_time) * 1000
+            if not profile.forced and ms < self.slow_ms:
+                return None
+
+            os.makedirs(self.directory, exist_ok=True)
+            label = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:MAX_LABEL_LENGTH]
+            name = "{}-{}-{}-{:.0f}ms{}".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid(), label, ms, PROFILE_SUFFIX)
+            profile.dump_stats(os.path.join(self.directory, name))
+            self._prune()
+            return name
+        finally:
+            self._busy.release()
+
+    def profiles(self):
+        """List stored profiles.
+
+        Returns:
+            list of (str, int, float): (name, size in bytes, modification time). Newest first.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX)]
+        except FileNotFoundError:
+            return []
+
+        profiles = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # Pruned by another process.
+                continue
+            profiles.append((entry.name, stat.st_size, stat.st_mtime))
+        profiles.sort(key=lambda p: p[2], reverse=True)
+        return profiles
+
+    def path(self, name):
+        """Path to a stored profile.
+
+        Raises:
+            FileNotFoundError: if there is no such profile.
+        """
+        if name != os.path.basename(name) or not name.endswith(PROFILE_SUFFIX):
+            raise FileNotFoundError(name)
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(name)
+        return path
+
+    def report(self, name, sort="cumulative"):
+        """Render a stored profile as text.
+
+        Args:
+            name (str): Name of the profile.
+            sort (str): pstats sort key.
+
+        Returns:
+            str: The REPORT_LINES most expensive functions.
+        """
+        stream = io.StringIO()
+        pstats.Stats(self.path(name), stream=stream).sort_stats(sort).print_stats(REPORT_LINES)
+        return stream.getvalue()
+
+    def _prune(self):
+        """Delete the oldest profiles beyond max_profiles."""
+        for name, _, _ in self.profiles()[self.max_profiles:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:  # Already deleted by another process.
+                pass
@@ -0,0 +1,134 @@
+"""Analysis across every rating of a format at once.
+
+Each rating of a format has its own data, with its own Pokemon in its own order.
+RatingBlend puts them in one index space and stacks their matrices, so a team is scored against
+every rating in a single pass, and the ratings are blended by how much each should count.
+"""
+from collections import Counter
+
+import numpy as np
+from scipy.stats import gmean
+
+NEUTRAL_TEAMMATE = 1.  # Teammate rating for a team member a rating has no data for. Neither good nor bad.
+
+
+def load_blend(format_name, ratings, load):
+    """Load and align every rating of a format.
+
+    Args:
+        format_name (str): Format, such as gen9ou.
+        ratings (list of str): Ratings to blend, such as "0" and "1500".
+        load (callable): Gets the MetagameData for a dataset name, such as gen9ou-1500.
+
+    Returns:
+        RatingBlend: The ratings, aligned.
+    """
+    return RatingBlend(ratings, [load(format_name + "-" + rating) for rating in ratings])
+
+
+def _weighted_gmean(scores, weights):
+    """Weighted geometric mean along the first axis, leaving out weights of 0 as gmean doesn't handle 0 ** 0 well."""
+    used = [index for index, weight in enumerate(weights) if weight]
+    shape = (len(used),) + (1,) * (scores.ndim - 1)
+    with np.errstate(divide="ignore"):  # Scores of 0 are fine, and give 0.
+        return gmean(scores[used], axis=0, weights=np.reshape([weights[index] for index in used], shape))
+
+
+class RatingBlend:
+    """Every rating of one format, in a shared index space.
+
+    usages, team_tensor and threat_tensor have one row per rating, in the order of ratings.
+    A Pokemon that a rating has no data for has 0 usage there, isn't a threat or a counter there,
+    and its teammate ratings are NEUTRAL_TEAMMATE.
+    """
+
+    def __init__(self, ratings, metagames):
+        """Align ratings.
+
+        Args:
+            ratings (list of str): Ratings, such as "0" and "1500".
+            metagames (list of MetagameData): Data for each rating, in the same order. All from the same format.
+        """
+        self.ratings = list(ratings)
+        self.counters = all(md.counters for md in metagames)
+
+        # Most used across ratings first, so ties keep a sensible order.
+        totals = Counter()
+        for md in metagames:
+            totals.update(dict(zip(md.names, md.usages.tolist())))
+        self.names = sorted(totals, key=lambda name: (-totals[name], name))
+        self._indices = {name: index for index, name in enumerate(self.names)}
+        self.pokemon = self._indices  # Names, as in MetagameData.pokemon.
+
+        n = len(self.names)
+        dtype = metagames[0].team_matrix.dtype
+        self.usages = np.zeros((len(metagames), n))
+        self.team_tensor = np.full((len(metagames), n, n), NEUTRAL_TEAMMATE, dtype=dtype)
+        self.threat_tensor = np.zeros((len(metagames), n, n), dtype=dtype) if self.counters else None
+        for r, md in enumerate(metagames):
+            where = np.array([self._indices[name] for name in md.names], dtype=np.intp)
+            self.usages[r, where] = md.usages
+            self.team_tensor[r, where] = 0  # Never seen with Pokemon this rating has no data for.
+            self.team_tensor[r, where[:, None], where] = md.team_matrix
+            if self.counters:
+                self.threat_tensor[r, where[:, None], where] = md.threat_matrix
+
+    def score_columns(self, team, weights, rating_weights):
+        """Score every Pokemon as an addition to a team, in every rating at once.
+
+        Each rating is scored as MetagameData.analyze scores it. The blend is a weighted geometric mean
+        of the ratings' combined scores, so a Pokemon that is poor in any rating that counts scores poorly.
+
+        Args:
+            team (list of str): Names of Pokemon already on the team. Each must be in at least one rating.
+            weights (analyze.Weights): How important each kind of score is.
+            rating_weights (list of float >= 0): How much each rating counts, in the order of ratings.
+                If they are all 0, the ratings count equally.
+
+        Returns:
+            blended (1d numpy array of float): Blended score of each Pokemon, in index order.
+            combined, counter, team, usage (2d numpy array of float): Scores in each rating,
+            one row per rating, each in index order.
+        """
+        if not any(rating_weights):
+            rating_weights = [1] * len(self.ratings)
+
+        team_indices = [self._indices[poke] for poke in team]
+        u_scores = self.usages
+        shape = u_scores.shape
+        if team:
+            with np.errstate(divide="ignore"):
+                t_scores = gmean(self.team_tensor[:, team_indices], axis=1, nan_policy="raise")
+                for index, count in Counter(team_indices).items():
+                    if count > 1:  # As in MetagameData, duplicates score .5 / usage less for each extra copy.
+                        t_scores[:, index] -= .5 * (count - 1) / u_scores[:, index]
+            t_scores = np.maximum(t_scores, 0)  # Negatives work poorly with geometric mean.
+        else:
+            t_scores = np.ones(shape)
+
+        if self.counters and team:
+            threats = self.threat_tensor[:, team_indices].sum(1)
+            new_threats = threats[:, None, :] + np.minimum(self.threat_tensor, 0)
+            sum_pos = np.maximum(new_threats, 0).sum(2)
+            c_scores = 100 ** (-sum_pos / (len(team) + 1))
+        else:
+            c_scores = np.ones(shape)
+
+        combined = _weighted_gmean(np.stack((c_scores, t_scores, u_scores)),
+                                   (weights.counter, weights.team, weights.usage))
+        blended = _weighted_gmean(combined, rating_weights)
+        return blended, combined, c_scores, t_scores, u_scores
+
+    def recommend(self, team, weights, rating_weights, limit=None):
+        """Best additions to a team, scored against a blend of ratings.
+
+        Args:
+            As for score_columns.
+            limit (int or None): Most recommendations to return. All of them by default.
+
+        Returns:
+            list of (str, float, list of float): Name, blended score and combined score in each rating, best first.
+        """
+        blended, combined = self.score_columns(team, weights, rating_weights)[:2]
+        order = np.argsort(-blended, kind="stable")[:limit]
+        return [(self.names[index], float(blended[index]), combined[:, index].tolist()) for index in order]
@@ -0,0 +1,90 @@
+"""In-memory cache of rendered responses, for pages that only depend on their URL and the data.
+
+Each response is stored with a strong ETag computed from its body,
+so a client that already has the page can be answered with a 304 without rendering anything.
+The least recently used responses are dropped once the cache grows past its size limit.
+"""
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+CachedResponse = namedtuple("CachedResponse", ["body", "mimetype", "etag", "encoding"])
+
+
+class ResponseCache:
+    """Size-bounded, thread-safe map from keys to rendered responses."""
+
+    def __init__(self, max_bytes):
+        """Create cache.
+
+        Args:
+            max_bytes (int >= 0): Size limit for stored bodies. 0 disables the cache.
+        """
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()  # Guards everything below.
+        self._entries = OrderedDict()  # key -> CachedResponse, least recently used first.
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Get the cached response for key, marking it as recently used.
+
+        Returns:
+            CachedResponse or None: None if key isn't cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype, encoding=None):
+        """Cache a response.
+
+        Args:
+            key (hashable): What the response is for.
+            body (bytes): Response body.
+            mimetype (str): Response mimetype.
+            encoding (str or None): Content-Encoding of body, if it is compressed.
+
+        Returns:
+            CachedResponse: The stored response, with its ETag. Returned even if it is too big to keep.
+        """
+        entry = CachedResponse(body, mimetype, hashlib.sha1(body).hexdigest(), encoding)
+        if len(body) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= len(old.body)
+            self._entries[key] = entry
+            self._total_bytes += len(body)
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted.body)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Get cache statistics.
+
+        Returns:
+            dict str->int: hits, misses, evictions, entries, bytes and max_bytes.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,122 @@
+"""Autocomplete for the names in a format: names starting with what was typed, or if none do, names a typo or two away.
+
+Names are matched ignoring case, spaces and punctuation, from their start or from the start of any word,
+so "landorus t", "LandorusT" and "therian" all find Landorus-Therian.
+Typos are found the SymSpell way: every indexed prefix is stored with the deletions within its edit budget,
+so a query only has to look up its own deletions rather than compare against every name.
+"""
+import bisect
+import heapq
+import re
+
+LIMIT_DEFAULT = 10
+MAX_LIMIT = 50
+PREFIX_LENGTH = 7  # Typos are looked for in at most this many leading characters. Longer queries are checked in full.
+MIN_FUZZY_LENGTH = 4  # Shorter queries only match prefixes.
+TWO_EDIT_LENGTH = 7  # Queries at least this long allow two edits. Shorter ones allow one.
+
+
+def normalize(text):
+    """Lower case, without spaces or punctuation."""
+    return re.sub(r"[^0-9a-z]", "", text.lower())
+
+
+def _keys(name):
+    """Normalized name from its start and from the start of each later word."""
+    words = [normalize(word) for word in re.split(r"[\s\-.:]+", name)]
+    words = [word for word in words if word]
+    return {"".join(words[x:]) for x in range(len(words))}
+
+
+def _max_edits(length):
+    if length < MIN_FUZZY_LENGTH:
+        return 0
+    return 2 if length >= TWO_EDIT_LENGTH else 1
+
+
+def _deletes(word, edits):
+    """word and every string made by deleting up to edits characters from it."""
+    found = {word}
+    frontier = {word}
+    for _ in range(edits):
+        frontier = {w[:x] + w[x + 1:] for w in frontier for x in range(len(w))}
+        found |= frontier
+    return found
+
+
+def _prefix_distance(query, key, max_edits):
+    """Smallest edit distance between query and any prefix of key, or None if it is more than max_edits.
+
+    Only cells within max_edits of the diagonal can be small enough, so only those are worked out.
+    """
+    too_far = max_edits + 1
+    previous = [min(y, too_far) for y in range(len(key) + 1)]  # Distance between "" and each prefix of key.
+    for x, char in enumerate(query, 1):
+        current = [min(x, too_far)] + [too_far] * len(key)
+        for y in range(max(1, x - max_edits), min(len(key), x + max_edits) + 1):
+            current[y] = min(previous[y] + 1, current[y - 1] + 1, previous[y - 1] + (char != key[y - 1]))
+        if min(current) > max_edits:
+            return None
+        previous = current
+    distance = min(previous)
+    return distance if distance <= max_edits else None
+
+
+class SearchIndex:
+    """Names of one kind (such as the Pokemon) in a format, searchable by prefix and with typos."""
+
+    def __init__(self, names, usages):
+        """Build the index.
+
+        Args:
+            names (list of str): Names to search.
+            usages (list of float): Usage of each name. Results are ranked by it.
+        """
+        # Ranks are positions in usage order, so comparing ranks compares usage.
+        order = sorted(range(len(names)), key=lambda x: (-usages[x], names[x]))
+        self.names = [names[x] for x in order]
+        self.usages = [usages[x] for x in order]
+
+        pairs = sorted((key, rank) for rank, name in enumerate(self.names) for key in _keys(name))
+        self._keys = [key for key, _ in pairs]
+        self._ranks = [rank for _, rank in pairs]
+
+        self._fuzzy = {}  # Deletion -> set of (key, rank) whose leading characters it can be made from.
+        for key, rank in pairs:
+            for length in range(MIN_FUZZY_LENGTH, min(len(key), PREFIX_LENGTH) + 1):
+                for deleted in _deletes(key[:length], _max_edits(length)):
+                    self._fuzzy.setdefault(deleted, set()).add((key, rank))
+
+    def search(self, query, limit=LIMIT_DEFAULT):
+        """Find names matching a query.
+
+        Args:
+            query (str): What has been typed so far.
+            limit (int): Most names to return.
+
+        Returns:
+            list of (str, float): Name and usage. Names starting with the query, most used first.
+            If there are none, names a typo or two away, closest first, then most used first.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+
+        low = bisect.bisect_left(self._keys, query)
+        high = bisect.bisect_left(self._keys, query + "\x7f", low)
+        ranks = heapq.nsmallest(limit, set(self._ranks[low:high]))
+
+        edits = _max_edits(len(query))
+        if not ranks and edits:  # Only look for typos when nothing starts with what was typed.
+            candidates = set()
+            for deleted in _deletes(query[:PREFIX_LENGTH], edits):
+                candidates.update(self._fuzzy.get(deleted, ()))
+            close = {}  # Rank -> smallest distance.
+            for key, rank in candidates:
+                # Characters past this can't bring a prefix of key any closer.
+                distance = _prefix_distance(query, key[:len(query) + edits], edits)
+                if distance is not None and distance < close.get(rank, edits + 1):
+                    close[rank] = distance
+            ranks = heapq.nsmallest(limit, close, key=lambda rank: (close[rank], rank))
+
+        return [(self.names[rank], self.usages[rank]) for rank in ranks]
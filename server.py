@@ -0,0 +1,9 @@
+"""Starts the site.
+
+Job worker processes are spawned, and spawned processes import the script that was run before doing anything else.
+Starting from this script rather than main keeps that import cheap, so workers only load what their jobs need.
+"""
+
+if __name__ == "__main__":
+    import main
+    main.run_server()
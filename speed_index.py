@@ -0,0 +1,125 @@
+"""Answers speed questions about a metagame, such as what outspeeds a +1 Dragapult.
+
+Speeds are held in a sorted array, so queries are binary searches rather than scans of the speed tiers.
+"""
+import bisect
+from math import floor
+import numpy as np
+
+MAX_STAGE = 6
+SCARF_MULTIPLIER = 3/2
+TAILWIND_MULTIPLIER = 2
+PARALYSIS_MULTIPLIER = 1/2
+OLD_PARALYSIS_MULTIPLIER = 1/4  # Paralysis quartered speed before gen 7.
+
+
+def speed_multiplier(stage=0, scarf=False, tailwind=False, paralyzed=False, gen=9):
+    """Combine speed modifiers into a single multiplier.
+
+    Modifiers are applied as one multiplication, matching how the speed tiers page works.
+    The game floors after some modifiers, so results can occasionally be 1 point off.
+
+    Args:
+        stage (int from -6 to 6): Speed stat stage.
+        scarf (bool): Whether the Pokemon holds a Choice Scarf.
+        tailwind (bool): Whether Tailwind is up.
+        paralyzed (bool): Whether the Pokemon is paralyzed.
+        gen (int or str): Generation, as paralysis differs between generations.
+
+    Returns:
+        float > 0: Multiplier for the speed stat.
+
+    Raises:
+        ValueError: if stage is out of range.
+    """
+    if not -MAX_STAGE <= stage <= MAX_STAGE:
+        raise ValueError("Stat stages range from -6 to 6.")
+
+    mult = (2 + stage) / 2 if stage >= 0 else 2 / (2 - stage)
+    if scarf:
+        mult *= SCARF_MULTIPLIER
+    if tailwind:
+        mult *= TAILWIND_MULTIPLIER
+    if paralyzed:
+        mult *= PARALYSIS_MULTIPLIER if int(gen) >= 7 else OLD_PARALYSIS_MULTIPLIER
+
+    return mult
+
+
+class SpeedIndex:
+    """Sorted index over the unmodified speed tiers of a metagame."""
+
+    def __init__(self, speed_tiers):
+        """Build index.
+
+        Args:
+            speed_tiers (dict): Speed tiers as stored in metagame data.
+            speed_tiers[speed][0] is a list of (Pokemon name, fraction at that speed).
+        """
+        entries = sorted(((int(speed), poke, fraction) for speed, tiers in speed_tiers.items()
+                          for poke, fraction in tiers[0]), key=lambda e: e[0])
+        self.speeds = np.array([e[0] for e in entries], dtype=np.int64)
+        self.fractions = np.array([e[2] for e in entries])
+        self.pokemon = [e[1] for e in entries]
+        self._speed_list = self.speeds.tolist()  # bisect is fastest over a plain list.
+
+        self._by_pokemon = {}
+        for speed, poke, fraction in entries:
+            self._by_pokemon.setdefault(poke, []).append((speed, fraction))
+
+    def speeds_of(self, poke):
+        """List the speeds a Pokemon runs.
+
+        Args:
+            poke (str): Name of Pokemon.
+
+        Returns:
+            list of (int, float): (speed, fraction of that Pokemon at that speed), slowest first.
+            Empty if the Pokemon has no relevant speed tiers.
+        """
+        return self._by_pokemon.get(poke, [])
+
+    def top_speed(self, poke):
+        """Fastest relevant speed of a Pokemon, or None if it has none."""
+        speeds = self.speeds_of(poke)
+        return speeds[-1][0] if speeds else None
+
+    def _bisect(self, speed, multiplier, right):
+        """Find position of speed in the index, after applying multiplier to the index."""
+        if right:
+            return bisect.bisect_right(self._speed_list, speed, key=lambda s: floor(s * multiplier))
+        return bisect.bisect_left(self._speed_list, speed, key=lambda s: floor(s * multiplier))
+
+    def _entries(self, start, end, multiplier, limit):
+        """Entries between start and end, fastest first."""
+        if limit is not None:
+            end = min(end, start + limit)
+        return [(self.pokemon[i], floor(self._speed_list[i] * multiplier), float(self.fractions[i]))
+                for i in range(end - 1, start - 1, -1)]
+
+    def faster_than(self, speed, multiplier=1, limit=None):
+        """Find everything that outspeeds a given speed.
+
+        Args:
+            speed (int): Speed to beat.
+            multiplier (float > 0): Speed multiplier applied to everything in the index.
+            limit (int or None): Only return the slowest limit entries that still outspeed.
+
+        Returns:
+            list of (str, int, float): (Pokemon name, modified speed, fraction of that Pokemon at that speed).
+            Fastest first.
+        """
+        return self._entries(self._bisect(speed, multiplier, True), len(self._speed_list), multiplier, limit)
+
+    def tied_with(self, speed, multiplier=1):
+        """Find everything that speed ties with a given speed. Same format as faster_than."""
+        return self._entries(self._bisect(speed, multiplier, False), self._bisect(speed, multiplier, True),
+                             multiplier, None)
+
+    def in_range(self, low, high, multiplier=1, limit=None):
+        """Find everything with a modified speed between low and high, inclusive.
+
+        Same format as faster_than. If limit is set, the slowest entries in range are kept.
+        """
+        return self._entries(self._bisect(low, multiplier, False), self._bisect(high, multiplier, True),
+                             multiplier, limit)
@@ -15,6 +15,9 @@ $("#find_cores").submit(function(e) {
     success: function(response) {
       $("#cores_location").html(response);
     },
+    error: function(xhr) {
+      $("#cores_location").text(xhr.status == 503 ? xhr.responseText : "Something went wrong. Please try again.");
+    },
   });
   return false;
 });
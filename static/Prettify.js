@@ -6,9 +6,79 @@ function type_display(pokemon_type) {
 }
 
 do_prettify();
-function do_prettify() {
-    $(".poke-icon").each(function() {
+function prettify_poke_icons(root) {
+    $(root).find(".poke-icon").each(function() {
     $(this).attr("style", pkmn.img.Icons.getPokemon($(this).data("poke")).style)});
+}
+
+// url has ~ in place of the Pokemon.
+function poke_link(poke, url) {
+    var link = $("<a></a>").attr("href", url.replace("~", encodeURIComponent(poke)));
+    return link.append($("<span class='poke-icon'></span>").attr("data-poke", poke), document.createTextNode(poke));
+}
+
+function add_link(poke) {
+    return $("<a href='javascript:void(0)' class='add_link'>✚</a>").attr({"data-poke": poke, title: "Add " + poke + " to the team."});
+}
+
+// DataTables options for the columns of a server_paged table, or a table filled the same way from data.
+// Rows are [Pokemon name, ratings...], with the name again at the end if there is an add_link_column.
+function table_columns(table) {
+    var poke_url = $(table).data("poke-url");
+    var first_row = $(table).find("tbody tr:first td");
+    var spec = {add_links: false, order: []};
+    spec.columns = $(table).find("thead th").map(function(i) {
+        var th = $(this);
+        if (th.hasClass("sort_desc")) spec.order = [[i, "desc"]];
+        if (i == 0) {
+            return {orderable: false, searchable: true, render: function(poke, type) {
+                return type == "display" ? poke_link(poke, poke_url).prop("outerHTML") : poke;
+            }};
+        }
+        if (th.hasClass("add_link_column")) {
+            spec.add_links = true;
+            return {orderable: false, searchable: false, className: "add_link_cell", render: function(poke, type) {
+                return type == "display" ? add_link(poke).prop("outerHTML") : poke;
+            }};
+        }
+        return {orderSequence: ["desc", "asc"], searchable: false,
+                className: first_row.eq(i).attr("class") || "dt-body-right" + (th.hasClass("hide_mobile") ? " hide_mobile" : ""),
+                render: function(value, type) {return type == "display" ? value.toFixed(2) : value;}};
+    }).get();
+    return spec;
+}
+
+// Options shared by server_paged tables and tables filled the same way from data.
+var paged_table_options = {
+    paging: true,
+    autoWidth: false,
+    lengthChange: false,
+    pagingType: "full",
+    dom: '<"dataTable_controls"fi>tp',
+    orderClasses: false,
+    language: {search: "", searchPlaceholder: "Search..."},
+    createdRow: function(row) {prettify_poke_icons(row);},
+};
+
+// A server_paged table holds its first page. Other pages, orders and searches are fetched from its data-url,
+// which returns rows of [Pokemon name, ratings...].
+// data-total is how many rows there are, and data-poke-url is where Pokemon link to, with ~ in place of the Pokemon.
+function server_paged(table) {
+    var spec = table_columns(table);
+    $(table).DataTable($.extend({}, paged_table_options, {
+        serverSide: true,
+        deferLoading: $(table).data("total"),
+        ajax: {url: $(table).data("url"), dataSrc: function(json) {
+            if (spec.add_links) for (var row of json.data) row.push(row[0]);
+            return json.data;
+        }},
+        columns: spec.columns,
+        order: spec.order,
+    }));
+}
+
+function do_prettify() {
+    prettify_poke_icons(document);
 
     $(".item-icon").each(function() {
         $(this).attr("style", pkmn.img.Icons.getItem($(this).data("item")).style)
@@ -72,6 +142,8 @@ function do_prettify() {
         });
     });
 
+    $(".server_paged").each(function() {server_paged(this);});
+
 
     $(".dataTables_filter input[type=search]").each(function() {
         $(this).focus();
@@ -1,4 +1,7 @@
 var selected = -1;
+var latest_request = 0;  // Only the latest analysis is shown, even if an earlier one finishes later.
+var scoring = null;  // Promise of matrices for scoring recommendations here, or null to use the server's.
+var shown = null;  // Matrices and add_links for the recommendations shown, if they were scored here.
 
 $("#analyze").submit(function(e) {
   e.preventDefault();
@@ -10,19 +13,276 @@ $("#analyze").submit(function(e) {
   }
 
   selected = -1;
-  $.post({
-    url: "./run_analysis",
-    data: $(this).serialize(),
-    dataType: "html",
-    success: function(response) {
-      $("#analysis_location").html(response);
-      do_prettify();
-      attachInputHandlers();
-    },
-  });
+  var request = ++latest_request;
+  $.getJSON($("#analysis_location").data("url"), $(this).serialize())
+    .then(function(analysis) {
+      return Promise.all([loadNames(analysis.names), scoring]).then(function(loaded) {
+        if (request == latest_request) renderAnalysis(analysis, loaded[0], loaded[1]);
+      });
+    })
+    .fail(function(xhr) {
+      if (request != latest_request) return;
+      $("#analysis_location").text(xhr.status == 503 ? xhr.responseText : "Something went wrong. Please try again.");
+    });
   return false;
 });
 
+// Name tables by URL. The URL changes whenever the names do, so each is only fetched once.
+var name_tables = {};
+
+function loadNames(url) {
+  if (!(url in name_tables)) {
+    name_tables[url] = $.getJSON(url).fail(function() {delete name_tables[url];});
+  }
+  return name_tables[url];
+}
+
+function decodeFloats(encoded) {
+  var bytes = atob(encoded);
+  var view = new DataView(new ArrayBuffer(bytes.length));
+  for (var i = 0; i < bytes.length; i++) view.setUint8(i, bytes.charCodeAt(i));
+  var values = [];
+  for (var i = 0; i < bytes.length; i += 4) values.push(view.getFloat32(i, true));
+  return values;
+}
+
+function pokeLink(poke) {
+  return poke_link(poke, $("#input_pokemon").data("url"));
+}
+
+// Scoring here only needs the matrices, so weight changes don't need a request.
+// Threats, the suggested team and swaps still come from the server, when the team changes or on Analyze.
+$("#analyze input[type=number]").on("input", function() {
+  if (!shown || !$("#analyze")[0].checkValidity()) return;
+  var old = $("#recommendations_table");
+  var table = $("<table id='recommendations_table' class='data-table'></table>");
+  old.DataTable().destroy();
+  old.replaceWith(table);
+  selected = -1;
+  fillLocalRecommendations(table, shown.matrices, shown.add_links);
+  attachInputHandlers();
+});
+
+// With data-matrices set, fetch a format's matrices for scoring here. Falls back to the server if that fails.
+function loadScoring() {
+  var location = $("#analysis_location");
+  if (!location.data("matrices")) return null;
+  var packed = fetch(location.data("matrices")).then(function(response) {
+    if (!response.ok) throw new Error(response.statusText);
+    return response.arrayBuffer();
+  });
+  return Promise.all([loadNames(location.data("names")), packed])
+    .then(function(loaded) {return unpackMatrices(loaded[0], loaded[1]);})
+    .catch(function() {return null;});
+}
+
+// Layout is as from MetagameData.compact_matrices. Typed arrays use the platform's byte order,
+// which is little-endian on every browser platform.
+function unpackMatrices(names, buffer) {
+  var n = names.length, cells = n * n;
+  var matrices = {names: names, indices: {}, usages: new Float64Array(buffer, 0, n),
+                  log_team: decodeHalves(new Uint16Array(buffer, 8 * n, cells)), threats: null};
+  names.forEach(function(poke, i) {matrices.indices[poke] = i;});
+  if (buffer.byteLength > 8 * n + 2 * cells) {
+    matrices.threats = decodeHalves(new Uint16Array(buffer, 8 * n + 2 * cells, cells));
+  }
+  return matrices;
+}
+
+var half_values = null;  // Value of each float16 bit pattern.
+
+function decodeHalves(halves) {
+  if (!half_values) {
+    half_values = new Float32Array(65536);
+    for (var h = 0; h < 65536; h++) {
+      var sign = h & 0x8000 ? -1 : 1, exponent = (h >> 10) & 0x1f, fraction = h & 0x3ff;
+      if (exponent == 0) half_values[h] = sign * Math.pow(2, -14) * fraction / 1024;
+      else if (exponent == 31) half_values[h] = fraction ? NaN : sign * Infinity;
+      else half_values[h] = sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+    }
+  }
+  var values = new Float32Array(halves.length);
+  for (var i = 0; i < halves.length; i++) values[i] = half_values[halves[i]];
+  return values;
+}
+
+// The same as MetagameData._score_columns.
+// Returns arrays of combined, counter, team and usage scores, in index order.
+function localScores(matrices, team, weights) {
+  var n = matrices.names.length, usages = matrices.usages;
+  var team_scores = new Float64Array(n).fill(1), counter_scores = new Float64Array(n).fill(1);
+  if (team.length) {
+    team_scores.fill(0);
+    for (var poke of team) {
+      for (var x = 0; x < n; x++) team_scores[x] += matrices.log_team[poke * n + x];
+    }
+    for (var x = 0; x < n; x++) team_scores[x] = Math.exp(team_scores[x] / team.length);
+    var copies = {};
+    for (var poke of team) copies[poke] = (copies[poke] || 0) + 1;
+    for (var poke in copies) {
+      team_scores[poke] = Math.max(0, team_scores[poke] - .5 * (copies[poke] - 1) / usages[poke]);
+    }
+  }
+
+  if (matrices.threats && team.length) {
+    var threats = new Float64Array(n);
+    for (var poke of team) {
+      for (var y = 0; y < n; y++) threats[y] += matrices.threats[poke * n + y];
+    }
+    for (var x = 0; x < n; x++) {
+      var sum_pos = 0;
+      for (var y = 0; y < n; y++) {
+        var remaining = threats[y] + Math.min(matrices.threats[x * n + y], 0);
+        if (remaining > 0) sum_pos += remaining;
+      }
+      counter_scores[x] = Math.pow(100, -sum_pos / (team.length + 1));
+    }
+  }
+
+  // Weighted geometric mean, leaving out weights of 0.
+  var columns = [counter_scores, team_scores, usages];
+  var total_weight = weights.reduce(function(a, b) {return a + b;}, 0);
+  var combined = new Float64Array(n);
+  for (var x = 0; x < n; x++) {
+    var log_sum = 0;
+    weights.forEach(function(weight, c) {if (weight) log_sum += weight * Math.log(columns[c][x]);});
+    combined[x] = Math.exp(log_sum / total_weight);
+  }
+  return [combined, counter_scores, team_scores, usages];
+}
+
+// Counter, team and usage weights from the form, treating all 0 as all equal, as analyze.Weights does.
+function formWeights() {
+  var weights = ["counter_weight", "team_weight", "usage_weight"].map(function(name) {
+    var input = $("#analyze input[name=" + name + "]");
+    return input.length ? parseFloat(input.val()) : 0;
+  });
+  return weights.every(function(weight) {return weight == 0;}) ? [1, 1, 1] : weights;
+}
+
+function formTeam(matrices) {
+  return $("#analyze input[name=pokemon]").map(function() {return matrices.indices[$(this).val()];}).get();
+}
+
+function renderAnalysis(analysis, names, matrices) {
+  var location = $("#analysis_location");
+  var wrapper = $("<div class='tables-wrapper align-help'></div>");
+  var recommendations = $("<table id='recommendations_table' class='data-table'></table>");
+  wrapper.append(recommendations);
+
+  var threats_table = null;
+  if (analysis.threats) {
+    var threats = decodeFloats(analysis.threats.ratings);
+    threats_table = smallTable(["Threat", $("<th class='sort_desc'>Rating</th>")],
+                               analysis.threats.order.map(function(poke, i) {
+      return [pokeLink(names[poke]), $("<td class='r-align'></td>").text(threats[i].toFixed(2))];
+    }));
+    wrapper.append(pagedBy(threats_table, analysis.threats.pages, analysis.threats.total));
+  }
+
+  if (analysis.suggested_team) {
+    var team = analysis.suggested_team.map(function(poke) {return names[poke];});
+    var try_link = $("<a href='javascript:void(0)' class='try_team_link'>(try it!)</a>");
+    try_link.click(function() {tryTeam(team);});
+    wrapper.append(smallTable([$("<span>Recommended Team </span>").append(try_link)],
+                              team.map(function(poke) {return [pokeLink(poke)];})));
+  }
+
+  if (analysis.swaps.length) {
+    wrapper.append(smallTable(["Current", "", "Swap", $("<span title='Improvement'>Δ</span>")],
+                              analysis.swaps.map(function(swap) {
+      var current = names[swap[0]], replacement = names[swap[1]];
+      var swap_link = $("<a href='javascript:void(0)' class='swap_link'>⮂</a>");
+      swap_link.attr("title", "Swap " + current + " for " + replacement + ".");
+      swap_link.click(function() {swapPoke(current, replacement);});
+      return [pokeLink(current), swap_link, pokeLink(replacement),
+              $("<td class='r-align'></td>").text(swap[2].toFixed(2))];
+    })));
+  }
+
+  location.empty().append(wrapper);
+  prettify_poke_icons(location);
+  var add_links = analysis.suggested_team !== null;  // Only full teams have no suggestion.
+  shown = matrices ? {matrices: matrices, add_links: add_links} : null;
+  if (matrices) {
+    fillLocalRecommendations(recommendations, matrices, add_links);
+  } else {
+    fillRecommendations(recommendations, analysis, names, add_links);
+  }
+  if (threats_table) server_paged(threats_table);
+  attachInputHandlers();
+  $("#recommendations_table_filter input").focus();
+}
+
+// Headings can be a <th>, or anything to put in one. The same goes for cells and <td>.
+function smallTable(headings, rows) {
+  var head = $("<tr></tr>");
+  for (var heading of headings) head.append(heading.is && heading.is("th") ? heading : $("<th></th>").append(heading));
+  var body = $("<tbody></tbody>");
+  for (var row of rows) {
+    var tr = $("<tr></tr>");
+    for (var cell of row) tr.append(cell.is && cell.is("td") ? cell : $("<td></td>").append(cell));
+    body.append(tr);
+  }
+  return $("<table class='data-table'></table>").append($("<thead></thead>").append(head), body);
+}
+
+// Sets up a table holding its first page to fetch the others, once server_paged is called on it.
+function pagedBy(table, url, total) {
+  return table.attr({"data-url": url, "data-total": total, "data-poke-url": $("#input_pokemon").data("url")});
+}
+
+function recommendationHeadings(counters, add_links) {
+  var headings = [$("<th class='pagedPoke'>Recommendation</th>"), $("<th class='sort_desc'>Overall</th>")];
+  if (counters) {
+    headings.push($("<th class='hide_mobile' title='How good a Pokémon is against threats to the team.'>Counter</th>"));
+  }
+  headings.push($("<th class='hide_mobile' title='How good a Pokémon is with its teammates.'>Team</th>"));
+  headings.push($("<th class='hide_mobile' title='How often a Pokémon is used in general.'>Usage</th>"));
+  if (add_links) headings.push($("<th class='add_link_column'>✚</th>"));
+  return $("<thead></thead>").append($("<tr></tr>").append(headings));
+}
+
+// Only the first page comes with the analysis. The table fetches any others.
+function fillRecommendations(table, analysis, names, add_links) {
+  var scores = [decodeFloats(analysis.overall)];
+  if (analysis.counters) scores.push(decodeFloats(analysis.counter));
+  scores.push(decodeFloats(analysis.team), decodeFloats(analysis.usage));
+
+  var body = $("<tbody></tbody>");
+  analysis.order.forEach(function(poke, i) {
+    var row = $("<tr></tr>").append($("<td></td>").append(pokeLink(names[poke])));
+    scores.forEach(function(column, c) {
+      row.append($("<td class='dt-body-right'></td>").toggleClass("hide_mobile", c > 0).text(column[i].toFixed(2)));
+    });
+    if (add_links) row.append($("<td class='add_link_cell'></td>").append(add_link(names[poke])));
+    body.append(row);
+  });
+
+  table.append(recommendationHeadings(analysis.counters, add_links), body);
+  prettify_poke_icons(table);
+  server_paged(pagedBy(table, analysis.pages, analysis.total));
+}
+
+// Every row is scored here, so DataTables pages, sorts and searches them itself.
+function fillLocalRecommendations(table, matrices, add_links) {
+  var scores = localScores(matrices, formTeam(matrices), formWeights());
+  if (!matrices.threats) scores.splice(1, 1);
+  var data = matrices.names.map(function(poke, i) {
+    var row = [poke].concat(scores.map(function(column) {return column[i];}));
+    if (add_links) row.push(poke);
+    return row;
+  });
+
+  table.attr("data-poke-url", $("#input_pokemon").data("url"));
+  table.append(recommendationHeadings(matrices.threats !== null, add_links));
+  var spec = table_columns(table);
+  table.DataTable($.extend({}, paged_table_options, {data: data, columns: spec.columns, order: spec.order,
+                                                     deferRender: true}));
+}
+
+$("#analysis_location").on("click", ".add_link", function() {addPoke($(this).attr("data-poke"));});
+
 function attachInputHandlers() {
     $("#recommendations_table_filter input").keydown(keyHandler);
     $("#recommendations_table").on("page.dt", function() {selected = -1;});
@@ -107,5 +367,61 @@ function tryTeam(team) {
   $("#analyze").submit();
 }
 
+// The picker asks the server for names as they are typed, so no name list is needed up front.
+var latest_search = 0;  // Only the latest suggestions are shown, even if earlier ones arrive later.
+var suggestion = -1;
+
+$("#poke_search").on("input", function() {
+  var search = ++latest_search;
+  if (!$(this).val().trim()) {
+    showSuggestions([]);
+    return;
+  }
+  $.getJSON($(this).data("url"), {q: $(this).val()}).then(function(found) {
+    if (search == latest_search) showSuggestions(found);
+  });
+});
+
+$("#poke_search").keydown(function(e) {
+  var items = $("#poke_suggestions li");
+  if (e.key == "ArrowDown" || e.key == "ArrowUp") {
+    if (!items.length) return;
+    suggestion = Math.min(Math.max(suggestion + (e.key == "ArrowDown" ? 1 : -1), 0), items.length - 1);
+    items.removeClass("selected-row").eq(suggestion).addClass("selected-row");
+    e.preventDefault();
+  } else if (e.key == "Enter") {
+    if (suggestion >= 0) pickSuggestion(items.eq(suggestion).data("poke"));
+    e.preventDefault();
+  } else if (e.key == "Escape") {
+    showSuggestions([]);
+  }
+});
+
+$("#poke_search").blur(function() {showSuggestions([]);});
+
+// mousedown rather than click, so the input doesn't lose focus and hide the suggestions first.
+$("#poke_suggestions").on("mousedown", "li", function(e) {
+  e.preventDefault();
+  pickSuggestion($(this).data("poke"));
+});
+
+function showSuggestions(found) {
+  suggestion = found.length ? 0 : -1;
+  var list = $("#poke_suggestions").empty();
+  found.forEach(function(entry, i) {
+    var poke = entry[0];
+    var icon = $("<span class='poke-icon'></span>").attr("style", pkmn.img.Icons.getPokemon(poke).style);
+    list.append($("<li></li>").data("poke", poke).toggleClass("selected-row", i == 0).append(icon, $("<span></span>").text(poke)));
+  });
+}
+
+function pickSuggestion(poke) {
+  latest_search++;
+  $("#poke_search").val("");
+  showSuggestions([]);
+  addPoke(poke);
+}
+
 attachInputHandlers();
+scoring = loadScoring();
 $("#analyze").submit();
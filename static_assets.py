@@ -0,0 +1,78 @@
+"""Serves static files with content fingerprints and pre-compressed variants.
+
+Each file's version is a hash of its contents. URLs that carry the current version
+can be cached forever, as a changed file gets a new URL.
+Compressible files are compressed once, with every supported encoding, the first time they are asked for.
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import namedtuple
+
+from werkzeug.security import safe_join
+
+import compression
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+
+Asset = namedtuple("Asset", ["version", "mimetype", "bodies"])  # bodies: encoding (None for none) -> bytes.
+
+
+class StaticAssets:
+    """Thread-safe store of the files in a directory, read once each. The files shouldn't change while serving."""
+
+    def __init__(self, directory):
+        """Create store.
+
+        Args:
+            directory (str): Directory holding the static files.
+        """
+        self.directory = directory
+        self._lock = threading.Lock()  # Guards _assets.
+        self._assets = {}  # filename -> Asset. Missing files aren't kept, as there is no end to them.
+
+    def get(self, filename):
+        """Get a file, reading and compressing it if this is the first time it is asked for.
+
+        Args:
+            filename (str): Path within the directory, such as icons/logo.png.
+
+        Returns:
+            Asset or None: None if there is no such file, or the path leaves the directory.
+        """
+        filename = filename.lstrip("/")
+        with self._lock:
+            if filename in self._assets:
+                return self._assets[filename]
+
+        asset = self._load(filename)
+        if asset is not None:
+            with self._lock:
+                self._assets[filename] = asset
+        return asset
+
+    def version(self, filename):
+        """Get a file's version, a short hash of its contents.
+
+        Returns:
+            str or None: None if there is no such file.
+        """
+        asset = self.get(filename)
+        return asset.version if asset else None
+
+    def _load(self, filename):
+        path = safe_join(self.directory, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+
+        with open(path, "rb") as f:
+            body = f.read()
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        bodies = {None: body}
+        if compression.compressible(mimetype):
+            for encoding in compression.encodings():
+                compressed = compression.compress(body, encoding, static=True)
+                if len(compressed) < len(body):
+                    bodies[encoding] = compressed
+        return Asset(hashlib.md5(body).hexdigest()[:12], mimetype, bodies)
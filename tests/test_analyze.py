@@ -4,6 +4,7 @@ from dynamic_tests import dynamic
 
 import analyze
 import math
+import numpy as np
 
 
 @dynamic(globals())
@@ -86,6 +87,90 @@ class AnalyzeTestCase(unittest.TestCase):
         self.validate_threats(threats)
         self.validate_scores(scores)
 
+    def test_columns_match_analyze(self):
+        team = list(self.md.pokemon)[:3]
+        for my_pokes in ([], team, team * 2):
+            with self.subTest(team=my_pokes):
+                weights = analyze.Weights(1, 2, 3)
+                threats_dict, scores, my_team, swaps = self.md.analyze(my_pokes, weights)
+                threats, columns, my_team_indices, swap_indices = self.md.analyze_columns(my_pokes, weights)
+                for index, (poke, *row) in enumerate(scores):
+                    self.assertEqual(self.md.names[index], poke)
+                    self.assertListEqual(columns[:, index].tolist(), [float(x) for x in row])
+                if threats_dict:
+                    self.assertListEqual(threats.tolist(), [threats_dict[poke] for poke in self.md.names])
+                else:
+                    self.assertIsNone(threats)
+                self.assertEqual(my_team_indices is None, my_team is None)
+                if my_team:
+                    self.assertListEqual([self.md.names[i] for i in my_team_indices], my_team)
+                self.assertListEqual([(self.md.names[c], self.md.names[s], i) for c, s, i in swap_indices],
+                                     [(c, s, i) for c, (s, i) in swaps.items()])
+
+    def test_arrays(self):
+        self.assertEqual(len(self.md.names), len(self.md.pokemon))
+        for index, poke in enumerate(self.md.names):
+            self.assertEqual(self.md.usages[index], self.md.pokemon[poke]["usage"])
+            self.assertEqual(self.md.counts[index], self.md.count_pokemon(poke))
+
+    def test_partner_precision(self):
+        # Whatever the teammate matrix is stored as, partner scores are worked out in float64.
+        expected = self.md.team_matrix.astype(np.float64) * self.md.usages
+        for index, poke in enumerate(self.md.names[:20]):
+            ratings = self.md.partner_ratings(poke)
+            self.assertEqual(ratings.dtype, np.float64)
+            np.testing.assert_array_equal(ratings, expected[index])
+
+    def expected_ranking(self, scores):
+        """Best RANKED_LIST_SIZE of a row by a full stable sort, keeping positive scores, as the ranked lists should."""
+        order = np.argsort(-scores, kind="stable")[:analyze.RANKED_LIST_SIZE]
+        return [(self.md.names[index], float(scores[index])) for index in order if scores[index] > 0]
+
+    def test_ranked_lists(self):
+        # Expected rankings are worked out from the raw matrices, not the helpers the ranked lists share.
+        partners = self.md.team_matrix.astype(np.float64) * self.md.usages
+        for index, poke in enumerate(self.md.names[:20]):
+            with self.subTest(poke=poke):
+                self.assertListEqual(self.md.top_partners(poke), self.expected_ranking(partners[index]))
+
+                if not self.md.counters:
+                    self.assertIsNone(self.md.top_counters(poke))
+                    continue
+                counters = 100 * self.md.threat_matrix[index]
+                self.assertListEqual(self.md.top_counters(poke), self.expected_ranking(counters))
+
+    def test_ranked_list_ties(self):
+        # Coarse ratings and equal usage tie many partners at the cut-off, which go in index order.
+        self.md.team_matrix = np.round(self.md.team_matrix * 2) / 2
+        self.md.usages = np.ones(len(self.md.names))
+        partners = self.md.team_matrix.astype(np.float64)
+        tied_at_cutoff = 0
+        for index, poke in enumerate(self.md.names):
+            row = partners[index]
+            if len(row) > analyze.RANKED_LIST_SIZE:
+                cutoff = np.sort(row)[::-1][analyze.RANKED_LIST_SIZE - 1]
+                tied_at_cutoff += cutoff > 0 and np.count_nonzero(row == cutoff) > 1
+            with self.subTest(poke=poke):
+                self.assertListEqual(self.md.top_partners(poke), self.expected_ranking(row))
+        self.assertGreater(tied_at_cutoff, 0)
+
+    def test_compact_matrices(self):
+        packed = self.md.compact_matrices()
+        n = len(self.md.names)
+        self.assertEqual(len(packed), 8 * n + 2 * n * n * (2 if self.md.counters else 1))
+        np.testing.assert_array_equal(np.frombuffer(packed, "<f8", n), self.md.usages)
+
+        # The team score is the geometric mean of teammate matrix rows, so is the mean of the packed logs.
+        log_team = np.frombuffer(packed, "<f2", n * n, 8 * n).reshape(n, n).astype(float)
+        team = list(range(min(n, 3)))
+        with np.errstate(divide="ignore"):
+            expected = np.exp(np.log(self.md.team_matrix[team].astype(float)).mean(0))
+        np.testing.assert_allclose(np.exp(log_team[team].mean(0)), expected, rtol=1e-2)
+
+        if self.md.counters:
+            threats = np.frombuffer(packed, "<f2", n * n, 8 * n + 2 * n * n).reshape(n, n)
+            np.testing.assert_allclose(threats, self.md._threat_matrix, rtol=1e-3, atol=1e-6)
+
     def validate_number(self, number):
         self.assertFalse(math.isnan(number))
         self.assertFalse(math.isinf(number))
@@ -101,3 +186,13 @@ class AnalyzeTestCase(unittest.TestCase):
         for threat in threats_dict:
             self.assertIn(threat, self.md.pokemon)
             self.validate_number(threats_dict[threat])
+
+
+class TopKTestCase(unittest.TestCase):
+    def test_top_k_ties(self):
+        matrix = np.array([[1, 3, 3, 2, 3, 3], [0, 0, 0, 0, 0, 0]])
+        indices, values = analyze._top_k(matrix, 3)
+        self.assertListEqual(indices.tolist(), [[1, 2, 4], [0, 1, 2]])
+        self.assertListEqual(values.tolist(), [[3, 3, 3], [0, 0, 0]])
+        indices, _ = analyze._top_k(matrix, 10)
+        self.assertListEqual(indices.tolist(), [[1, 2, 4, 5, 3, 0], [0, 1, 2, 3, 4, 5]])
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from artifact_cache import ArtifactCache, LocalDirSource, ChecksumError
+
+
+class SlowSource(LocalDirSource):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.fetches = 0
+
+    def fetch(self, key, file):
+        self.fetches += 1
+        time.sleep(.05)
+        return super().fetch(key, file)
+
+
+class CorruptSource(LocalDirSource):
+    def fetch(self, key, file):
+        super().fetch(key, file)
+        return "0" * 32
+
+
+class ArtifactCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bucket = tempfile.TemporaryDirectory()
+        self.local = tempfile.TemporaryDirectory()
+        for name, size in [("a", 100), ("b", 200), ("c", 300)]:
+            with open(os.path.join(self.bucket.name, name), "wb") as f:
+                f.write(bytes(size))
+
+    def tearDown(self):
+        self.bucket.cleanup()
+        self.local.cleanup()
+
+    def test_hit_and_miss(self):
+        cache = ArtifactCache(LocalDirSource(self.bucket.name), self.local.name)
+        path = cache.path("a")
+        self.assertEqual(os.path.getsize(path), 100)
+        self.assertEqual(cache.path("a"), path)
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["downloads"], 1)
+        self.assertEqual(stats["bytes"], 100)
+
+    def test_missing(self):
+        cache = ArtifactCache(LocalDirSource(self.bucket.name), self.local.name)
+        self.assertRaises(FileNotFoundError, cache.path, "missing")
+        self.assertEqual(cache.stats()["failures"], 1)
+        self.assertListEqual(os.listdir(self.local.name), [])
+
+    def test_single_flight(self):
+        source = SlowSource(self.bucket.name)
+        cache = ArtifactCache(source, self.local.name)
+        threads = [threading.Thread(target=cache.path, args=("c",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(source.fetches, 1)
+        self.assertListEqual(os.listdir(self.local.name), ["c"])
+
+    def test_checksum(self):
+        cache = ArtifactCache(CorruptSource(self.bucket.name), self.local.name)
+        self.assertRaises(ChecksumError, cache.path, "a")
+        self.assertListEqual(os.listdir(self.local.name), [])
+
+    def test_eviction(self):
+        cache = ArtifactCache(LocalDirSource(self.bucket.name), self.local.name, max_bytes=450)
+        cache.path("a")
+        cache.path("b")
+        cache.path("a")  # b is now least recently used.
+        cache.path("c")
+        self.assertListEqual(sorted(os.listdir(self.local.name)), ["a", "c"])
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["bytes"], 400)
+
+    def test_rescan(self):
+        ArtifactCache(LocalDirSource(self.bucket.name), self.local.name).path("b")
+        cache = ArtifactCache(LocalDirSource(self.bucket.name), self.local.name)
+        self.assertEqual(cache.stats()["bytes"], 200)
+        cache.path("b")
+        self.assertEqual(cache.stats()["downloads"], 0)
+
+    def test_rescan_evicts(self):
+        # Another process filled the directory past this one's limit.
+        other = ArtifactCache(LocalDirSource(self.bucket.name), self.local.name)
+        for age, name in ((30, "a"), (20, "b"), (10, "c")):
+            other.path(name)
+            then = time.time() - age
+            os.utime(os.path.join(self.local.name, name), (then, then))
+        cache = ArtifactCache(LocalDirSource(self.bucket.name), self.local.name, max_bytes=450)
+        self.assertListEqual(sorted(os.listdir(self.local.name)), ["c"])
+        self.assertEqual(cache.stats()["bytes"], 300)
+        self.assertEqual(cache.stats()["evictions"], 2)
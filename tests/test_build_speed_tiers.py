@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import build_speed_tiers
+from file_constants import *
+
+
+class BuildSpeedTiersTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = self.tempdir.name + os.sep
+        with open(self.directory + DEX_PREFIX + "1" + DEX_SUFFIX, "w", encoding="utf-8") as file:
+            json.dump({"pokemon": {"Tauros": {"base_stats": {"Speed": 110}}}}, file)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write_format(self, name, pokemon):
+        data = {"info": {"gen": "1", "level": 100},
+                "pokemon": {poke: {"usage": .5, "count": 10, "Spreads": {"Hardy:0/0/0/0/0/252": 10}}
+                            for poke in pokemon}}
+        with open(self.directory + name + ".json", "w", encoding="utf-8") as file:
+            json.dump(data, file)
+
+    def test_speed_tiers(self):
+        self.write_format("gen1ou-0", ["Tauros"])
+        with mock.patch.object(build_speed_tiers, "TEMP_DATA_DIR", self.directory):
+            build_speed_tiers.build_speed_tiers()
+        with open(self.directory + "gen1ou-0.json", encoding="utf-8") as file:
+            data = json.load(file)
+        self.assertListEqual(data["speed_tiers"]["318"][0], [["Tauros", 1.0]])
+        self.assertNotIn("Spreads", data["pokemon"]["Tauros"])
+
+    def test_dex_cache_cleared_on_failure(self):
+        self.write_format("gen1ou-0", ["Tauros", "Not A Pokemon"])
+        with mock.patch.object(build_speed_tiers, "TEMP_DATA_DIR", self.directory):
+            with self.assertRaises(KeyError):
+                build_speed_tiers.build_speed_tiers()
+        self.assertEqual(build_speed_tiers._load_dex.cache_info().currsize, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
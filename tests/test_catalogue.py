@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+import catalogue
+
+
+class CatalogueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.formats_file = os.path.join(self.directory.name, "all_formats")
+        self.date_file = os.path.join(self.directory.name, "date")
+        with open(self.formats_file, "w", encoding="utf-8") as f:
+            f.write("gen9ou 123456 C 0,1500,1695,1825\ngen9doublesou 789 N 0\n")
+        with open(self.date_file, "w", encoding="utf-8") as f:
+            f.write("October 2026")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load(self):
+        formats = catalogue.load_catalogue(self.formats_file, self.date_file)
+        self.assertEqual(formats.date, "October 2026")
+        self.assertEqual(formats.formats, (catalogue.Format("gen9ou", 123456, True, ("0", "1500", "1695", "1825")),
+                                           catalogue.Format("gen9doublesou", 789, False, ("0",))))
+        self.assertEqual(formats.formats[0].datasets(), ["gen9ou-0", "gen9ou-1500", "gen9ou-1695", "gen9ou-1825"])
+
+    def test_contains(self):
+        formats = catalogue.load_catalogue(self.formats_file, self.date_file)
+        self.assertIn("gen9ou-1695", formats)
+        self.assertIn("gen9doublesou-0", formats)
+        self.assertNotIn("gen9doublesou-1500", formats)
+        self.assertNotIn("gen9ou", formats)
+        self.assertNotIn("../gen9ou-0", formats)
+
+    def test_missing(self):
+        os.remove(self.date_file)
+        with self.assertRaises(FileNotFoundError):
+            catalogue.load_catalogue(self.formats_file, self.date_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
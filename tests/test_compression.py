@@ -0,0 +1,54 @@
+import gzip
+import unittest
+
+from flask import Response
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import compression
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+class CompressionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.body = b"<p>Pikachu</p>" * 200
+
+    def test_best_encoding(self):
+        self.assertEqual(compression.best_encoding(accept("gzip, deflate")), "gzip")
+        self.assertEqual(compression.best_encoding(accept("gzip, deflate, br")), compression.encodings()[0])
+        self.assertIsNone(compression.best_encoding(accept("identity")))
+        self.assertIsNone(compression.best_encoding(accept("gzip;q=0")))
+
+    def test_compress_response(self):
+        response = Response(self.body, mimetype="text/html")
+        response.set_etag("abc")
+        compression.compress_response(response, accept("gzip"), 1024)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.vary)
+        self.assertEqual(response.get_etag(), ("abc-gzip", False))
+        self.assertEqual(gzip.decompress(response.get_data()), self.body)
+
+    def test_deterministic(self):
+        self.assertEqual(compression.compress(self.body, "gzip"), compression.compress(self.body, "gzip"))
+
+    def test_left_alone(self):
+        cases = [(Response(self.body, mimetype="text/html"), "identity"),
+                 (Response(self.body[:100], mimetype="text/html"), "gzip"),
+                 (Response(self.body, mimetype="image/png"), "gzip"),
+                 (Response(self.body, mimetype="text/html", status=404), "gzip")]
+        encoded = Response(self.body, mimetype="text/html")
+        encoded.headers["Content-Encoding"] = "gzip"
+        cases.append((encoded, "gzip"))
+        for response, header in cases:
+            with self.subTest(mimetype=response.mimetype, status=response.status_code, header=header):
+                before = response.get_data()
+                compression.compress_response(response, accept(header), 1024)
+                self.assertEqual(response.get_data(), before)
+                self.assertEqual(response.headers.get("Content-Encoding"), "gzip" if response is encoded else None)
+
+
+if __name__ == '__main__':
+    unittest.main()
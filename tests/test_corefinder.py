@@ -1,8 +1,13 @@
+import itertools
 import md_for_tests
+import numpy as np
+import os
+import tempfile
 import unittest
 from dynamic_tests import dynamic
 
 import corefinder
+from file_constants import *
 
 
 @dynamic(globals())
@@ -19,6 +24,40 @@ class CoreFinderTestCase(unittest.TestCase):
         cf = corefinder.CoreFinder(self.md, 5, self.target_edges)
         self.validate_cores(cf.find_cores())
 
+    def test_edges(self):
+        for target_edges in (5, 50, 500):
+            cf = corefinder.CoreFinder(self.md, 1, target_edges)
+            self.assertEqual(sum(a.bit_count() for a in cf._adjacency), 2 * target_edges)
+
+        rows, columns = corefinder._sorted_edges(self.md, 1, corefinder.MAX_EDGES)
+        usages = np.array([p["usage"] for p in self.md.pokemon.values()])
+        scores = (self.md.team_matrix[rows, columns] * self.md.team_matrix[columns, rows]
+                  * usages[rows] * usages[columns])
+        self.assertTrue(all(rows < columns))
+        self.assertTrue(all(scores[:-1] >= scores[1:] * (1 - 1e-6)))
+
+    def test_edges_kept_on_metagame(self):
+        md = md_for_tests.get_test_md(self.dataset)
+        md.core_edges.clear()
+        rows, _ = corefinder._sorted_edges(md, 1, corefinder.MAX_EDGES)
+        self.assertIs(md.core_edges[1][1], rows)
+        self.assertTrue(np.array_equal(corefinder._sorted_edges(md, 1, 10)[0], rows[:10]))
+        for usage_weight in range(2, corefinder.EDGE_CACHE_SIZE + 3):
+            corefinder._sorted_edges(md, usage_weight, corefinder.MAX_EDGES)
+        self.assertEqual(len(md.core_edges), corefinder.EDGE_CACHE_SIZE)
+        self.assertNotIn(1, md.core_edges)  # Oldest went first.
+
+    def test_default_cores(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, self.dataset + CORES_FILE)
+            corefinder.save_default_cores(self.md, path)
+            stored = corefinder.load_default_cores(path, corefinder.USAGE_WEIGHT_DEFAULT,
+                                                   corefinder.TARGET_EDGES_DEFAULT)
+            self.assertIsNone(corefinder.load_default_cores(path, corefinder.USAGE_WEIGHT_DEFAULT + 1,
+                                                            corefinder.TARGET_EDGES_DEFAULT))
+        cf = corefinder.CoreFinder(self.md, corefinder.USAGE_WEIGHT_DEFAULT, corefinder.TARGET_EDGES_DEFAULT)
+        self.assertEqual(stored, cf.find_cores())
+
     def validate_cores(self, cores):
         cores_set = set()
         self.assertLessEqual(len(cores), self.target_edges)
@@ -32,3 +71,47 @@ class CoreFinderTestCase(unittest.TestCase):
                 self.assertFalse(c.issubset(c_set))
                 self.assertFalse(c_set.issubset(c))
             cores_set.add(c)
+
+
+class CliqueTestCase(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        for n, density in [(8, .3), (10, .5), (12, .7), (12, .9)]:
+            matrix = np.triu(rng.random((n, n)) < density, 1)
+            matrix |= matrix.T
+            adjacency = [sum(1 << int(y) for y in np.flatnonzero(row)) for row in matrix]
+            found = {frozenset(c) for c in corefinder._maximal_cliques(adjacency, (1 << n) - 1)}
+            self.assertSetEqual(found, self.brute_force(matrix))
+
+    def test_empty(self):
+        self.assertListEqual(list(corefinder._maximal_cliques([0, 0, 0], 0)), [])
+
+    @staticmethod
+    def brute_force(matrix):
+        n = len(matrix)
+        cliques = [frozenset(c) for size in range(1, n + 1) for c in itertools.combinations(range(n), size)
+                   if all(matrix[x, y] for x, y in itertools.combinations(c, 2))]
+        return {c for c in cliques if not any(c < other for other in cliques)}
+
+
+class OrderingTestCase(unittest.TestCase):
+    def test_distances(self):
+        cores = [[0, 1], [1, 2, 3], [0, 1, 2, 3], [4, 5]]
+        distances = corefinder._distances(cores, 6)
+        for x, y in itertools.product(range(len(cores)), repeat=2):
+            self.assertEqual(distances[x, y], len(set(cores[x]) ^ set(cores[y])))
+
+    def test_order(self):
+        rng = np.random.default_rng(0)
+        for count in (1, 2, 3, 10, 60):
+            points = rng.random((count, 2))
+            distances = np.rint(np.linalg.norm(points[:, None] - points[None, :], axis=2) * 1000).astype(np.int32)
+            order = corefinder._order(distances)
+            self.assertListEqual(sorted(order), list(range(count)))
+            if count > 2:
+                nearest = corefinder._nearest_neighbour(distances, 0)
+                self.assertLessEqual(self.length(distances, order), self.length(distances, nearest))
+
+    @staticmethod
+    def length(distances, order):
+        return sum(distances[x, y] for x, y in zip(order, order[1:]))
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+
+import dex
+
+
+class DexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name + os.sep
+        self.data = {"pokemon": {"Mew": {"types": ["Psychic"]}, "Ditto": {"types": ["Normal"]}},
+                     "items": {"Leftovers": {"desc": "Heals."}, "Nothing": {"desc": "No held item."}},
+                     "moves": {"Psychic": {"type": "Psychic"}, "Transform": {"type": "Normal"}},
+                     "abilities": {"Synchronize": {"short_desc": "Shares status."}},
+                     "base_stats_short": ["HP", "Atk", "Def", "Spc", "Spe"]}
+        with open(self.path + dex.dex_file("1"), "w", encoding="utf-8") as file:
+            json.dump(self.data, file)
+        self.opened = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def track(self, name):
+        self.opened.append(name)
+        return self.path + name
+
+    def test_whole_file(self):
+        # Dexes that haven't been split are read whole, once.
+        gen_dex = dex.Dex("1", self.track)
+        self.assertEqual(gen_dex.moves["Transform"]["type"], "Normal")
+        self.assertEqual(gen_dex.base_stats_short, ("HP", "Atk", "Def", "Spc", "Spe"))
+        self.assertEqual(self.opened, [dex.section_file("1", "moves"), dex.dex_file("1")])
+
+    def test_sections_loaded_lazily(self):
+        dex.split_dex(self.path + dex.dex_file("1"), self.path, "1")
+        os.remove(self.path + dex.dex_file("1"))
+        gen_dex = dex.Dex("1", self.track)
+        self.assertEqual(self.opened, [])
+        self.assertEqual(gen_dex.items["Leftovers"]["desc"], "Heals.")
+        self.assertIn("Nothing", gen_dex.items)
+        self.assertEqual(gen_dex.pokemon["Mew"]["types"], ["Psychic"])
+        self.assertEqual(self.opened, [dex.section_file("1", "items"), dex.section_file("1", "pokemon")])
+
+    def test_read_only(self):
+        gen_dex = dex.Dex("1", self.track)
+        with self.assertRaises(TypeError):
+            gen_dex.pokemon["Mewtwo"] = {}
+        with self.assertRaises(AttributeError):
+            gen_dex.data = {}
+
+    def test_trim(self):
+        used = {"pokemon": {"Mew"}, "items": {"Leftovers", "Nothing"}, "moves": {"Psychic"}, "abilities": set()}
+        written = dex.split_dex(self.path + dex.dex_file("1"), self.path, "1", used)
+        self.assertEqual(written, {"pokemon": 1, "items": 2, "moves": 1, "abilities": 0, "base_stats_short": 5})
+
+        gen_dex = dex.Dex("1", self.track)
+        self.assertListEqual(list(gen_dex.pokemon), ["Mew"])
+        self.assertListEqual(list(gen_dex.moves), ["Psychic"])
+        self.assertEqual(len(gen_dex.abilities), 0)
+        self.assertEqual(len(gen_dex.abilities), 0)
+        self.assertEqual(self.opened.count(dex.section_file("1", "abilities")), 1)
+
+    def test_used_names(self):
+        metagame = {"pokemon": {"Mew": {}}, "items": {"Leftovers": 1.}, "moves": {"Psychic": 1.},
+                    "abilities": {"Synchronize": 1.}, "info": {"gen": "1"}}
+        self.assertEqual(dex.used_names(metagame), {"pokemon": {"Mew"}, "items": {"Leftovers"},
+                                                    "moves": {"Psychic"}, "abilities": {"Synchronize"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
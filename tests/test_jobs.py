@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+import jobs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _modules(names):
+    """Which of names this process has imported."""
+    return [name for name in names if name in sys.modules]
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class JobPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pool = jobs.JobPool(1, 0, 30)
+
+    def tearDown(self):
+        self.pool.reset(wait=True)
+
+    def test_worker_doesnt_import_main(self):
+        self.assertListEqual(self.pool.run(_modules, ["main", "flask", "static_assets", "profiling"]), [])
+
+    def test_deadline_only_bounds_wait(self):
+        self.pool.timeout = .2
+        with self.assertRaises(jobs.DeadlineExceeded):
+            self.pool.run(_sleep, 2)
+        with self.assertRaises(jobs.Overloaded):  # The overrunning work still holds its slot.
+            self.pool.run(_sleep, 0)
+
+    def test_inline(self):
+        pool = jobs.JobPool(0, 0, 30)
+        self.assertEqual(pool.run(_sleep, 0), 0)
+
+
+class ServerScriptTestCase(unittest.TestCase):
+    def test_import_is_cheap(self):
+        # Spawned workers run the started script under this name before anything else.
+        code = "import runpy, sys; runpy.run_path('server.py', run_name='__mp_main__'); print('main' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from werkzeug.exceptions import InternalServerError
+
+os.environ.setdefault("FLASK_SECRET_KEY", "test")
+
+import dex
+import jobs
+import main
+import profiling
+from artifact_cache import ArtifactCache, LocalDirSource
+from file_constants import *
+from file_loader import DataFilePath
+
+FORMATS = ["gen9anythinggoes 200 C 0,1500", "gen1ou 100 C 0", "gen91v1 100 C 0", "gen9doublesou 100 N 0"]
+BLEND_URL = "/api/blend/gen9anythinggoes?usage_weight=1&team_weight=1&counter_weight=1&pokemon=Great Tusk"
+
+
+def make_bucket(directory):
+    """Fill directory with the test data, a format list, a dex and a second rating of gen9anythinggoes."""
+    for file in os.scandir(TEST_DATA_DIR):
+        if file.is_file():
+            shutil.copy(file.path, directory)
+    for suffix in (".json", THREAT_FILE, TEAMMATE_FILE):
+        shutil.copy(TEST_DATA_DIR + "gen9anythinggoes-0" + suffix, directory + "gen9anythinggoes-1500" + suffix)
+    with open(directory + FORMATS_FILE, "w", encoding="utf-8") as file:
+        file.write("\n".join(FORMATS) + "\n")
+    with open(directory + DATE_FILE, "w", encoding="utf-8") as file:
+        file.write("Test")
+    # Only generation 1 has a dex.
+    with open(directory + dex.dex_file("1"), "w", encoding="utf-8") as file:
+        json.dump({"pokemon": {"Tauros": {"types": ["Normal"]}}, "items": {}, "moves": {}, "abilities": {},
+                   "base_stats_short": ["HP", "Atk", "Def", "Spc", "Spe"]}, file)
+
+
+class AppTestCase(unittest.TestCase):
+    """Routes, served from a copy of the test data with jobs run on the request thread."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        bucket = os.path.join(cls.tempdir.name, "bucket") + os.sep
+        os.mkdir(bucket)
+        make_bucket(bucket)
+        cls.patches = [mock.patch.object(DataFilePath, "cache", ArtifactCache(LocalDirSource(bucket),
+                                                                              os.path.join(cls.tempdir.name, "data"))),
+                       mock.patch.object(main, "job_pool", jobs.JobPool(0, 2, 30))]
+        for patch in cls.patches:
+            patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        for patch in cls.patches:
+            patch.stop()
+        main._clear_caches()
+        cls.tempdir.cleanup()
+
+    def setUp(self):
+        main._clear_caches()
+        self.client = main.app.test_client()
+
+    def test_blend_runs_in_pool(self):
+        with mock.patch.object(main.job_pool, "run", wraps=main.job_pool.run) as run:
+            response = self.client.get(BLEND_URL + "&rating_1500=2&limit=5")
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(run.call_args.args[0], jobs.recommend_blend)
+        self.assertListEqual(response.json["ratings"], ["0", "1500"])
+        self.assertEqual(len(response.json["recommendations"]), 5)
+
+    def test_blend_deadline(self):
+        with mock.patch.object(main.job_pool, "run", side_effect=jobs.DeadlineExceeded):
+            response = self.client.get(BLEND_URL)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_blend_invalid(self):
+        for query in ("&pokemon=Not A Pokemon", "&rating_0=nan", "&rating_1500=-1", "&limit=0"):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(BLEND_URL + query).status_code, 400)
+        self.assertEqual(self.client.get(BLEND_URL.replace("gen9anythinggoes", "gen9nope")).status_code, 404)
+
+    def test_find_cores(self):
+        url = "/cores/gen1ou-0/find_cores"
+        self.assertEqual(self.client.post(url, data={"usage_weight": "1", "target_edges": "50"}).status_code, 200)
+        self.assertEqual(self.client.post(url, data={"usage_weight": "1", "target_edges": "1"}).status_code, 200)
+
+    def test_find_cores_invalid(self):
+        url = "/cores/gen1ou-0/find_cores"
+        for usage_weight, target_edges in (("a", "50"), ("1", "lots"), ("1", "nan"), ("1", "inf"),
+                                           ("nan", "50"), ("inf", "50"), ("-1", "50")):
+            with self.subTest(usage_weight=usage_weight, target_edges=target_edges):
+                response = self.client.post(url, data={"usage_weight": usage_weight, "target_edges": target_edges})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(main._find_cores.cache_info().currsize, 0)
+
+    def run_inline(self, url, profiler):
+        """Whether the job for url runs on the request thread, with profiler deciding what to profile."""
+        with mock.patch.object(main, "profiler", profiler), \
+                mock.patch.object(main.job_pool, "run", wraps=main.job_pool.run) as run:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return run.call_args.kwargs["inline"]
+
+    def test_sampled_profiles_use_pool(self):
+        profiles = os.path.join(self.tempdir.name, "profiles")
+        sampled = profiling.Profiler(profiles, slow_ms=1e9, sample_rate=1)
+        self.assertFalse(self.run_inline(BLEND_URL, sampled))
+        with mock.patch.dict(os.environ, {"UPDATE_PASS": "admin"}):
+            self.assertTrue(self.run_inline(BLEND_URL + "&profile=admin", profiling.Profiler(profiles)))
+
+    def test_only_get_cached(self):
+        response = self.client.post("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.cache_control.public)
+        self.assertEqual(main.page_cache.stats()["entries"], 0)
+        response = self.client.get("/")
+        self.assertTrue(response.cache_control.public)
+        self.assertEqual(main.page_cache.stats()["entries"], 1)
+
+    def test_dex(self):
+        with main.app.test_request_context():
+            self.assertListEqual(main.get_dex("1").pokemon["Tauros"]["types"], ["Normal"])
+            with self.assertRaises(InternalServerError):
+                main.get_dex("9")
+
+
+if __name__ == '__main__':
+    unittest.main()
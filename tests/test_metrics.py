@@ -0,0 +1,42 @@
+import unittest
+
+import metrics
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_buckets(self):
+        for seconds in (.0005, .003, .003, 100):
+            metrics.observe("test_seconds", (("route", "/"),), seconds)
+        page = metrics.render()
+        self.assertIn('test_seconds_bucket{route="/",le="0.001"} 1\n', page)
+        self.assertIn('test_seconds_bucket{route="/",le="0.005"} 3\n', page)
+        self.assertIn('test_seconds_bucket{route="/",le="30"} 3\n', page)
+        self.assertIn('test_seconds_bucket{route="/",le="+Inf"} 4\n', page)
+        self.assertIn('test_seconds_count{route="/"} 4\n', page)
+        self.assertEqual(page.count("# TYPE test_seconds histogram"), 1)
+
+    def test_span(self):
+        with metrics.span("stage"):
+            pass
+        self.assertIn(metrics.STAGE_METRIC + '_count{stage="stage"} 1\n', metrics.render())
+
+    def test_capture(self):
+        with metrics.capture() as spans:
+            with metrics.span("captured"):
+                pass
+        self.assertEqual([stage for stage, _ in spans], ["captured"])
+        self.assertNotIn("captured", metrics.render())
+
+        metrics.record_stages(spans)
+        self.assertIn(metrics.STAGE_METRIC + '_count{stage="captured"} 1\n', metrics.render())
+
+    def test_gauges(self):
+        page = metrics.render([("test_total", "counter", {"cache": 'a"b'}, 3)])
+        self.assertIn("# TYPE test_total counter\n", page)
+        self.assertIn('test_total{cache="a\\"b"} 3\n', page)
@@ -0,0 +1,91 @@
+import md_for_tests
+import unittest
+from dynamic_tests import dynamic
+from werkzeug.datastructures import MultiDict
+
+import numpy as np
+import paging
+
+
+class PagingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.names = ["Pikachu", "Raichu", "Pichu", "Mew", "Mewtwo"]
+        self.columns = [None, np.array([3., 1., 3., 2., 5.]), np.array([0., 4., 1., 3., 2.])]
+
+    def test_defaults(self):
+        query = paging.parse_query(MultiDict())
+        self.assertEqual(query, paging.TableQuery(0, 0, paging.PAGE_LENGTH_DEFAULT, "", 1, True))
+
+    def test_parse(self):
+        query = paging.parse_query(MultiDict({"draw": "3", "start": "20", "length": "-1", "search[value]": " MeW ",
+                                              "order[0][column]": "2", "order[0][dir]": "asc"}))
+        self.assertEqual(query, paging.TableQuery(3, 20, paging.MAX_PAGE_LENGTH, "mew", 2, False))
+        for bad in ({"start": "-1"}, {"length": "0"}, {"length": "ten"}, {"order[0][column]": "-2"}):
+            with self.assertRaises(ValueError):
+                paging.parse_query(MultiDict(bad))
+
+    def test_order(self):
+        # Ties stay in index order.
+        query = paging.TableQuery(0, 0, 10, "", 1, True)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([4, 0, 2, 3, 1], 5, 5))
+        query = query._replace(descending=False)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([1, 3, 0, 2, 4], 5, 5))
+        query = query._replace(column=2)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([0, 2, 4, 3, 1], 5, 5))
+
+    def test_pages(self):
+        query = paging.TableQuery(0, 2, 2, "", 1, True)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([2, 3], 5, 5))
+        query = query._replace(start=4)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([1], 5, 5))
+        query = query._replace(start=10)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([], 5, 5))
+
+    def test_search(self):
+        query = paging.TableQuery(0, 0, 10, "chu", 1, True)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([0, 2, 1], 5, 3))
+        query = query._replace(search="mew", length=1)
+        self.assertEqual(paging.page(self.names, self.columns, query), ([4], 5, 2))
+
+    def test_rows(self):
+        query = paging.TableQuery(0, 0, 10, "", 1, True)
+        self.assertEqual(paging.page(self.names, self.columns, query, np.array([1, 2, 3])), ([2, 3, 1], 3, 3))
+
+    def test_unsortable(self):
+        for column in (0, 3):
+            with self.assertRaises(ValueError):
+                paging.page(self.names, self.columns, paging.TableQuery(0, 0, 10, "", column, True))
+
+    def test_response(self):
+        query = paging.TableQuery(7, 0, 10, "", 1, True)
+        response = paging.response(query, self.names, self.columns[1:], [4, 0], 5, 5)
+        self.assertEqual(response, {"draw": 7, "recordsTotal": 5, "recordsFiltered": 5,
+                                    "data": [["Mewtwo", 5, 2], ["Pikachu", 3, 0]]})
+
+
+@dynamic(globals())
+class RankedPagesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.md = md_for_tests.get_test_md(self.dataset)
+
+    def test_first_page_matches_ranked(self):
+        # The first page a Pokemon's page renders should be what paging serves for it.
+        query = paging.parse_query(MultiDict())
+        for poke in list(self.md.pokemon)[:20]:
+            with self.subTest(poke=poke):
+                ratings = self.md.partner_ratings(poke)
+                indices, _, _ = paging.page(self.md.names, [None, ratings], query, np.flatnonzero(ratings > 0))
+                self.assertListEqual([self.md.names[x] for x in indices],
+                                     [name for name, _ in self.md.top_partners(poke)])
+
+                if not self.md.counters:
+                    self.assertIsNone(self.md.counter_ratings(poke))
+                    continue
+                ratings = self.md.counter_ratings(poke)
+                indices, _, _ = paging.page(self.md.names, [None, ratings], query, np.flatnonzero(ratings > 0))
+                self.assertListEqual([self.md.names[x] for x in indices],
+                                     [name for name, _ in self.md.top_counters(poke)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+import unittest
+
+from profiling import Profiler
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_off_by_default(self):
+        profiler = Profiler(self.dir.name)
+        self.assertIsNone(profiler.start())
+
+    def test_forced(self):
+        profiler = Profiler(self.dir.name)
+        profile = profiler.start(forced=True)
+        self.assertIsNotNone(profile)
+        self.assertIsNone(profiler.start(forced=True))  # One at a time.
+        sum(range(1000))
+        name = profiler.finish(profile, "GET /analysis/gen1ou-0/")
+        self.assertIn("GET_analysis_gen1ou_0", name)
+        self.assertEqual([p[0] for p in profiler.profiles()], [name])
+        self.assertIn("function calls", profiler.report(name))
+        profile = profiler.start(forced=True)
+        self.assertIsNotNone(profile)
+        profiler.finish(profile, "again")
+
+    def test_slow_only(self):
+        profiler = Profiler(self.dir.name, slow_ms=20, sample_rate=1)
+        self.assertIsNone(profiler.finish(profiler.start(), "fast"))
+        profile = profiler.start()
+        time.sleep(.03)
+        self.assertIsNotNone(profiler.finish(profile, "slow"))
+        self.assertEqual(len(profiler.profiles()), 1)
+
+    def test_prune(self):
+        profiler = Profiler(self.dir.name, max_profiles=2)
+        for x in range(4):
+            profiler.finish(profiler.start(forced=True), "request " + str(x))
+            time.sleep(.01)  # Keep modification times in order.
+        self.assertEqual(len(os.listdir(self.dir.name)), 2)
+        self.assertIn("request_3", profiler.profiles()[0][0])
+
+    def test_path(self):
+        profiler = Profiler(self.dir.name)
+        self.assertRaises(FileNotFoundError, profiler.path, "missing.pstats")
+        self.assertRaises(FileNotFoundError, profiler.path, "../secret.pstats")
+        self.assertRaises(FileNotFoundError, profiler.path, "notes.txt")
@@ -0,0 +1,84 @@
+import md_for_tests
+import unittest
+from dynamic_tests import dynamic
+
+import analyze
+import numpy as np
+import rating_blend
+
+
+@dynamic(globals())
+class SingleRatingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.md = md_for_tests.get_test_md(self.dataset)
+        self.blend = rating_blend.RatingBlend(["0"], [self.md])
+
+    def test_matches_analyze(self):
+        # With one rating, the blend scores the same as the rating on its own.
+        order = [self.blend.names.index(poke) for poke in self.md.names]
+        team = list(self.md.pokemon)[:3]
+        for my_pokes in ([], team, team * 2):
+            for weights in (analyze.Weights(1, 2, 3), analyze.Weights(0, 1, 0)):
+                with self.subTest(team=my_pokes, weights=weights):
+                    expected = self.md._score_columns(my_pokes, self.md._find_threats(my_pokes), weights)
+                    blended, *columns = self.blend.score_columns(my_pokes, weights, [1])
+                    np.testing.assert_allclose(blended[order], expected[0], rtol=1e-5)
+                    for actual, column in zip(columns, expected):
+                        np.testing.assert_allclose(actual[0, order], column, rtol=1e-5)
+
+    def test_recommend(self):
+        team = list(self.md.pokemon)[:2]
+        weights = analyze.Weights(1, 1, 1)
+        recommendations = self.blend.recommend(team, weights, [1], 5)
+        self.assertEqual(len(recommendations), 5)
+        _, scores, _, _ = self.md.analyze(team, weights)
+        best = sorted(scores, key=lambda row: -row[1])[:5]
+        self.assertListEqual([name for name, _, _ in recommendations], [row[0] for row in best])
+
+
+class BlendTestCase(unittest.TestCase):
+    def setUp(self):
+        # Two datasets with different Pokemon in different orders stand in for two ratings of a format.
+        self.mds = [md_for_tests.get_test_md("gen9anythinggoes-0"), md_for_tests.get_test_md("gen91v1-0")]
+        self.blend = rating_blend.RatingBlend(["0", "1500"], self.mds)
+        self.weights = analyze.Weights(1, 2, 3)
+        shared = set(self.mds[0].pokemon) & set(self.mds[1].pokemon)
+        self.team = [poke for poke in self.blend.names if poke in shared][:3]
+
+    def test_aligned(self):
+        self.assertSetEqual(set(self.blend.names), set(self.mds[0].names) | set(self.mds[1].names))
+        n = len(self.blend.names)
+        self.assertEqual(self.blend.team_tensor.shape, (2, n, n))
+        self.assertEqual(self.blend.threat_tensor.shape, (2, n, n))
+        for r, md in enumerate(self.mds):
+            where = [self.blend.names.index(poke) for poke in md.names]
+            np.testing.assert_array_equal(self.blend.usages[r, where], md.usages)
+            np.testing.assert_array_equal(self.blend.team_tensor[r][np.ix_(where, where)], md.team_matrix)
+            np.testing.assert_array_equal(self.blend.threat_tensor[r][np.ix_(where, where)], md.threat_matrix)
+
+    def test_each_rating_matches_analyze(self):
+        _, combined, _, _, _ = self.blend.score_columns(self.team, self.weights, [1, 1])
+        for r, md in enumerate(self.mds):
+            expected = md._score_columns(self.team, md._find_threats(self.team), self.weights)[0]
+            where = [self.blend.names.index(poke) for poke in md.names]
+            np.testing.assert_allclose(combined[r, where], expected, rtol=1e-5)
+            missing = [index for index, poke in enumerate(self.blend.names) if poke not in md.pokemon]
+            self.assertTrue(np.all(combined[r, missing] == 0))  # No usage there.
+
+    def test_rating_weights(self):
+        blended, combined, _, _, _ = self.blend.score_columns(self.team, self.weights, [1, 0])
+        np.testing.assert_allclose(blended, combined[0])
+        blended, combined, _, _, _ = self.blend.score_columns(self.team, self.weights, [1, 1])
+        np.testing.assert_allclose(blended, np.sqrt(combined[0] * combined[1]), rtol=1e-6)
+        equal = self.blend.score_columns(self.team, self.weights, [0, 0])[0]
+        np.testing.assert_allclose(equal, blended)
+
+    def test_member_missing_from_a_rating(self):
+        only_first = next(poke for poke in self.mds[0].names if poke not in self.mds[1].pokemon)
+        blended, combined, _, team_scores, _ = self.blend.score_columns([only_first], self.weights, [1, 1])
+        self.assertTrue(np.all(team_scores[1] == rating_blend.NEUTRAL_TEAMMATE))
+        self.assertFalse(np.any(np.isnan(blended)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from response_cache import ResponseCache
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = ResponseCache(1000)
+        self.assertIsNone(cache.get("a"))
+        stored = cache.put("a", b"hello", "text/html")
+        self.assertEqual(cache.get("a"), stored)
+        self.assertEqual(stored.body, b"hello")
+        self.assertEqual(stored.mimetype, "text/html")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"], stats["bytes"]), (1, 1, 1, 5))
+
+    def test_etags(self):
+        cache = ResponseCache(1000)
+        first = cache.put("a", b"hello", "text/html")
+        self.assertEqual(first.etag, cache.put("b", b"hello", "text/html").etag)
+        self.assertNotEqual(first.etag, cache.put("c", b"world", "text/html").etag)
+
+    def test_eviction(self):
+        cache = ResponseCache(250)
+        cache.put("a", bytes(100), "text/html")
+        cache.put("b", bytes(100), "text/html")
+        cache.get("a")  # b is now least recently used.
+        cache.put("c", bytes(100), "text/html")
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.stats()["bytes"], 200)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_replace(self):
+        cache = ResponseCache(250)
+        cache.put("a", bytes(100), "text/html")
+        cache.put("a", bytes(50), "text/html")
+        self.assertEqual(cache.stats()["bytes"], 50)
+        self.assertEqual(len(cache.get("a").body), 50)
+
+    def test_too_big(self):
+        cache = ResponseCache(100)
+        cache.put("a", bytes(50), "text/html")
+        stored = cache.put("b", bytes(200), "text/html")
+        self.assertEqual(len(stored.body), 200)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_disabled(self):
+        cache = ResponseCache(0)
+        cache.put("a", b"hello", "text/html")
+        self.assertIsNone(cache.get("a"))
+
+    def test_clear(self):
+        cache = ResponseCache(1000)
+        cache.put("a", b"hello", "text/html")
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 0)
+
@@ -0,0 +1,76 @@
+import md_for_tests
+import unittest
+from dynamic_tests import dynamic
+
+import search_index
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        names = ["Landorus-Therian", "Landorus", "Great Tusk", "Kingambit", "Iron Valiant", "Iron Hands",
+                 "Enamorus-Therian", "Mr. Mime", "Ting-Lu"]
+        usages = [.3, .05, .4, .5, .2, .25, .1, .01, .15]
+        self.index = search_index.SearchIndex(names, usages)
+
+    def search(self, query, limit=search_index.LIMIT_DEFAULT):
+        return [name for name, _ in self.index.search(query, limit)]
+
+    def test_prefix_by_usage(self):
+        self.assertListEqual(self.search("iron"), ["Iron Hands", "Iron Valiant"])
+        self.assertListEqual(self.search("land"), ["Landorus-Therian", "Landorus"])
+        self.assertListEqual(self.search("i", 1), ["Iron Hands"])
+
+    def test_ignores_case_and_punctuation(self):
+        for query in ("landorus t", "LANDORUST", "landorus-th"):
+            self.assertListEqual(self.search(query), ["Landorus-Therian"])
+        self.assertListEqual(self.search("mrmime"), ["Mr. Mime"])
+        self.assertListEqual(self.search("tinglu"), ["Ting-Lu"])
+
+    def test_later_words(self):
+        self.assertListEqual(self.search("therian"), ["Landorus-Therian", "Enamorus-Therian"])
+        self.assertListEqual(self.search("tusk"), ["Great Tusk"])
+
+    def test_typos(self):
+        self.assertListEqual(self.search("kingambt"), ["Kingambit"])  # Deletion.
+        self.assertListEqual(self.search("grat tusk"), ["Great Tusk"])
+        self.assertListEqual(self.search("ironvaliamt"), ["Iron Valiant"])  # Substitution.
+        self.assertListEqual(self.search("kingganbit"), ["Kingambit"])  # Two edits.
+        # Swapped letters are two edits, as far as Enamorus is.
+        self.assertListEqual(self.search("lnadorus"), ["Landorus-Therian", "Enamorus-Therian", "Landorus"])
+
+    def test_typo_at_end(self):
+        self.assertListEqual(self.search("landorux"), ["Landorus-Therian", "Landorus"])
+        self.assertListEqual(self.search("enamorux"), ["Enamorus-Therian"])
+
+    def test_no_match(self):
+        self.assertListEqual(self.search("zzzzzz"), [])
+        self.assertListEqual(self.search("kgm"), [])  # Too short for typos.
+        self.assertListEqual(self.search(" - "), [])
+        self.assertListEqual(self.search("iron", 0), [])
+
+    def test_prefix_distance(self):
+        self.assertEqual(search_index._prefix_distance("kingambt", "kingambit", 2), 1)
+        self.assertEqual(search_index._prefix_distance("king", "kingambit", 1), 0)
+        self.assertIsNone(search_index._prefix_distance("queen", "kingambit", 2))
+
+
+@dynamic(globals())
+class FormatSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.md = md_for_tests.get_test_md(self.dataset)
+        self.index = search_index.SearchIndex(self.md.names, list(self.md.usages))
+
+    def test_finds_every_name(self):
+        for poke in self.md.names:
+            with self.subTest(poke=poke):
+                names = [name for name, _ in self.index.search(poke, search_index.MAX_LIMIT)]
+                self.assertIn(poke, names)
+
+    def test_ranked_by_usage(self):
+        for prefix in ("a", "s", "ch", "ir"):
+            usages = [usage for _, usage in self.index.search(prefix, search_index.MAX_LIMIT)]
+            self.assertListEqual(usages, sorted(usages, reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import md_for_tests
+import unittest
+from dynamic_tests import dynamic
+from math import floor
+
+import speed_index
+
+
+@dynamic(globals())
+class SpeedIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.md = md_for_tests.get_test_md(self.dataset)
+        self.entries = [(poke, int(speed), fraction) for speed in self.md.speed_tiers
+                        for poke, fraction in self.md.speed_tiers[speed][0]]
+
+    def test_faster_than_matches_scan(self):
+        for multiplier in [1, 1.5, 2, .5, 2/3]:
+            for speed in [0, 50, 100, 101, 150, 300, 10000]:
+                with self.subTest(multiplier=multiplier, speed=speed):
+                    expected = sorted((poke, floor(s * multiplier)) for poke, s, _ in self.entries
+                                      if floor(s * multiplier) > speed)
+                    found = self.md.outspeeds(speed, multiplier)
+                    self.assertListEqual(sorted((poke, s) for poke, s, _ in found), expected)
+                    self.assertListEqual([s for _, s, _ in found], sorted([s for _, s, _ in found], reverse=True))
+
+    def test_tied_and_range(self):
+        for poke, speed, _ in self.entries:
+            tied = self.md.speed_index.tied_with(speed)
+            self.assertIn(poke, [p for p, _, _ in tied])
+            self.assertTrue(all(s == speed for _, s, _ in tied))
+
+        in_range = self.md.speed_index.in_range(100, 200)
+        self.assertEqual(len(in_range), len([e for e in self.entries if 100 <= e[1] <= 200]))
+
+    def test_limit(self):
+        everything = self.md.outspeeds(0)
+        self.assertListEqual(self.md.outspeeds(0, limit=3), everything[-3:])
+
+    def test_top_speed(self):
+        for poke, speed, _ in self.entries:
+            self.assertGreaterEqual(self.md.speed_index.top_speed(poke), speed)
+        self.assertIsNone(self.md.speed_index.top_speed("Not A Pokemon"))
+
+
+class SpeedMultiplierTestCase(unittest.TestCase):
+    def test_stages(self):
+        self.assertEqual(speed_index.speed_multiplier(), 1)
+        self.assertEqual(speed_index.speed_multiplier(1), 1.5)
+        self.assertEqual(speed_index.speed_multiplier(-1), 2/3)
+        self.assertEqual(speed_index.speed_multiplier(6), 4)
+        self.assertEqual(speed_index.speed_multiplier(-6), 1/4)
+        self.assertRaises(ValueError, speed_index.speed_multiplier, 7)
+
+    def test_modifiers(self):
+        self.assertEqual(speed_index.speed_multiplier(1, scarf=True), 2.25)
+        self.assertEqual(speed_index.speed_multiplier(tailwind=True), 2)
+        self.assertEqual(speed_index.speed_multiplier(paralyzed=True, gen=9), .5)
+        self.assertEqual(speed_index.speed_multiplier(paralyzed=True, gen="4"), .25)
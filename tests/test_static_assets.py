@@ -0,0 +1,49 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from static_assets import StaticAssets
+
+
+class StaticAssetsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.directory.name, "icons"))
+        self.script = b"function f() {return 1;}\n" * 100
+        with open(os.path.join(self.directory.name, "script.js"), "wb") as f:
+            f.write(self.script)
+        with open(os.path.join(self.directory.name, "icons", "logo.png"), "wb") as f:
+            f.write(b"\x89PNG" * 100)
+        self.assets = StaticAssets(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_compressed(self):
+        asset = self.assets.get("script.js")
+        self.assertEqual(asset.bodies[None], self.script)
+        self.assertEqual(gzip.decompress(asset.bodies["gzip"]), self.script)
+        self.assertIn(asset.mimetype, ("text/javascript", "application/javascript"))
+
+    def test_not_compressed(self):
+        asset = self.assets.get("/icons/logo.png")
+        self.assertEqual(asset.mimetype, "image/png")
+        self.assertListEqual(list(asset.bodies), [None])
+
+    def test_versions(self):
+        version = self.assets.version("script.js")
+        self.assertEqual(len(version), 12)
+        self.assertEqual(version, StaticAssets(self.directory.name).version("script.js"))
+        self.assertNotEqual(version, self.assets.version("icons/logo.png"))
+
+    def test_missing(self):
+        for filename in ("nope.js", "icons", "../script.js", "icons/../../script.js"):
+            with self.subTest(filename=filename):
+                self.assertIsNone(self.assets.get(filename))
+                self.assertIsNone(self.assets.version(filename))
+        self.assertDictEqual(self.assets._assets, {})  # Misses aren't kept.
+
+
+if __name__ == '__main__':
+    unittest.main()
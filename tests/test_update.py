@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import ujson as json
+
+import corefinder
+import dex
+import update
+import usage_index
+from file_constants import *
+
+
+class PostProcessingTestCase(unittest.TestCase):
+    """The steps update runs on freshly preprocessed data, on a copy of the test data."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = self.tempdir.name + "/"
+        for file in os.scandir(TEST_DATA_DIR):
+            if file.is_file():
+                shutil.copy(file.path, self.directory)
+        self.datasets = update._datasets(self.directory)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_datasets(self):
+        names = sorted(name for name, _ in self.datasets)
+        self.assertListEqual(names, sorted(file[:-5] for file in os.listdir(TEST_DATA_DIR) if file.endswith(".json")))
+
+    def write_dexes(self):
+        """Stand in for the dex build: a whole dex per generation, with an entry no format uses in each section."""
+        used = {}
+        for _, path in self.datasets:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            names = used.setdefault(data["info"]["gen"], {section: set() for section in dex.TRIMMED_SECTIONS})
+            for section, section_names in dex.used_names(data).items():
+                names[section] |= section_names
+        for gen, names in used.items():
+            whole = {section: {name: {} for name in names[section] | {"Unused"}} for section in dex.TRIMMED_SECTIONS}
+            whole["base_stats_short"] = ["HP", "Atk", "Def", "SpA", "SpD", "Spe"]
+            with open(self.directory + dex.dex_file(gen), "w", encoding="utf-8") as file:
+                json.dump(whole, file)
+        return used
+
+    def test_post_processing(self):
+        used = self.write_dexes()
+        update._save_default_cores(self.datasets)
+        update._split_dexes(self.directory, self.datasets)
+        usage_index.build_index(self.datasets, self.directory + USAGE_INDEX_FILE)
+
+        for name, _ in self.datasets:
+            cores = corefinder.load_default_cores(self.directory + name + CORES_FILE,
+                                                  corefinder.USAGE_WEIGHT_DEFAULT, corefinder.TARGET_EDGES_DEFAULT)
+            self.assertIsNotNone(cores)
+        for gen, names in used.items():
+            self.assertFalse(os.path.exists(self.directory + dex.dex_file(gen)))
+            for section in dex.TRIMMED_SECTIONS:
+                with open(self.directory + dex.section_file(gen, section), "r", encoding="utf-8") as file:
+                    self.assertSetEqual(set(json.load(file)), names[section])
+        index = usage_index.UsageIndex(self.directory + USAGE_INDEX_FILE)
+        formats = {name.rsplit("-", 1)[0] for name, _ in self.datasets}
+        for poke in index.names("pokemon"):
+            self.assertTrue({posting.format for posting in index.lookup("pokemon", poke)} <= formats)
+        self.assertTrue(index.names("pokemon"))
+        # Nothing written along the way is taken for a dataset.
+        self.assertListEqual(sorted(update._datasets(self.directory)), sorted(self.datasets))
+
+
+if __name__ == '__main__':
+    unittest.main()
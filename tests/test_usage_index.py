@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+import md_for_tests
+import usage_index
+from file_constants import *
+
+DATASETS = ["gen1ou-0", "gen91v1-0", "gen9anythinggoes-0"]
+
+
+class UsageIndexTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        index_file = os.path.join(cls.directory.name, USAGE_INDEX_FILE)
+        usage_index.build_index([(dataset, TEST_DATA_DIR + dataset + ".json") for dataset in DATASETS], index_file)
+        cls.index = usage_index.UsageIndex(index_file)
+        cls.mds = {dataset: md_for_tests.get_test_md(dataset) for dataset in DATASETS}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_pokemon_usage(self):
+        for dataset, md in self.mds.items():
+            form, rating = dataset.rsplit("-", 1)
+            for poke in list(md.pokemon)[:20]:
+                with self.subTest(dataset=dataset, poke=poke):
+                    postings = {(p.format, p.rating): p.usage for p in self.index.lookup("pokemon", poke)}
+                    self.assertAlmostEqual(postings[(form, rating)], md.pokemon[poke]["usage"], places=4)
+
+    def test_everything_indexed(self):
+        for kind in usage_index.KINDS:
+            for dataset, md in self.mds.items():
+                form = dataset.rsplit("-", 1)[0]
+                for name in getattr(md, kind):
+                    self.assertIn(form, [p.format for p in self.index.lookup(kind, name)])
+
+    def test_combined_usage(self):
+        # Something is used at least as much as by its most common user.
+        md = self.mds["gen9anythinggoes-0"]
+        for kind in ("items", "moves", "abilities"):
+            for name, users in getattr(md, kind).items():
+                usage = [p.usage for p in self.index.lookup(kind, name) if p.format == "gen9anythinggoes"][0]
+                self.assertGreaterEqual(usage + 1e-3, users[0][1])
+
+    def test_order(self):
+        for kind in usage_index.KINDS:
+            for name in self.index.names(kind):
+                usages = [p.usage for p in self.index.lookup(kind, name)]
+                self.assertListEqual(usages, sorted(usages, reverse=True))
+
+    def test_missing(self):
+        self.assertEqual(self.index.lookup("moves", "Not A Move"), ())
+        with self.assertRaises(KeyError):
+            self.index.lookup("natures", "Adamant")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,10 +8,16 @@ The actual mechanics of that preprocessing and validation exist elsewhere.
 import os
 import re
 import requests
+import ujson as json
 import boto3
 import preprocess
+import analyze
+import corefinder
+import dex
+import usage_index
 from build_speed_tiers import build_speed_tiers
 from file_constants import *
+from file_loader import DataFilePath
 import subprocess
 import threading
 from datetime import datetime
@@ -32,6 +38,15 @@ def update():
         print("Failed to acquire lock to update.")
         return False
 
+    try:
+        _update()
+    finally:
+        update_lock.release()  # Even if a step failed, so a later update can try again.
+    return True
+
+
+def _update():
+    """The update steps, run while holding update_lock."""
     print("Update started.")
     date = _download_data()
     print("Data downloaded.")
@@ -90,6 +105,17 @@ def update():
     print("Building speed tiers.")
     build_speed_tiers()
 
+    datasets = _datasets(TEMP_DATA_DIR)
+
+    print("Finding cores.")
+    _save_default_cores(datasets)
+
+    print("Splitting dexes.")
+    _split_dexes(TEMP_DATA_DIR, datasets)
+
+    print("Indexing usage across formats.")
+    usage_index.build_index(datasets, TEMP_DATA_DIR + USAGE_INDEX_FILE)
+
     print("Removing temporary files.")
     for file in os.scandir(TEMP_DATA_DIR):
         if file.name.endswith(TEMP_COUNTERS_FILE):
@@ -101,6 +127,7 @@ def update():
             os.remove(file)
         os.rmdir(DATA_DIR)
     os.rename(TEMP_DATA_DIR, DATA_DIR)
+    DataFilePath.cache.rescan()
 
     print("Clearing old files from cloud.")
     session = boto3.session.Session(aws_access_key_id=os.environ["S3_ACCESS_KEY"],
@@ -112,8 +139,46 @@ def update():
         bucket.upload_file(file.path, file.name)
 
     print("Update complete!")
-    update_lock.release()
-    return True
+
+
+def _datasets(directory):
+    """Name and path of every dataset in a directory, such as ("gen9ou-1500", "./datasets_temp/gen9ou-1500.json").
+
+    Listed once, before anything else is written to the directory.
+    """
+    return [(file.name[:-5], file.path) for file in os.scandir(directory) if file.name.endswith(".json")]
+
+
+def _save_default_cores(datasets):
+    """Store cores found with the default settings for every dataset, so most core requests are just a file read.
+
+    Args:
+        datasets (list of (str, str)): Name and path of each dataset, as from _datasets.
+    """
+    for _, path in datasets:
+        base = path[:-5]
+        md = analyze.MetagameData(path, base + THREAT_FILE, base + TEAMMATE_FILE)
+        corefinder.save_default_cores(md, base + CORES_FILE)  # Its sorted edges go with md.
+
+
+def _split_dexes(directory, datasets):
+    """Store each section of every dex in its own file, keeping only the entries the formats of its generation use.
+
+    Args:
+        directory (str): Where the whole dexes are, and where their sections are written.
+        datasets (list of (str, str)): Name and path of each dataset, as from _datasets.
+    """
+    used = {}
+    for _, path in datasets:
+        with open(path, "r", encoding="utf-8") as fd:
+            data = json.load(fd)
+        names = used.setdefault(data["info"]["gen"], {section: set() for section in dex.TRIMMED_SECTIONS})
+        for section, section_names in dex.used_names(data).items():
+            names[section] |= section_names
+
+    for gen, names in used.items():
+        dex.split_dex(directory + dex.dex_file(gen), directory, gen, names)
+        os.remove(directory + dex.dex_file(gen))
 
 
 def _download_data():
@@ -0,0 +1,107 @@
+"""Index of where each Pokemon, item, move and ability is used, across every format and rating.
+
+update builds it once from the processed datasets, so questions like "which formats use Kingambit, and how much?"
+are answered from one small file without loading any format's data.
+"""
+from collections import namedtuple
+
+import ujson as json
+
+KINDS = ("pokemon", "items", "moves", "abilities")
+DIGITS_KEPT = 4
+
+Posting = namedtuple("Posting", ["format", "rating", "usage"])
+
+
+def dataset_usages(metagame_data):
+    """Find how much a format uses everything in it.
+
+    Pokemon usage is the Pokemon's own usage, the share of teams it is on. Item, move and ability usage is
+    the combined usage of every Pokemon using it, weighted by how often each does,
+    so something on more than one Pokemon per team has usage above 1.
+
+    Args:
+        metagame_data (dict): A dataset's processed JSON, after the dex build has named its moves, items and abilities.
+
+    Returns:
+        dict: Kind -> name -> usage.
+    """
+    pokemon = metagame_data["pokemon"]
+    usages = {"pokemon": {poke: info["usage"] for poke, info in pokemon.items()}}
+    for kind, key in (("items", "Items"), ("moves", "Moves"), ("abilities", "Abilities")):
+        totals = dict.fromkeys(metagame_data[kind], 0.)
+        for info in pokemon.values():
+            for name, use in info[key].items():
+                if name in totals:
+                    totals[name] += use * info["usage"]
+        usages[kind] = totals
+    return usages
+
+
+def build_index(datasets, index_file):
+    """Write the index.
+
+    Args:
+        datasets (iterable of (str, str)): Dataset name, such as gen9ou-1500, and path to its processed JSON.
+        index_file (str): Path to write the index to.
+    """
+    names = []
+    postings = {kind: {} for kind in KINDS}
+    for dataset, path in sorted(datasets):
+        with open(path, "r", encoding="utf-8") as file:
+            usages = dataset_usages(json.load(file))
+        for kind in KINDS:
+            for name, usage in usages[kind].items():
+                postings[kind].setdefault(name, []).append([len(names), round(usage, DIGITS_KEPT)])
+        names.append(dataset)
+
+    for kind in KINDS:
+        for entries in postings[kind].values():
+            entries.sort(key=lambda entry: -entry[1])
+
+    with open(index_file, "w", encoding="utf-8") as file:
+        json.dump({"datasets": names, **postings}, file, ensure_ascii=False)
+
+
+class UsageIndex:
+    """Read-only lookups into the index. Every answer is built when the index is loaded."""
+
+    def __init__(self, index_file):
+        """Load the index.
+
+        Args:
+            index_file (str): Path to a file written by build_index.
+
+        Raises:
+            FileNotFoundError: if there is no index.
+        """
+        with open(index_file, "r", encoding="utf-8") as file:
+            data = json.load(file)
+
+        datasets = [tuple(dataset.rsplit("-", 1)) for dataset in data["datasets"]]
+        self._postings = {kind: {name: tuple(Posting(*datasets[x], usage) for x, usage in entries)
+                                 for name, entries in data[kind].items()}
+                          for kind in KINDS}
+
+    def lookup(self, kind, name):
+        """Find where something is used.
+
+        Args:
+            kind (str): One of KINDS.
+            name (str): Name as shown on the site, such as Kingambit or Choice Scarf.
+
+        Returns:
+            tuple of Posting: Every format and rating using it, most used first. Empty if nothing uses it.
+
+        Raises:
+            KeyError: if kind isn't one of KINDS.
+        """
+        return self._postings[kind].get(name, ())
+
+    def names(self, kind):
+        """Everything of a kind used by any format.
+
+        Raises:
+            KeyError: if kind isn't one of KINDS.
+        """
+        return self._postings[kind].keys()